@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query, Request
+
+from app.core.auth import require_admin
+
+router = APIRouter(
+    prefix="/api/v1/admin", tags=["admin"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("/fts")
+def fts_status(request: Request) -> dict:
+    return request.app.state.fts_maintenance.stats()
+
+
+@router.post("/fts/maintenance")
+def run_fts_maintenance(
+    request: Request,
+    optimize: bool = Query(False),
+) -> dict:
+    maintenance = request.app.state.fts_maintenance
+    run = maintenance.run_pass(force=True, full_optimize=optimize)
+    return {"run": run, **maintenance.stats()}
@@ -1,42 +1,209 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import Optional
 
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from pydantic import ValidationError
+
+from app.core.admission import admit
 from app.core.auth import require_tenant
 from app.db import repo
-from app.models.schemas import DocumentIn, IngestResponse
+from app.models.schemas import (
+    BatchIngestIn,
+    BatchIngestResponse,
+    BatchItemResult,
+    DocumentIn,
+    DocumentPatch,
+    DocumentReplace,
+    IngestResponse,
+    UpdateResponse,
+)
 
-router = APIRouter(prefix="/api/v1/tenants/{tenantId}/documents", tags=["documents"])
+router = APIRouter(
+    prefix="/api/v1/tenants/{tenantId}/documents",
+    tags=["documents"],
+    dependencies=[Depends(admit)],
+)
 
 
-def _validate_document(doc: DocumentIn, request: Request) -> None:
+def _validate_document(
+    doc: DocumentIn | DocumentReplace | DocumentPatch, request: Request
+) -> None:
+    # Fields a patch leaves out are None and keep their stored values.
     settings = request.app.state.settings
-    if len(doc.title) > settings.max_title_len:
+    if doc.title is not None and len(doc.title) > settings.max_title_len:
         raise HTTPException(status_code=400, detail="Title too long")
-    if len(doc.content) > settings.max_content_len:
+    if doc.content is not None and len(doc.content) > settings.max_content_len:
         raise HTTPException(status_code=400, detail="Content too long")
-    if len(doc.tags) > settings.max_tags:
+    if doc.tags is not None and len(doc.tags) > settings.max_tags:
         raise HTTPException(status_code=400, detail="Too many tags")
 
 
+def _after_write(
+    request: Request, tenant_id: str, removed: list[repo.RemovedDocument]
+) -> None:
+    """Refresh caches and derived indexes after a commit that changed documents.
+
+    Writes that changed nothing (duplicates, unchanged updates) skip this, so
+    caches and derived indexes stay valid.
+    """
+    if removed:
+        request.app.state.vectors.discard(tenant_id, [rowid for rowid, _, _ in removed])
+        request.app.state.suggest.discard(tenant_id, removed)
+    request.app.state.search_cache.invalidate_tenant(tenant_id)
+    request.app.state.vectors.mark_dirty(tenant_id)
+    request.app.state.suggest.refresh(tenant_id)
+
+
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=IngestResponse)
 def ingest_document(
     payload: DocumentIn,
     request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", min_length=1, max_length=255
+    ),
     tenantId: str = Depends(require_tenant),
 ) -> IngestResponse:
     _validate_document(payload, request)
-    conn = request.app.state.db
-    lock = request.app.state.db_lock
-    document_id, created_at = repo.insert_document(
-        conn,
-        lock,
+    future = request.app.state.write_queue.submit(
         tenantId,
         payload.title,
         payload.content,
         payload.tags,
+        payload.sourceId,
+        idempotency_key,
     )
+    try:
+        (document_id, created_at, outcome), removed = future.result()
+    except repo.IdempotencyConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    request.app.state.metrics.record_ingest(outcome)
+    if outcome != repo.DUPLICATE:
+        _after_write(request, tenantId, removed)
+    if outcome != repo.CREATED:
+        response.status_code = status.HTTP_200_OK
     return IngestResponse(
         documentId=document_id,
         tenantId=tenantId,
         createdAt=created_at,
     )
 
+
+@router.post(":batch", response_model=BatchIngestResponse)
+def ingest_documents_batch(
+    payload: BatchIngestIn,
+    request: Request,
+    tenantId: str = Depends(require_tenant),
+) -> BatchIngestResponse:
+    if not payload.documents:
+        raise HTTPException(status_code=400, detail="Batch cannot be empty")
+    if len(payload.documents) > request.app.state.settings.max_batch_size:
+        raise HTTPException(status_code=400, detail="Batch too large")
+
+    results: list[BatchItemResult] = []
+    valid: list[tuple[int, DocumentIn]] = []
+    for index, raw in enumerate(payload.documents):
+        try:
+            doc = DocumentIn.model_validate(raw)
+            _validate_document(doc, request)
+        except ValidationError:
+            results.append(BatchItemResult(index=index, status=400, error="Invalid document"))
+            continue
+        except HTTPException as exc:
+            results.append(BatchItemResult(index=index, status=exc.status_code, error=exc.detail))
+            continue
+        valid.append((index, doc))
+
+    with request.app.state.db.lease(tenantId) as db:
+        inserted, removed = repo.ingest_tenant_documents(
+            db,
+            [
+                (tenantId, doc.title, doc.content, doc.tags, doc.sourceId, None)
+                for _, doc in valid
+            ],
+        )
+    for _, _, outcome in inserted:
+        request.app.state.metrics.record_ingest(outcome)
+    if any(outcome != repo.DUPLICATE for _, _, outcome in inserted):
+        _after_write(request, tenantId, removed)
+    for (index, _), (document_id, created_at, outcome) in zip(valid, inserted):
+        results.append(
+            BatchItemResult(
+                index=index,
+                status=(
+                    status.HTTP_201_CREATED
+                    if outcome == repo.CREATED
+                    else status.HTTP_200_OK
+                ),
+                documentId=document_id,
+                createdAt=created_at,
+            )
+        )
+    results.sort(key=lambda item: item.index)
+    return BatchIngestResponse(
+        tenantId=tenantId,
+        accepted=len(inserted),
+        rejected=len(payload.documents) - len(inserted),
+        results=results,
+    )
+
+
+def _update_document(
+    request: Request, tenant_id: str, document_id: str, fields: dict
+) -> UpdateResponse:
+    future = request.app.state.write_queue.submit_update(tenant_id, document_id, fields)
+    result, removed = future.result()
+    if result is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    _, created_at, updated_at, outcome = result
+    if outcome == repo.REPLACED and removed:
+        _after_write(request, tenant_id, removed)
+    elif outcome == repo.REPLACED:
+        # Tags only: the row kept its rowid and text, so vectors and
+        # vocabularies are still valid; only cached pages carry the old tags.
+        request.app.state.search_cache.invalidate_tenant(tenant_id)
+    return UpdateResponse(
+        documentId=document_id,
+        tenantId=tenant_id,
+        createdAt=created_at,
+        updatedAt=updated_at,
+        reindexed=outcome == repo.REPLACED,
+    )
+
+
+@router.put("/{documentId}", response_model=UpdateResponse)
+def replace_document(
+    documentId: str,
+    payload: DocumentReplace,
+    request: Request,
+    tenantId: str = Depends(require_tenant),
+) -> UpdateResponse:
+    _validate_document(payload, request)
+    return _update_document(request, tenantId, documentId, payload.model_dump())
+
+
+@router.patch("/{documentId}", response_model=UpdateResponse)
+def patch_document(
+    documentId: str,
+    payload: DocumentPatch,
+    request: Request,
+    tenantId: str = Depends(require_tenant),
+) -> UpdateResponse:
+    fields = payload.model_dump(exclude_none=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    _validate_document(payload, request)
+    return _update_document(request, tenantId, documentId, fields)
+
+
+@router.delete("/{documentId}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_document(
+    documentId: str,
+    request: Request,
+    tenantId: str = Depends(require_tenant),
+) -> Response:
+    future = request.app.state.write_queue.submit_delete(tenantId, documentId)
+    existed, removed = future.result()
+    if not existed:
+        raise HTTPException(status_code=404, detail="Document not found")
+    _after_write(request, tenantId, removed)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
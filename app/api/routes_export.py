@@ -0,0 +1,119 @@
+import threading
+import weakref
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.admission import check_tenant_rate
+from app.core.auth import require_tenant
+from app.core.serialization import export_line
+from app.db import repo
+from app.db.sqlite import ShardRouter
+
+router = APIRouter(
+    prefix="/api/v1/tenants/{tenantId}/documents/export",
+    tags=["documents"],
+    dependencies=[Depends(check_tenant_rate)],
+)
+
+_GZIP_LEVEL = 6
+
+
+def _since_key(since: Optional[str]) -> str:
+    """``since`` in the stored ``updated_at`` format (UTC, whole seconds)."""
+    if since is None:
+        return ""
+    try:
+        parsed = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since timestamp") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (
+        parsed.astimezone(timezone.utc)
+        .replace(microsecond=0)
+        .isoformat()
+        .replace("+00:00", "Z")
+    )
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        name, _, value = params.strip().partition("=")
+        if name.strip() != "q":
+            return True
+        try:
+            return float(value) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _export_chunks(
+    db: ShardRouter, tenant_id: str, since: str, chunk_size: int, chunk_bytes: int
+) -> Iterator[bytes]:
+    # A shard lease and a reader connection are held per chunk only, so a
+    # slow client never pins a pooled connection between chunks. Chunks are
+    # capped in bytes as well as rows, which bounds memory for large documents.
+    after = (since, 0)
+    while True:
+        with db.lease(tenant_id) as shard:
+            rows = repo.export_documents(shard, tenant_id, after, chunk_size, chunk_bytes)
+        if not rows:
+            return
+        yield "".join(export_line(row) for row in rows).encode("utf-8")
+        after = (rows[-1]["updatedAt"], rows[-1]["rowid"])
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("")
+def export_documents(
+    request: Request,
+    since: Optional[str] = Query(None),
+    accept_encoding: Optional[str] = Header(None),
+    tenantId: str = Depends(require_tenant),
+) -> StreamingResponse:
+    """Stream every document of the tenant as NDJSON, oldest change first.
+
+    With ``since``, only documents written (ingested, replaced or updated) at
+    or after that time are exported. At most ``EXPORT_MAX_CONCURRENT`` exports
+    run per worker; beyond that the request fails fast with 503.
+    """
+    settings = request.app.state.settings
+    since_key = _since_key(since)
+    slots: threading.BoundedSemaphore = request.app.state.export_slots
+    if not slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exports in progress",
+            headers={"Retry-After": "1"},
+        )
+    chunks = _export_chunks(
+        request.app.state.db,
+        tenantId,
+        since_key,
+        max(1, settings.export_chunk_size),
+        max(1, settings.export_chunk_bytes),
+    )
+    # The slot is freed when the generator is released: after the last chunk,
+    # on a client disconnect, or if the stream never starts.
+    weakref.finalize(chunks, slots.release)
+    headers = {"Vary": "Accept-Encoding"}
+    if _accepts_gzip(accept_encoding):
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
@@ -1,17 +1,47 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
 
+from app.core import prometheus
+from app.core.logging import logging_stats
 from app.db import repo
 from app.models.schemas import MetricsResponse
 
 router = APIRouter(prefix="/api/v1/metrics", tags=["metrics"])
 
 
+def _collect(request: Request) -> dict:
+    db = request.app.state.db
+    snapshot = request.app.state.metrics.snapshot()
+    by_tenant: dict[str, int] = {}
+    bytes_by_tenant: dict[str, int] = {}
+    # Closed tenant shards report their last stats instead of being reopened.
+    for stats in db.map_shards_cached(repo.tenant_stats, request.app.state.shard_stats):
+        for tenant_id, values in stats.items():
+            by_tenant[tenant_id] = by_tenant.get(tenant_id, 0) + values["documents"]
+            bytes_by_tenant[tenant_id] = (
+                bytes_by_tenant.get(tenant_id, 0) + values["contentBytes"]
+            )
+    snapshot["documents"] = {
+        "byTenant": by_tenant,
+        "contentBytesByTenant": bytes_by_tenant,
+    }
+    snapshot["db"] = db.pool_stats()
+    snapshot["ingest"].update(request.app.state.write_queue.stats())
+    snapshot["logging"] = logging_stats()
+    snapshot["fts"] = request.app.state.fts_maintenance.stats()
+    snapshot["vectors"] = request.app.state.vectors.stats()
+    snapshot["suggest"] = request.app.state.suggest.stats()
+    snapshot["admission"].update(request.app.state.admission.stats())
+    return snapshot
+
+
 @router.get("", response_model=MetricsResponse)
 def metrics(request: Request) -> MetricsResponse:
-    metrics_collector = request.app.state.metrics
-    conn = request.app.state.db
-    lock = request.app.state.db_lock
-    snapshot = metrics_collector.snapshot()
-    snapshot["documents"] = {"byTenant": repo.document_counts_by_tenant(conn, lock)}
-    return MetricsResponse(**snapshot)
+    return MetricsResponse(**_collect(request))
+
 
+@router.get("/prometheus", response_class=PlainTextResponse)
+def metrics_prometheus(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(
+        prometheus.render(_collect(request)), media_type=prometheus.CONTENT_TYPE
+    )
@@ -1,11 +1,20 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 
+from app.core.admission import admit
 from app.core.auth import require_tenant
-from app.db import repo
+from app.core.cache import normalize_query
+from app.core.cursor import decode_cursor, encode_cursor
+from app.core.serialization import render_search_response
+from app.db import repo, semantic
 from app.models.schemas import SearchResponse
 
 router = APIRouter(
-    prefix="/api/v1/tenants/{tenantId}/documents/search", tags=["search"]
+    prefix="/api/v1/tenants/{tenantId}/documents/search",
+    tags=["search"],
+    dependencies=[Depends(admit)],
 )
 
 @router.get("", response_model=SearchResponse)
@@ -14,20 +23,114 @@ def search_documents(
     q: str = Query(..., alias="q"),
     limit: int = Query(10, ge=1, le=50),
     offset: int = Query(0, ge=0),
+    countMode: str = Query("exact", pattern="^(exact|capped|none)$"),
+    cursor: Optional[str] = Query(None, max_length=512),
+    mode: str = Query("lexical", pattern="^(lexical|vector|hybrid)$"),
+    tags: Optional[str] = Query(None, max_length=2000),
+    facets: Optional[str] = Query(None, pattern="^tags$"),
     tenantId: str = Depends(require_tenant),
-) -> SearchResponse:
+) -> Response:
     if not q.strip():
         raise HTTPException(status_code=400, detail="Query cannot be blank")
-    conn = request.app.state.db
-    lock = request.app.state.db_lock
-    results = repo.search_documents(conn, lock, tenantId, q, limit, offset)
-    total = repo.count_documents(conn, lock, tenantId, q)
-    return SearchResponse(
-        tenantId=tenantId,
-        query=q,
-        limit=limit,
-        offset=offset,
-        total=total,
-        results=results,
+    settings = request.app.state.settings
+    tag_filter = sorted({tag.strip() for tag in (tags or "").split(",") if tag.strip()})
+    if len(tag_filter) > settings.max_tags:
+        raise HTTPException(status_code=400, detail="Too many tags")
+    if facets and mode != "lexical":
+        raise HTTPException(
+            status_code=400, detail="facets are only supported with mode=lexical"
+        )
+    after = None
+    if cursor and mode != "lexical":
+        raise HTTPException(
+            status_code=400, detail="cursor is only supported with mode=lexical"
+        )
+    if cursor:
+        try:
+            after = decode_cursor(cursor, tenantId, q)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    cache = request.app.state.search_cache
+    cache_key = None
+    cached = None
+    if cache.enabled:
+        # Writes by other workers move the tenant's version; it is re-read
+        # only periodically, so cache hits in between skip the database.
+        if cache.version_check_due(tenantId):
+            with request.app.state.db.lease(tenantId) as db:
+                cache.observe_version(tenantId, repo.tenant_version(db, tenantId)[0])
+        cache_key = cache.key(
+            tenantId,
+            normalize_query(q),
+            limit,
+            offset,
+            countMode,
+            after,
+            mode,
+            tuple(tag_filter),
+            facets,
+        )
+        cached = cache.get(cache_key)
+    if cached is None:
+        facet_counts = None
+        with request.app.state.db.lease(tenantId) as db:
+            if mode == "vector":
+                page = semantic.search_vector(
+                    db,
+                    request.app.state.vectors,
+                    tenantId,
+                    q,
+                    limit,
+                    offset,
+                    tag_filter,
+                )
+            elif mode == "hybrid":
+                page = semantic.search_hybrid(
+                    db,
+                    request.app.state.vectors,
+                    tenantId,
+                    q,
+                    limit,
+                    offset,
+                    settings.hybrid_candidates,
+                    settings.hybrid_rrf_k,
+                    tag_filter,
+                )
+            else:
+                page = repo.search_documents(
+                    db,
+                    tenantId,
+                    q,
+                    limit,
+                    offset,
+                    count_mode=countMode,
+                    count_cap=settings.search_count_cap,
+                    after=after,
+                    tags=tag_filter,
+                )
+                if facets:
+                    facet_counts = {
+                        "tags": [
+                            {"value": tag, "count": count}
+                            for tag, count in repo.facet_tags(
+                                db, tenantId, q, settings.search_facet_limit, tag_filter
+                            )
+                        ]
+                    }
+            cached = (*page, facet_counts)
+        if cache_key is not None:
+            cache.put(cache_key, cached)
+    results, total, total_is_estimate, next_after, facet_counts = cached
+    # Encoded directly from the page rows; SearchResponse documents the shape.
+    return render_search_response(
+        tenantId,
+        q,
+        limit,
+        offset,
+        total,
+        total_is_estimate,
+        results,
+        encode_cursor(tenantId, q, next_after) if next_after else None,
+        facet_counts,
     )
 
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from app.core.admission import admit
+from app.core.auth import require_tenant
+from app.db import repo
+from app.db.suggest import tokenize
+from app.models.schemas import SuggestResponse, SuggestTerm, SuggestTitle
+
+router = APIRouter(
+    prefix="/api/v1/tenants/{tenantId}/documents/suggest",
+    tags=["search"],
+    dependencies=[Depends(admit)],
+)
+
+
+@router.get("", response_model=SuggestResponse)
+def suggest(
+    request: Request,
+    q: str = Query(..., max_length=200),
+    limit: int = Query(5, ge=1, le=20),
+    tenantId: str = Depends(require_tenant),
+) -> SuggestResponse:
+    tokens = tokenize(q)
+    if not tokens:
+        raise HTTPException(status_code=400, detail="Query cannot be blank")
+    with request.app.state.db.lease(tenantId) as db:
+        # None while the tenant's vocabulary is still being built: titles only.
+        terms = request.app.state.suggest.complete(db, tenantId, tokens[-1], limit)
+        titles, partial = repo.suggest_titles(
+            db,
+            tenantId,
+            tokens,
+            limit,
+            request.app.state.settings.suggest_budget_ms,
+        )
+    return SuggestResponse(
+        tenantId=tenantId,
+        query=q,
+        terms=[SuggestTerm(term=term, docFreq=count) for term, count in terms or []],
+        titles=[SuggestTitle(**title) for title in titles],
+        partial=partial or terms is None,
+    )
@@ -0,0 +1,153 @@
+import asyncio
+import math
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request
+
+from app.core.auth import require_tenant
+from app.core.metrics import MetricsCollector
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; return 0 on success or seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-tenant token buckets plus a global in-flight limit with a bounded queue.
+
+    ``tenant_limits`` maps tenant -> (rate per second, burst); tenants not listed
+    use ``default_limit``, and a rate of 0 means unlimited. ``max_concurrent`` of
+    0 disables the global limit.
+    """
+
+    def __init__(
+        self,
+        metrics: MetricsCollector,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout_ms: int,
+        tenant_limits: Dict[str, Tuple[float, float]],
+        default_limit: Tuple[float, float],
+    ) -> None:
+        self._metrics = metrics
+        self._max_concurrent = max_concurrent
+        self._max_queue = max_queue
+        self._queue_timeout_s = queue_timeout_ms / 1000.0
+        self._tenant_limits = tenant_limits
+        self._default_limit = default_limit
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._slot_freed: Optional[asyncio.Condition] = None
+
+    def check_rate(self, tenant_id: str) -> None:
+        rate, burst = self._tenant_limits.get(tenant_id, self._default_limit)
+        if rate <= 0:
+            return
+        with self._buckets_lock:
+            bucket = self._buckets.get(tenant_id)
+            if bucket is None:
+                bucket = self._buckets[tenant_id] = TokenBucket(rate, max(1.0, burst))
+            retry_after = bucket.take()
+        if retry_after:
+            self._metrics.record_admission(tenant_id, "rate_limited")
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    async def acquire(self, tenant_id: str) -> None:
+        if self._max_concurrent <= 0:
+            return
+        if self._slot_freed is None:
+            self._slot_freed = asyncio.Condition()
+        if self._in_flight < self._max_concurrent and not self._waiting:
+            self._in_flight += 1
+            self._metrics.record_admission(tenant_id, "admitted")
+            return
+        if self._waiting >= self._max_queue:
+            self._shed(tenant_id)
+        self._waiting += 1
+        self._metrics.record_admission(tenant_id, "queued")
+        try:
+            async with self._slot_freed:
+                await asyncio.wait_for(
+                    self._slot_freed.wait_for(
+                        lambda: self._in_flight < self._max_concurrent
+                    ),
+                    self._queue_timeout_s,
+                )
+                self._in_flight += 1
+        except asyncio.TimeoutError:
+            # Pass on a wakeup this waiter may have consumed before timing out.
+            async with self._slot_freed:
+                self._slot_freed.notify()
+            self._shed(tenant_id)
+        finally:
+            self._waiting -= 1
+        self._metrics.record_admission(tenant_id, "admitted")
+
+    async def release(self) -> None:
+        if self._max_concurrent <= 0:
+            return
+        self._in_flight -= 1
+        async with self._slot_freed:
+            self._slot_freed.notify()
+
+    def _shed(self, tenant_id: str) -> None:
+        self._metrics.record_admission(tenant_id, "overloaded")
+        raise HTTPException(
+            status_code=503,
+            detail="Service overloaded",
+            headers={"Retry-After": "1"},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "inFlight": self._in_flight,
+            "waiting": self._waiting,
+            "maxConcurrent": self._max_concurrent,
+            "maxQueue": self._max_queue,
+        }
+
+
+async def admit(
+    request: Request, tenantId: str = Depends(require_tenant)
+) -> AsyncIterator[None]:
+    """Router dependency: rate-limit the tenant, then hold a global slot."""
+    controller: AdmissionController = request.app.state.admission
+    controller.check_rate(tenantId)
+    await controller.acquire(tenantId)
+    try:
+        yield
+    finally:
+        await controller.release()
+
+
+def check_tenant_rate(request: Request, tenantId: str = Depends(require_tenant)) -> None:
+    """Router dependency for streaming routes: rate-limit the tenant only.
+
+    A stream would hold a global slot for its whole download and starve
+    searches, so it does not take one.
+    """
+    request.app.state.admission.check_rate(tenantId)
@@ -16,3 +16,16 @@ def require_tenant(
         raise HTTPException(status_code=403, detail="Tenant not authorized")
     return tenantId
 
+
+def require_admin(
+    request: Request,
+    api_key: str | None = Depends(API_KEY_HEADER),
+) -> str:
+    settings = request.app.state.settings
+    if not api_key or (
+        api_key not in settings.api_keys and api_key not in settings.admin_api_keys
+    ):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    if api_key not in settings.admin_api_keys:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return api_key
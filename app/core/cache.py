@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.metrics import MetricsCollector
+
+_ENTRY_OVERHEAD_BYTES = 256
+_RESULT_OVERHEAD_BYTES = 200
+_FACET_OVERHEAD_BYTES = 100
+
+
+def normalize_query(query: str) -> str:
+    # FTS5 operators (AND/OR/NOT/NEAR) are case-sensitive, so only whitespace
+    # is normalized.
+    return " ".join(query.split())
+
+
+def _estimate_size(value: tuple) -> int:
+    """Size of a cached search page: (results, total, ..., facets)."""
+    results = value[0]
+    size = _ENTRY_OVERHEAD_BYTES
+    for item in results:
+        size += _RESULT_OVERHEAD_BYTES
+        size += len(item["title"]) + len(item["snippet"])
+        size += len(item["tags"])
+    facets = value[-1] if isinstance(value[-1], dict) else {}
+    for counts in facets.values():
+        size += sum(_FACET_OVERHEAD_BYTES + len(entry["value"]) for entry in counts)
+    return size
+
+
+class SearchCache:
+    """Memory-bounded LRU+TTL cache for search pages.
+
+    Keys carry the tenant's generation number; ``invalidate_tenant`` bumps it
+    so stale entries for that tenant become unreachable and age out of the LRU
+    without touching other tenants' entries.
+
+    Writes made by other worker processes are found through the tenant's
+    ``tenant_stats`` version: the search route reads it when
+    ``version_check_due`` says so, at most once per ``version_check_seconds``
+    per tenant, and ``observe_version`` bumps the generation when it moved.
+    Cache hits in between never touch the database.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float,
+        metrics: MetricsCollector,
+        version_check_seconds: float = 0.0,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._version_check_seconds = version_check_seconds
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        # tenant -> (tenant_stats version, monotonic time it was read)
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    def key(self, tenant_id: str, *params: Hashable) -> Hashable:
+        with self._lock:
+            generation = self._generations.get(tenant_id, 0)
+        return (tenant_id, generation) + params
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self._metrics.record_cache_lookup(entry is not None)
+        return entry[2] if entry is not None else None
+
+    def put(self, key: Hashable, value: tuple) -> None:
+        size = _estimate_size(value)
+        if size > self._max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self._ttl_seconds, size, value)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                evicted += 1
+            entries, used = len(self._entries), self._bytes
+        self._metrics.record_cache_store(evicted, entries, used)
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        with self._lock:
+            self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+            # The write moved the version too; re-read it rather than treat
+            # this worker's own write as another worker's.
+            self._versions.pop(tenant_id, None)
+
+    def version_check_due(self, tenant_id: str) -> bool:
+        with self._lock:
+            seen = self._versions.get(tenant_id)
+        return seen is None or time.monotonic() - seen[1] >= self._version_check_seconds
+
+    def observe_version(self, tenant_id: str, version: int) -> None:
+        """Record the tenant's ``tenant_stats`` version; if it moved since the
+        last read, another worker wrote and the tenant's entries are dropped."""
+        with self._lock:
+            seen = self._versions.get(tenant_id)
+            if seen is not None and seen[0] != version:
+                self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+            self._versions[tenant_id] = (version, time.monotonic())
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
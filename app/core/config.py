@@ -2,7 +2,7 @@ import json
 import os
 from dataclasses import dataclass
 from functools import lru_cache
-from typing import Dict, Set
+from typing import Dict, Set, Tuple
 
 # Default configuration constants
 DEFAULT_DB_PATH = "./data/app.db"
@@ -10,6 +10,47 @@ DEFAULT_MAX_TITLE_LEN = 200
 DEFAULT_MAX_CONTENT_LEN = 200000
 DEFAULT_MAX_TAGS = 20
 DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_QUEUE_SIZE = 10000
+DEFAULT_LOG_SAMPLE_DEFAULT = 1.0
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_INGEST_GROUP_MAX_DOCS = 64
+DEFAULT_INGEST_GROUP_MAX_WAIT_MS = 5
+DEFAULT_INGEST_UPDATE_COALESCE_MS = 20
+DEFAULT_SEARCH_COUNT_CAP = 1000
+DEFAULT_EXPORT_CHUNK_SIZE = 500
+DEFAULT_EXPORT_CHUNK_BYTES = 1024 * 1024
+DEFAULT_EXPORT_MAX_CONCURRENT = 4
+DEFAULT_SEARCH_FACET_LIMIT = 20
+DEFAULT_SEARCH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_SEARCH_CACHE_TTL_SECONDS = 30.0
+DEFAULT_SEARCH_CACHE_VERSION_CHECK_SECONDS = 1.0
+DEFAULT_ADMISSION_MAX_CONCURRENT = 64
+DEFAULT_ADMISSION_MAX_QUEUE = 256
+DEFAULT_ADMISSION_QUEUE_TIMEOUT_MS = 1000
+DEFAULT_TENANT_RATE = 0.0
+DEFAULT_TENANT_BURST = 0.0
+DEFAULT_FTS_AUTOMERGE = 4
+DEFAULT_FTS_CRISISMERGE = 16
+DEFAULT_FTS_USERMERGE = 4
+DEFAULT_FTS_MAINTENANCE_INTERVAL_S = 30.0
+DEFAULT_FTS_MAINTENANCE_IDLE_MS = 2000
+DEFAULT_FTS_MAINTENANCE_BUDGET_MS = 200
+DEFAULT_FTS_MERGE_PAGES = 64
+DEFAULT_EMBEDDER = "hashing"
+DEFAULT_EMBEDDING_DIM = 256
+DEFAULT_VECTOR_IVF_MIN_ROWS = 20000
+DEFAULT_VECTOR_IVF_NPROBE = 8
+DEFAULT_HYBRID_CANDIDATES = 100
+DEFAULT_HYBRID_RRF_K = 60
+DEFAULT_SUGGEST_BUDGET_MS = 25
+DEFAULT_DB_SHARD_MODE = "none"
+DEFAULT_DB_SHARD_COUNT = 8
+DEFAULT_DB_SHARD_MAX_OPEN = 64
+DEFAULT_DB_POOL_SIZE = 8
+DEFAULT_DB_POOL_TIMEOUT_MS = 2000
+DEFAULT_DB_PRAGMA_PROFILE = "durable"
+DEFAULT_METRICS_BACKEND = "shared"
+DEFAULT_METRICS_MAX_SERIES = 1024
 
 
 def _get_env(name: str, default: str | None = None) -> str | None:
@@ -31,14 +72,96 @@ def _parse_api_keys(raw: str | None) -> Dict[str, Set[str]]:
     return parsed
 
 
+def _parse_sample_rates(raw: str | None) -> Dict[str, float]:
+    if not raw:
+        return {}
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("LOG_SAMPLE_RATES_JSON must be a JSON object")
+    rates: Dict[str, float] = {}
+    for endpoint, rate in data.items():
+        rate = float(rate)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("LOG_SAMPLE_RATES_JSON rates must be between 0 and 1")
+        rates[str(endpoint)] = rate
+    return rates
+
+
+def _parse_tenant_limits(raw: str | None) -> Dict[str, Tuple[float, float]]:
+    if not raw:
+        return {}
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("TENANT_RATE_LIMITS_JSON must be a JSON object")
+    limits: Dict[str, Tuple[float, float]] = {}
+    for tenant, limit in data.items():
+        if not isinstance(limit, dict) or "rate" not in limit:
+            raise ValueError("TENANT_RATE_LIMITS_JSON values must be {rate, burst}")
+        rate = float(limit["rate"])
+        limits[str(tenant)] = (rate, float(limit.get("burst", rate)))
+    return limits
+
+
+def _parse_key_list(raw: str | None) -> Set[str]:
+    if not raw:
+        return set()
+    return {key.strip() for key in raw.split(",") if key.strip()}
+
+
 @dataclass(frozen=True)
 class Settings:
     db_path: str
     api_keys: Dict[str, Set[str]]
+    admin_api_keys: Set[str]
     max_title_len: int
     max_content_len: int
     max_tags: int
+    max_batch_size: int
+    ingest_group_max_docs: int
+    ingest_group_max_wait_ms: int
+    ingest_update_coalesce_ms: int
+    search_count_cap: int
+    export_chunk_size: int
+    export_chunk_bytes: int
+    export_max_concurrent: int
+    search_facet_limit: int
+    search_cache_max_bytes: int
+    search_cache_ttl_seconds: float
+    search_cache_version_check_seconds: float
     log_level: str
+    log_queue_size: int
+    log_sample_rates: Dict[str, float]
+    log_sample_default: float
+    admission_max_concurrent: int
+    admission_max_queue: int
+    admission_queue_timeout_ms: int
+    tenant_rate_limits: Dict[str, Tuple[float, float]]
+    tenant_rate_default: Tuple[float, float]
+    fts_automerge: int
+    fts_crisismerge: int
+    fts_usermerge: int
+    fts_maintenance_interval_s: float
+    fts_maintenance_idle_ms: int
+    fts_maintenance_budget_ms: int
+    fts_merge_pages: int
+    db_shard_mode: str
+    db_shard_count: int
+    db_shard_dir: str
+    embedder: str
+    embedding_dim: int
+    vector_dir: str
+    vector_ivf_min_rows: int
+    vector_ivf_nprobe: int
+    hybrid_candidates: int
+    hybrid_rrf_k: int
+    suggest_budget_ms: int
+    db_shard_max_open: int
+    db_pool_size: int
+    db_pool_timeout_ms: int
+    db_pragma_profile: str
+    metrics_backend: str
+    metrics_dir: str
+    metrics_max_series: int
 
 
 @lru_cache(maxsize=1)
@@ -48,14 +171,155 @@ def get_settings() -> Settings:
     max_title_len = int(_get_env("MAX_TITLE_LEN", str(DEFAULT_MAX_TITLE_LEN)))
     max_content_len = int(_get_env("MAX_CONTENT_LEN", str(DEFAULT_MAX_CONTENT_LEN)))
     max_tags = int(_get_env("MAX_TAGS", str(DEFAULT_MAX_TAGS)))
+    max_batch_size = int(_get_env("MAX_BATCH_SIZE", str(DEFAULT_MAX_BATCH_SIZE)))
+    ingest_group_max_docs = int(
+        _get_env("INGEST_GROUP_MAX_DOCS", str(DEFAULT_INGEST_GROUP_MAX_DOCS))
+    )
+    ingest_group_max_wait_ms = int(
+        _get_env("INGEST_GROUP_MAX_WAIT_MS", str(DEFAULT_INGEST_GROUP_MAX_WAIT_MS))
+    )
+    ingest_update_coalesce_ms = int(
+        _get_env("INGEST_UPDATE_COALESCE_MS", str(DEFAULT_INGEST_UPDATE_COALESCE_MS))
+    )
+    search_count_cap = int(
+        _get_env("SEARCH_COUNT_CAP", str(DEFAULT_SEARCH_COUNT_CAP))
+    )
+    export_chunk_size = int(
+        _get_env("EXPORT_CHUNK_SIZE", str(DEFAULT_EXPORT_CHUNK_SIZE))
+    )
+    export_chunk_bytes = int(
+        _get_env("EXPORT_CHUNK_BYTES", str(DEFAULT_EXPORT_CHUNK_BYTES))
+    )
+    export_max_concurrent = int(
+        _get_env("EXPORT_MAX_CONCURRENT", str(DEFAULT_EXPORT_MAX_CONCURRENT))
+    )
+    search_facet_limit = int(
+        _get_env("SEARCH_FACET_LIMIT", str(DEFAULT_SEARCH_FACET_LIMIT))
+    )
+    search_cache_max_bytes = int(
+        _get_env("SEARCH_CACHE_MAX_BYTES", str(DEFAULT_SEARCH_CACHE_MAX_BYTES))
+    )
+    search_cache_ttl_seconds = float(
+        _get_env("SEARCH_CACHE_TTL_SECONDS", str(DEFAULT_SEARCH_CACHE_TTL_SECONDS))
+    )
+    search_cache_version_check_seconds = float(
+        _get_env(
+            "SEARCH_CACHE_VERSION_CHECK_SECONDS",
+            str(DEFAULT_SEARCH_CACHE_VERSION_CHECK_SECONDS),
+        )
+    )
     log_level = _get_env("LOG_LEVEL", DEFAULT_LOG_LEVEL)
+    log_queue_size = int(_get_env("LOG_QUEUE_SIZE", str(DEFAULT_LOG_QUEUE_SIZE)))
+    log_sample_default = float(
+        _get_env("LOG_SAMPLE_DEFAULT", str(DEFAULT_LOG_SAMPLE_DEFAULT))
+    )
+    admission_max_concurrent = int(
+        _get_env("ADMISSION_MAX_CONCURRENT", str(DEFAULT_ADMISSION_MAX_CONCURRENT))
+    )
+    admission_max_queue = int(
+        _get_env("ADMISSION_MAX_QUEUE", str(DEFAULT_ADMISSION_MAX_QUEUE))
+    )
+    admission_queue_timeout_ms = int(
+        _get_env("ADMISSION_QUEUE_TIMEOUT_MS", str(DEFAULT_ADMISSION_QUEUE_TIMEOUT_MS))
+    )
+    tenant_rate = float(_get_env("TENANT_RATE_DEFAULT", str(DEFAULT_TENANT_RATE)))
+    tenant_burst = float(_get_env("TENANT_BURST_DEFAULT", str(DEFAULT_TENANT_BURST)))
+    fts_automerge = int(_get_env("FTS_AUTOMERGE", str(DEFAULT_FTS_AUTOMERGE)))
+    fts_crisismerge = int(_get_env("FTS_CRISISMERGE", str(DEFAULT_FTS_CRISISMERGE)))
+    fts_usermerge = int(_get_env("FTS_USERMERGE", str(DEFAULT_FTS_USERMERGE)))
+    fts_maintenance_interval_s = float(
+        _get_env(
+            "FTS_MAINTENANCE_INTERVAL_S", str(DEFAULT_FTS_MAINTENANCE_INTERVAL_S)
+        )
+    )
+    fts_maintenance_idle_ms = int(
+        _get_env("FTS_MAINTENANCE_IDLE_MS", str(DEFAULT_FTS_MAINTENANCE_IDLE_MS))
+    )
+    fts_maintenance_budget_ms = int(
+        _get_env("FTS_MAINTENANCE_BUDGET_MS", str(DEFAULT_FTS_MAINTENANCE_BUDGET_MS))
+    )
+    fts_merge_pages = int(_get_env("FTS_MERGE_PAGES", str(DEFAULT_FTS_MERGE_PAGES)))
+    db_shard_mode = _get_env("DB_SHARD_MODE", DEFAULT_DB_SHARD_MODE)
+    db_shard_count = int(_get_env("DB_SHARD_COUNT", str(DEFAULT_DB_SHARD_COUNT)))
+    db_shard_dir = _get_env("DB_SHARD_DIR", os.path.splitext(db_path)[0] + "_shards")
+    embedder = _get_env("EMBEDDER", DEFAULT_EMBEDDER)
+    embedding_dim = int(_get_env("EMBEDDING_DIM", str(DEFAULT_EMBEDDING_DIM)))
+    vector_dir = _get_env("VECTOR_DIR", os.path.splitext(db_path)[0] + "_vectors")
+    vector_ivf_min_rows = int(
+        _get_env("VECTOR_IVF_MIN_ROWS", str(DEFAULT_VECTOR_IVF_MIN_ROWS))
+    )
+    vector_ivf_nprobe = int(_get_env("VECTOR_IVF_NPROBE", str(DEFAULT_VECTOR_IVF_NPROBE)))
+    hybrid_candidates = int(_get_env("HYBRID_CANDIDATES", str(DEFAULT_HYBRID_CANDIDATES)))
+    hybrid_rrf_k = int(_get_env("HYBRID_RRF_K", str(DEFAULT_HYBRID_RRF_K)))
+    suggest_budget_ms = int(_get_env("SUGGEST_BUDGET_MS", str(DEFAULT_SUGGEST_BUDGET_MS)))
+    db_shard_max_open = int(
+        _get_env("DB_SHARD_MAX_OPEN", str(DEFAULT_DB_SHARD_MAX_OPEN))
+    )
+    db_pool_size = int(_get_env("DB_POOL_SIZE", str(DEFAULT_DB_POOL_SIZE)))
+    db_pool_timeout_ms = int(
+        _get_env("DB_POOL_TIMEOUT_MS", str(DEFAULT_DB_POOL_TIMEOUT_MS))
+    )
+    db_pragma_profile = _get_env("DB_PRAGMA_PROFILE", DEFAULT_DB_PRAGMA_PROFILE)
+    metrics_backend = _get_env("METRICS_BACKEND", DEFAULT_METRICS_BACKEND)
+    if metrics_backend not in ("shared", "local"):
+        raise ValueError("METRICS_BACKEND must be 'shared' or 'local'")
+    metrics_dir = _get_env("METRICS_DIR", os.path.splitext(db_path)[0] + "_metrics")
+    metrics_max_series = int(
+        _get_env("METRICS_MAX_SERIES", str(DEFAULT_METRICS_MAX_SERIES))
+    )
 
     return Settings(
         db_path=db_path,
         api_keys=_parse_api_keys(api_keys_json),
+        admin_api_keys=_parse_key_list(_get_env("ADMIN_API_KEYS")),
         max_title_len=max_title_len,
         max_content_len=max_content_len,
         max_tags=max_tags,
+        max_batch_size=max_batch_size,
+        ingest_group_max_docs=ingest_group_max_docs,
+        ingest_group_max_wait_ms=ingest_group_max_wait_ms,
+        ingest_update_coalesce_ms=ingest_update_coalesce_ms,
+        search_count_cap=search_count_cap,
+        export_chunk_size=export_chunk_size,
+        export_chunk_bytes=export_chunk_bytes,
+        export_max_concurrent=export_max_concurrent,
+        search_facet_limit=search_facet_limit,
+        search_cache_max_bytes=search_cache_max_bytes,
+        search_cache_ttl_seconds=search_cache_ttl_seconds,
+        search_cache_version_check_seconds=search_cache_version_check_seconds,
         log_level=log_level,
+        log_queue_size=log_queue_size,
+        log_sample_rates=_parse_sample_rates(_get_env("LOG_SAMPLE_RATES_JSON")),
+        log_sample_default=log_sample_default,
+        admission_max_concurrent=admission_max_concurrent,
+        admission_max_queue=admission_max_queue,
+        admission_queue_timeout_ms=admission_queue_timeout_ms,
+        tenant_rate_limits=_parse_tenant_limits(_get_env("TENANT_RATE_LIMITS_JSON")),
+        tenant_rate_default=(tenant_rate, tenant_burst or tenant_rate),
+        fts_automerge=fts_automerge,
+        fts_crisismerge=fts_crisismerge,
+        fts_usermerge=fts_usermerge,
+        fts_maintenance_interval_s=fts_maintenance_interval_s,
+        fts_maintenance_idle_ms=fts_maintenance_idle_ms,
+        fts_maintenance_budget_ms=fts_maintenance_budget_ms,
+        fts_merge_pages=fts_merge_pages,
+        db_shard_mode=db_shard_mode,
+        db_shard_count=db_shard_count,
+        db_shard_dir=db_shard_dir,
+        embedder=embedder,
+        embedding_dim=embedding_dim,
+        vector_dir=vector_dir,
+        vector_ivf_min_rows=vector_ivf_min_rows,
+        vector_ivf_nprobe=vector_ivf_nprobe,
+        hybrid_candidates=hybrid_candidates,
+        hybrid_rrf_k=hybrid_rrf_k,
+        suggest_budget_ms=suggest_budget_ms,
+        db_shard_max_open=db_shard_max_open,
+        db_pool_size=db_pool_size,
+        db_pool_timeout_ms=db_pool_timeout_ms,
+        db_pragma_profile=db_pragma_profile,
+        metrics_backend=metrics_backend,
+        metrics_dir=metrics_dir,
+        metrics_max_series=metrics_max_series,
     )
 
@@ -0,0 +1,36 @@
+import base64
+import hashlib
+import json
+from typing import Tuple
+
+from app.core.cache import normalize_query
+
+
+def _binding(tenant_id: str, query: str) -> str:
+    digest = hashlib.sha256(
+        f"{tenant_id}\0{normalize_query(query)}".encode("utf-8")
+    ).hexdigest()
+    return digest[:16]
+
+
+def encode_cursor(tenant_id: str, query: str, position: Tuple[float, int]) -> str:
+    """Opaque search-after token for the (bm25, rowid) position of a result."""
+    score_raw, rid = position
+    payload = json.dumps(
+        [score_raw, rid, _binding(tenant_id, query)], separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, tenant_id: str, query: str) -> Tuple[float, int]:
+    """Raise ValueError if the token is malformed or was issued for another
+    tenant or query."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        score_raw, rid, binding = json.loads(raw)
+        position = (float(score_raw), int(rid))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    if binding != _binding(tenant_id, query):
+        raise ValueError("Cursor does not match this tenant and query")
+    return position
@@ -0,0 +1,81 @@
+import importlib
+import re
+import zlib
+from typing import Protocol, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+# Only the head of long documents is embedded; it dominates the signal and
+# keeps the per-document cost bounded at MAX_CONTENT_LEN.
+_MAX_EMBED_CHARS = 8192
+_TITLE_WEIGHT = 2.0
+_TRIGRAM_WEIGHT = 0.5
+
+
+class Embedder(Protocol):
+    """Maps texts to L2-normalized float32 vectors of shape (len(texts), dim)."""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+def document_text(title: str, content: str) -> str:
+    return f"{title}\n{content[:_MAX_EMBED_CHARS]}"
+
+
+class HashingEmbedder:
+    """Deterministic local embedder using the signed hashing trick.
+
+    Each word and each character trigram of a word is hashed (CRC32, stable
+    across processes) to one of ``dim`` buckets with a +/-1 sign. Trigrams give
+    overlap between inflections ("index", "indexing"). Needs no model files,
+    network or GPU.
+    """
+
+    def __init__(self, dim: int) -> None:
+        if dim <= 0 or dim & (dim - 1):
+            raise ValueError("EMBEDDING_DIM must be a power of two")
+        self.dim = dim
+
+    def _features(self, text: str) -> tuple[list[int], list[float]]:
+        hashes: list[int] = []
+        weights: list[float] = []
+        first_line, _, rest = text.partition("\n")
+        for chunk, weight in ((first_line, _TITLE_WEIGHT), (rest, 1.0)):
+            for word in _TOKEN_RE.findall(chunk.lower()):
+                hashes.append(zlib.crc32(word.encode("utf-8")))
+                weights.append(weight)
+                if len(word) > 3:
+                    padded = f"<{word}>"
+                    for start in range(len(padded) - 2):
+                        hashes.append(zlib.crc32(padded[start : start + 3].encode("utf-8")))
+                        weights.append(weight * _TRIGRAM_WEIGHT)
+        return hashes, weights
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        mask = self.dim - 1
+        for row, text in enumerate(texts):
+            hashes, weights = self._features(text)
+            if not hashes:
+                continue
+            codes = np.asarray(hashes, dtype=np.uint32)
+            signs = np.where(codes >> 31, -1.0, 1.0) * np.asarray(weights)
+            out[row] = np.bincount(codes & mask, weights=signs, minlength=self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+def load_embedder(spec: str, dim: int) -> Embedder:
+    """``spec`` is ``hashing`` or ``package.module:factory``; ``factory(dim)``
+    must return an object implementing ``Embedder``."""
+    if spec == "hashing":
+        return HashingEmbedder(dim)
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError("EMBEDDER must be 'hashing' or 'module:factory'")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory(dim)
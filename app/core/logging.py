@@ -1,15 +1,106 @@
+import json
 import logging
-from typing import Any
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
 
+_REQUEST_LOGGER = logging.getLogger("app.request")
 
-def setup_logging(log_level: str) -> None:
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper(), logging.INFO),
-        format="%(message)s",
-    )
 
+class JsonLineFormatter(logging.Formatter):
+    """One compact JSON object per line; dict messages are emitted as fields."""
 
-def log_request(data: dict[str, Any]) -> None:
-    logger = logging.getLogger("app.request")
-    logger.info(data)
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            payload: Dict[str, Any] = dict(record.msg)
+        else:
+            payload = {"message": record.getMessage()}
+        payload.setdefault("ts", round(record.created, 3))
+        payload.setdefault("level", record.levelname)
+        payload.setdefault("logger", record.name)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, separators=(",", ":"), default=str)
 
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: a full queue drops the record and counts it."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _state.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread, not on the event loop.
+        return record
+
+
+class _LoggingState:
+    def __init__(self) -> None:
+        self.listener: Optional[QueueListener] = None
+        self.handler: Optional[QueueHandler] = None
+        self.sample_rates: Dict[str, float] = {}
+        self.default_rate = 1.0
+        self.dropped = 0
+        self.sampled_out = 0
+
+
+_state = _LoggingState()
+
+
+def setup_logging(
+    log_level: str,
+    queue_size: int = 10000,
+    sample_rates: Optional[Dict[str, float]] = None,
+    default_sample_rate: float = 1.0,
+) -> None:
+    shutdown_logging()
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonLineFormatter())
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(1, queue_size))
+    handler = _DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    # Handlers installed by the host (uvicorn --log-config, pytest, embedding
+    # apps) stay; shutdown_logging above removed only this module's handler.
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    _state.listener = listener
+    _state.handler = handler
+    _state.sample_rates = dict(sample_rates or {})
+    _state.default_rate = default_sample_rate
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    if _state.listener is not None:
+        _state.listener.stop()
+        _state.listener = None
+    if _state.handler is not None:
+        logging.getLogger().removeHandler(_state.handler)
+        _state.handler = None
+
+
+def logging_stats() -> dict:
+    return {"dropped": _state.dropped, "sampledOut": _state.sampled_out}
+
+
+def log_request(data: dict[str, Any], endpoint: Optional[str] = None) -> None:
+    if not _REQUEST_LOGGER.isEnabledFor(logging.INFO):
+        return
+    rate = 1.0
+    if int(data.get("status") or 0) < 400:
+        rate = _state.sample_rates.get(endpoint or "", _state.default_rate)
+        if rate < 1.0 and random.random() >= rate:
+            _state.sampled_out += 1
+            return
+    if rate < 1.0:
+        data["sample_rate"] = rate
+    data.setdefault("ts", round(time.time(), 3))
+    _REQUEST_LOGGER.info(data)
@@ -1,22 +1,165 @@
+import math
+import os
 import threading
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Log-bucketed latency histograms: bucket i (i >= 1) covers
+# (_HIST_MIN_MS * g**(i-1), _HIST_MIN_MS * g**i] with g = 2**(1/8), so any
+# reported quantile is within ~4.5% of the true value.
+_HIST_MIN_MS = 0.01
+_HIST_MAX_MS = 600_000.0
+_HIST_GROWTH = 2 ** (1 / 8)
+_HIST_INV_LOG_GROWTH = 1 / math.log(_HIST_GROWTH)
+HIST_BUCKETS = int(math.ceil(math.log(_HIST_MAX_MS / _HIST_MIN_MS) * _HIST_INV_LOG_GROWTH)) + 1
+
+WINDOW_SLOT_SECONDS = 15
+WINDOW_SLOTS = 20
+WINDOWS = {"1m": 60, "5m": 300}
+
+ADMISSION_OUTCOMES = ("admitted", "queued", "rate_limited", "overloaded")
+INGEST_OUTCOMES = ("created", "duplicate", "replaced")
+
+SeriesKey = Tuple[str, str]
+OVERALL: SeriesKey = ("overall", "")
+
+
+def bucket_index(latency_ms: float) -> int:
+    if latency_ms <= _HIST_MIN_MS:
+        return 0
+    index = int(math.log(latency_ms / _HIST_MIN_MS) * _HIST_INV_LOG_GROWTH) + 1
+    return index if index < HIST_BUCKETS else HIST_BUCKETS - 1
+
+
+def _bucket_value(index: int) -> float:
+    if index == 0:
+        return _HIST_MIN_MS
+    return _HIST_MIN_MS * _HIST_GROWTH ** (index - 0.5)
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram; memory is bounded by ``HIST_BUCKETS``."""
+
+    __slots__ = ("buckets", "count", "max")
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, latency_ms: float) -> None:
+        index = bucket_index(latency_ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        if latency_ms > self.max:
+            self.max = latency_ms
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class _Series:
+    """Lifetime histogram plus a ring of fixed-width time slots for windows."""
+
+    __slots__ = ("total", "slot_ids", "slots")
+
+    def __init__(self) -> None:
+        self.total = LatencyHistogram()
+        self.slot_ids: List[int] = [-1] * WINDOW_SLOTS
+        self.slots: List[Optional[LatencyHistogram]] = [None] * WINDOW_SLOTS
+
+    def record(self, latency_ms: float, slot_id: int) -> None:
+        self.total.record(latency_ms)
+        position = slot_id % WINDOW_SLOTS
+        slot = self.slots[position]
+        if slot is None or self.slot_ids[position] != slot_id:
+            slot = LatencyHistogram()
+            self.slots[position] = slot
+            self.slot_ids[position] = slot_id
+        slot.record(latency_ms)
+
+    def merge_window(self, into: LatencyHistogram, oldest_slot_id: int) -> None:
+        for slot_id, slot in zip(self.slot_ids, self.slots):
+            if slot is not None and slot_id >= oldest_slot_id:
+                into.merge(slot)
+
+
+class Counters:
+    """Per-thread counters; its lock is only contended by ``snapshot``."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests_total = 0
+        self.requests_by_tenant: Dict[str, int] = {}
+        self.requests_by_endpoint: Dict[str, int] = {}
+        self.latency_sum_total = 0.0
+        self.latency_sum_by_endpoint: Dict[str, float] = {}
+        self.errors_total = 0
+        self.errors_by_status: Dict[str, int] = {}
+        self.errors_by_tenant: Dict[str, int] = {}
+        self.series: Dict[SeriesKey, _Series] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self.admission: Dict[str, int] = {}
+        self.ingest: Dict[str, int] = {}
+        self.shed_by_tenant: Dict[str, int] = {}
+
+    def record_latency(self, key: SeriesKey, latency_ms: float, slot_id: int) -> None:
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _Series()
+        series.record(latency_ms, slot_id)
+
+
+def _add(target: Dict, source: Dict) -> None:
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
 
 
 class MetricsCollector:
     def __init__(self) -> None:
         self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[Counters] = []
         self._start_time = time.time()
-        self._requests_total = 0
-        self._requests_by_tenant: Dict[str, int] = {}
-        self._requests_by_endpoint: Dict[str, int] = {}
-        self._latency_sum_total = 0.0
-        self._latency_count_total = 0
-        self._latency_sum_by_endpoint: Dict[str, float] = {}
-        self._latency_count_by_endpoint: Dict[str, int] = {}
-        self._errors_total = 0
-        self._errors_by_status: Dict[str, int] = {}
-        self._errors_by_tenant: Dict[str, int] = {}
+        self._cache_entries = 0
+        self._cache_bytes = 0
+
+    def _shard(self) -> Counters:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = Counters()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def close(self) -> None:
+        pass
 
     def record_request(
         self,
@@ -25,62 +168,230 @@ class MetricsCollector:
         status_code: int,
         latency_ms: float,
     ) -> None:
-        with self._lock:
-            self._requests_total += 1
-            self._requests_by_endpoint[endpoint] = (
-                self._requests_by_endpoint.get(endpoint, 0) + 1
+        shard = self._shard()
+        slot_id = int(time.time()) // WINDOW_SLOT_SECONDS
+        with shard.lock:
+            shard.requests_total += 1
+            shard.requests_by_endpoint[endpoint] = (
+                shard.requests_by_endpoint.get(endpoint, 0) + 1
             )
             if tenant_id:
-                self._requests_by_tenant[tenant_id] = (
-                    self._requests_by_tenant.get(tenant_id, 0) + 1
+                shard.requests_by_tenant[tenant_id] = (
+                    shard.requests_by_tenant.get(tenant_id, 0) + 1
                 )
-            self._latency_sum_total += latency_ms
-            self._latency_count_total += 1
-            self._latency_sum_by_endpoint[endpoint] = (
-                self._latency_sum_by_endpoint.get(endpoint, 0.0) + latency_ms
-            )
-            self._latency_count_by_endpoint[endpoint] = (
-                self._latency_count_by_endpoint.get(endpoint, 0) + 1
+            shard.latency_sum_total += latency_ms
+            shard.latency_sum_by_endpoint[endpoint] = (
+                shard.latency_sum_by_endpoint.get(endpoint, 0.0) + latency_ms
             )
+            shard.record_latency(OVERALL, latency_ms, slot_id)
+            shard.record_latency(("endpoint", endpoint), latency_ms, slot_id)
+            if tenant_id:
+                shard.record_latency(("tenant", tenant_id), latency_ms, slot_id)
             if status_code >= 400:
-                self._errors_total += 1
+                shard.errors_total += 1
                 status_key = str(status_code)
-                self._errors_by_status[status_key] = (
-                    self._errors_by_status.get(status_key, 0) + 1
+                shard.errors_by_status[status_key] = (
+                    shard.errors_by_status.get(status_key, 0) + 1
                 )
                 if tenant_id:
-                    self._errors_by_tenant[tenant_id] = (
-                        self._errors_by_tenant.get(tenant_id, 0) + 1
+                    shard.errors_by_tenant[tenant_id] = (
+                        shard.errors_by_tenant.get(tenant_id, 0) + 1
                     )
 
+    def record_cache_lookup(self, hit: bool) -> None:
+        shard = self._shard()
+        with shard.lock:
+            if hit:
+                shard.cache_hits += 1
+            else:
+                shard.cache_misses += 1
+
+    def record_cache_store(self, evicted: int, entries: int, size_bytes: int) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.cache_evictions += evicted
+        self._cache_entries = entries
+        self._cache_bytes = size_bytes
+
+    def record_admission(self, tenant_id: str, outcome: str) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.admission[outcome] = shard.admission.get(outcome, 0) + 1
+            if outcome in ("rate_limited", "overloaded"):
+                shard.shed_by_tenant[tenant_id] = (
+                    shard.shed_by_tenant.get(tenant_id, 0) + 1
+                )
+
+    def record_ingest(self, outcome: str, count: int = 1) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.ingest[outcome] = shard.ingest.get(outcome, 0) + count
+
     def snapshot(self) -> dict:
         with self._lock:
-            avg_overall = (
-                self._latency_sum_total / self._latency_count_total
-                if self._latency_count_total
-                else 0.0
-            )
-            by_endpoint_avg = {
-                endpoint: self._latency_sum_by_endpoint[endpoint]
-                / self._latency_count_by_endpoint[endpoint]
-                for endpoint in self._latency_sum_by_endpoint
-            }
-            uptime = int(time.time() - self._start_time)
-            return {
-                "uptimeSeconds": uptime,
-                "requests": {
-                    "total": self._requests_total,
-                    "byTenant": dict(self._requests_by_tenant),
-                    "byEndpoint": dict(self._requests_by_endpoint),
-                },
-                "latencyMs": {
-                    "avgOverall": avg_overall,
-                    "byEndpointAvg": by_endpoint_avg,
-                },
-                "errors": {
-                    "total": self._errors_total,
-                    "byStatus": dict(self._errors_by_status),
-                    "byTenant": dict(self._errors_by_tenant),
-                },
-            }
+            shards = list(self._shards)
+        oldest = window_oldest_slots(time.time())
+        merged = Counters()
+        totals: Dict[SeriesKey, LatencyHistogram] = {}
+        windows: Dict[str, Dict[SeriesKey, LatencyHistogram]] = {
+            name: {} for name in WINDOWS
+        }
+        for shard in shards:
+            with shard.lock:
+                merged.requests_total += shard.requests_total
+                _add(merged.requests_by_tenant, shard.requests_by_tenant)
+                _add(merged.requests_by_endpoint, shard.requests_by_endpoint)
+                merged.latency_sum_total += shard.latency_sum_total
+                _add(merged.latency_sum_by_endpoint, shard.latency_sum_by_endpoint)
+                merged.errors_total += shard.errors_total
+                _add(merged.errors_by_status, shard.errors_by_status)
+                _add(merged.errors_by_tenant, shard.errors_by_tenant)
+                merged.cache_hits += shard.cache_hits
+                merged.cache_misses += shard.cache_misses
+                merged.cache_evictions += shard.cache_evictions
+                _add(merged.admission, shard.admission)
+                _add(merged.ingest, shard.ingest)
+                _add(merged.shed_by_tenant, shard.shed_by_tenant)
+                for key, series in shard.series.items():
+                    totals.setdefault(key, LatencyHistogram()).merge(series.total)
+                    for name, window in windows.items():
+                        series.merge_window(
+                            window.setdefault(key, LatencyHistogram()), oldest[name]
+                        )
+
+        overall = totals.get(OVERALL, LatencyHistogram())
+        worker = worker_view(
+            os.getpid(),
+            self._start_time,
+            merged.requests_total,
+            merged.errors_total,
+            overall,
+            self._cache_entries,
+            self._cache_bytes,
+        )
+        return render_snapshot(
+            merged,
+            totals,
+            windows,
+            self._cache_entries,
+            self._cache_bytes,
+            self._start_time,
+            {
+                "count": 1,
+                "byWorker": {str(os.getpid()): worker},
+                "retired": {"workers": 0, "requests": 0, "errors": 0},
+            },
+        )
+
+
+def window_oldest_slots(now: float) -> Dict[str, int]:
+    """First slot id still inside each reporting window at time ``now``."""
+    now_slot = int(now) // WINDOW_SLOT_SECONDS
+    return {
+        name: now_slot - seconds // WINDOW_SLOT_SECONDS + 1
+        for name, seconds in WINDOWS.items()
+    }
+
+
+def worker_view(
+    pid: int,
+    started_at: float,
+    requests: int,
+    errors: int,
+    overall: LatencyHistogram,
+    cache_entries: int,
+    cache_bytes: int,
+) -> dict:
+    return {
+        "pid": pid,
+        "startedAt": started_at,
+        "requests": requests,
+        "errors": errors,
+        "latencyMs": overall.summary(),
+        "cache": {"entries": cache_entries, "bytes": cache_bytes},
+    }
+
+
+def render_snapshot(
+    merged: Counters,
+    totals: Dict[SeriesKey, LatencyHistogram],
+    windows: Dict[str, Dict[SeriesKey, LatencyHistogram]],
+    cache_entries: int,
+    cache_bytes: int,
+    start_time: float,
+    workers: dict,
+) -> dict:
+    """Build the ``MetricsResponse`` counters from merged per-thread or per-worker data."""
+    avg_overall = (
+        merged.latency_sum_total / merged.requests_total
+        if merged.requests_total
+        else 0.0
+    )
+    by_endpoint_avg = {
+        endpoint: merged.latency_sum_by_endpoint[endpoint]
+        / merged.requests_by_endpoint[endpoint]
+        for endpoint in merged.latency_sum_by_endpoint
+        if merged.requests_by_endpoint.get(endpoint)
+    }
+    ingested = sum(merged.ingest.values())
+    duplicates = merged.ingest.get("duplicate", 0)
+    uptime = int(time.time() - start_time)
+    latency = {
+        "avgOverall": avg_overall,
+        "byEndpointAvg": by_endpoint_avg,
+        **_quantile_views(totals),
+        "windows": {name: _quantile_views(window) for name, window in windows.items()},
+    }
+    return {
+        "uptimeSeconds": uptime,
+        "requests": {
+            "total": merged.requests_total,
+            "byTenant": merged.requests_by_tenant,
+            "byEndpoint": merged.requests_by_endpoint,
+        },
+        "latencyMs": latency,
+        "errors": {
+            "total": merged.errors_total,
+            "byStatus": merged.errors_by_status,
+            "byTenant": merged.errors_by_tenant,
+        },
+        "cache": {
+            "hits": merged.cache_hits,
+            "misses": merged.cache_misses,
+            "evictions": merged.cache_evictions,
+            "entries": cache_entries,
+            "bytes": cache_bytes,
+        },
+        "admission": {
+            "admitted": merged.admission.get("admitted", 0),
+            "queued": merged.admission.get("queued", 0),
+            "rateLimited": merged.admission.get("rate_limited", 0),
+            "overloaded": merged.admission.get("overloaded", 0),
+            "shedByTenant": merged.shed_by_tenant,
+        },
+        "ingest": {
+            "created": merged.ingest.get("created", 0),
+            "duplicates": duplicates,
+            "replaced": merged.ingest.get("replaced", 0),
+            "dedupHitRate": duplicates / ingested if ingested else 0.0,
+        },
+        "workers": workers,
+    }
+
 
+def _quantile_views(histograms: Dict[SeriesKey, LatencyHistogram]) -> dict:
+    views: dict = {
+        "overall": LatencyHistogram().summary(),
+        "byEndpoint": {},
+        "byTenant": {},
+    }
+    for (kind, name), histogram in histograms.items():
+        if not histogram.count:
+            continue
+        if kind == "overall":
+            views["overall"] = histogram.summary()
+        elif kind == "endpoint":
+            views["byEndpoint"][name] = histogram.summary()
+        else:
+            views["byTenant"][name] = histogram.summary()
+    return views
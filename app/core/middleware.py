@@ -0,0 +1,106 @@
+import json
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from app.core.logging import log_request
+from app.core.metrics import MetricsCollector
+
+_REQUEST_ID_HEADER = b"x-request-id"
+_ERROR_BODY = json.dumps({"detail": "Internal Server Error"}).encode("utf-8")
+
+
+def _endpoint_label(scope: dict) -> str:
+    route = scope.get("route")
+    if route and hasattr(route, "path"):
+        return f"{scope['method']} {route.path}"
+    return f"{scope['method']} {scope['path']}"
+
+
+def _tenant_id(scope: dict) -> Optional[str]:
+    path_params = scope.get("path_params")
+    return path_params.get("tenantId") if path_params else None
+
+
+def _request_id(scope: dict) -> str:
+    for name, value in scope["headers"]:
+        if name == _REQUEST_ID_HEADER:
+            if value:
+                return value.decode("latin-1")
+            break
+    return str(uuid.uuid4())
+
+
+class RequestContextMiddleware:
+    """Raw ASGI middleware: request IDs, latency metrics and request logging.
+
+    Works on ``scope``/``send`` directly instead of ``BaseHTTPMiddleware`` so
+    there is no extra task, stream wrapper or ``Request`` object per request.
+    Unhandled exceptions become a JSON 500 if no response has started yet.
+    """
+
+    def __init__(self, app: Callable, metrics: MetricsCollector) -> None:
+        self.app = app
+        self._metrics = metrics
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(scope)
+        request_id_header = (_REQUEST_ID_HEADER, request_id.encode("latin-1"))
+        start = time.perf_counter()
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message: dict[str, Any]) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                headers = [
+                    header
+                    for header in message.get("headers", [])
+                    if header[0].lower() != _REQUEST_ID_HEADER
+                ]
+                headers.append(request_id_header)
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            if response_started:
+                raise
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 500,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(_ERROR_BODY)).encode("latin-1")),
+                        request_id_header,
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": _ERROR_BODY})
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            endpoint_label = _endpoint_label(scope)
+            tenant_id = _tenant_id(scope)
+            self._metrics.record_request(
+                endpoint_label, tenant_id, status_code, latency_ms
+            )
+            log_request(
+                {
+                    "request_id": request_id,
+                    "tenant_id": tenant_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "latency_ms": latency_ms,
+                },
+                endpoint=endpoint_label,
+            )
@@ -0,0 +1,206 @@
+from typing import Dict, Iterable, List, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_QUANTILES = (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+
+    def metric(
+        self, name: str, kind: str, help_text: str, samples: Iterable[Sample]
+    ) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{name}{_format_labels(labels)} {float(value)!r}")
+
+    def summary(self, name: str, help_text: str, label: str, summaries: dict) -> None:
+        samples: List[Sample] = []
+        counts: List[Sample] = []
+        for key, summary in summaries.items():
+            base = {label: key} if label else {}
+            for quantile, field in _QUANTILES:
+                samples.append(({**base, "quantile": quantile}, summary[field]))
+            counts.append((base, summary["count"]))
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} summary")
+        for labels, value in samples:
+            self.lines.append(f"{name}{_format_labels(labels)} {float(value)!r}")
+        for labels, value in counts:
+            self.lines.append(f"{name}_count{_format_labels(labels)} {float(value)!r}")
+
+
+def render(snapshot: dict) -> str:
+    """Render the JSON metrics snapshot in Prometheus text exposition format."""
+    out = _Writer()
+    requests = snapshot["requests"]
+    errors = snapshot["errors"]
+    latency = snapshot["latencyMs"]
+    out.metric(
+        "knwl_uptime_seconds",
+        "gauge",
+        "Seconds since process start.",
+        [({}, snapshot["uptimeSeconds"])],
+    )
+    out.metric(
+        "knwl_requests_total",
+        "counter",
+        "HTTP requests by endpoint.",
+        [({"endpoint": key}, value) for key, value in requests["byEndpoint"].items()],
+    )
+    out.metric(
+        "knwl_tenant_requests_total",
+        "counter",
+        "HTTP requests by tenant.",
+        [({"tenant": key}, value) for key, value in requests["byTenant"].items()],
+    )
+    out.metric(
+        "knwl_errors_total",
+        "counter",
+        "HTTP error responses by status.",
+        [({"status": key}, value) for key, value in errors["byStatus"].items()],
+    )
+    out.metric(
+        "knwl_tenant_errors_total",
+        "counter",
+        "HTTP error responses by tenant.",
+        [({"tenant": key}, value) for key, value in errors["byTenant"].items()],
+    )
+    out.metric(
+        "knwl_worker_requests_total",
+        "counter",
+        "HTTP requests by live worker process.",
+        [
+            ({"pid": pid}, worker["requests"])
+            for pid, worker in snapshot["workers"]["byWorker"].items()
+        ],
+    )
+    out.summary(
+        "knwl_request_latency_ms",
+        "Request latency by endpoint.",
+        "endpoint",
+        latency["byEndpoint"],
+    )
+    out.summary(
+        "knwl_tenant_request_latency_ms",
+        "Request latency by tenant.",
+        "tenant",
+        latency["byTenant"],
+    )
+    documents = snapshot["documents"]
+    out.metric(
+        "knwl_documents",
+        "gauge",
+        "Stored documents by tenant.",
+        [({"tenant": key}, value) for key, value in documents["byTenant"].items()],
+    )
+    out.metric(
+        "knwl_content_bytes",
+        "gauge",
+        "Stored document content bytes by tenant.",
+        [
+            ({"tenant": key}, value)
+            for key, value in documents["contentBytesByTenant"].items()
+        ],
+    )
+    cache = snapshot["cache"]
+    out.metric(
+        "knwl_search_cache_lookups_total",
+        "counter",
+        "Search cache lookups.",
+        [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])],
+    )
+    out.metric(
+        "knwl_search_cache_evictions_total",
+        "counter",
+        "Search cache evictions.",
+        [({}, cache["evictions"])],
+    )
+    out.metric(
+        "knwl_search_cache_bytes",
+        "gauge",
+        "Estimated search cache memory.",
+        [({}, cache["bytes"])],
+    )
+    pool = snapshot["db"]["pool"]
+    out.metric(
+        "knwl_db_pool_connections",
+        "gauge",
+        "Reader connections by state.",
+        [({"state": "open"}, pool["open"]), ({"state": "idle"}, pool["idle"])],
+    )
+    out.metric(
+        "knwl_db_pool_timeouts_total",
+        "counter",
+        "Reader checkouts that timed out.",
+        [({}, pool["timeouts"])],
+    )
+    admission = snapshot["admission"]
+    out.metric(
+        "knwl_admission_shed_total",
+        "counter",
+        "Requests rejected by admission control.",
+        [
+            ({"reason": "rate_limited"}, admission["rateLimited"]),
+            ({"reason": "overloaded"}, admission["overloaded"]),
+        ],
+    )
+    out.metric(
+        "knwl_admission_queued_total",
+        "counter",
+        "Requests that waited for a global concurrency slot.",
+        [({}, admission["queued"])],
+    )
+    ingest = snapshot["ingest"]
+    out.metric(
+        "knwl_ingest_queue_depth",
+        "gauge",
+        "Documents waiting for group commit.",
+        [({}, ingest["queueDepth"])],
+    )
+    out.metric(
+        "knwl_ingest_documents_total",
+        "counter",
+        "Ingested documents by deduplication outcome.",
+        [
+            ({"outcome": "created"}, ingest["created"]),
+            ({"outcome": "duplicate"}, ingest["duplicates"]),
+            ({"outcome": "replaced"}, ingest["replaced"]),
+        ],
+    )
+    out.metric(
+        "knwl_ingest_commits_total",
+        "counter",
+        "Group commits by batch size bucket.",
+        [({"batch_size": key}, value) for key, value in ingest["batchSizes"].items()],
+    )
+    fts = snapshot["fts"]
+    out.metric(
+        "knwl_fts_segments",
+        "gauge",
+        "FTS5 index segments per shard as of the last maintenance pass.",
+        [({"shard": path}, count) for path, count in fts["segments"]["byShard"].items()],
+    )
+    out.metric(
+        "knwl_fts_merge_steps_total",
+        "counter",
+        "Incremental FTS5 merge steps run by background maintenance.",
+        [({}, fts["mergeSteps"])],
+    )
+    return "\n".join(out.lines) + "\n"
@@ -0,0 +1,99 @@
+import json
+from json.encoder import encode_basestring
+from typing import Any, Dict, List, Optional
+
+import pydantic_core
+from fastapi.responses import Response
+
+# Output is byte-for-byte the JSON pydantic-core writes for the response
+# models: compact separators, non-ASCII left unescaped, fields in model
+# declaration order.
+
+
+def _float(value: float) -> str:
+    text = repr(value)
+    # repr and pydantic-core agree on plain decimals; exponents and inf/nan
+    # are formatted differently, so those go through pydantic-core.
+    if "e" in text or "n" in text:
+        return pydantic_core.to_json(value).decode()
+    return text
+
+
+def compact_tags(stored: str) -> str:
+    """Compact JSON array text for a ``tags`` column value (``json(tags)``).
+
+    SQLite's ``json()`` already drops the whitespace ``json.dumps`` wrote; only
+    arrays with escapes (non-ASCII was stored as ``\\uXXXX``) are re-encoded.
+    """
+    if "\\" not in stored:
+        return stored
+    return json.dumps(json.loads(stored), ensure_ascii=False, separators=(",", ":"))
+
+
+def _result(item: Dict[str, Any]) -> str:
+    return (
+        f'{{"documentId":{encode_basestring(item["documentId"])},'
+        f'"title":{encode_basestring(item["title"])},'
+        f'"snippet":{encode_basestring(item["snippet"])},'
+        f'"tags":{item["tags"]},'
+        f'"score":{_float(item["score"])},'
+        f'"createdAt":{encode_basestring(item["createdAt"])}}}'
+    )
+
+
+def _facets(facets: Optional[Dict[str, List[Dict[str, Any]]]]) -> str:
+    if facets is None:
+        return "null"
+    fields = ",".join(
+        f"{encode_basestring(name)}:["
+        + ",".join(
+            f'{{"value":{encode_basestring(entry["value"])},"count":{int(entry["count"])}}}'
+            for entry in counts
+        )
+        + "]"
+        for name, counts in facets.items()
+    )
+    return f"{{{fields}}}"
+
+
+def export_line(item: Dict[str, Any]) -> str:
+    """One NDJSON line of a document export (see ``repo.export_documents``)."""
+    source_id = item["sourceId"]
+    return (
+        f'{{"documentId":{encode_basestring(item["documentId"])},'
+        f'"title":{encode_basestring(item["title"])},'
+        f'"content":{encode_basestring(item["content"])},'
+        f'"tags":{item["tags"]},'
+        f'"sourceId":{"null" if source_id is None else encode_basestring(source_id)},'
+        f'"createdAt":{encode_basestring(item["createdAt"])},'
+        f'"updatedAt":{encode_basestring(item["updatedAt"])}}}\n'
+    )
+
+
+def render_search_response(
+    tenant_id: str,
+    query: str,
+    limit: int,
+    offset: int,
+    total: int,
+    total_is_estimate: bool,
+    results: List[Dict[str, Any]],
+    next_cursor: Optional[str],
+    facets: Optional[Dict[str, List[Dict[str, Any]]]],
+) -> Response:
+    """Encode a ``SearchResponse`` body directly from search page rows.
+
+    The rows are trusted (they come from the repo layer, not from clients), so
+    they are not validated into models first; ``tags`` must already be compact
+    JSON array text (see ``compact_tags``) and is spliced in verbatim.
+    """
+    body = (
+        f'{{"tenantId":{encode_basestring(tenant_id)},'
+        f'"query":{encode_basestring(query)},'
+        f'"limit":{int(limit)},"offset":{int(offset)},"total":{int(total)},'
+        f'"totalIsEstimate":{"true" if total_is_estimate else "false"},'
+        f'"results":[{",".join(_result(item) for item in results)}],'
+        f'"nextCursor":{"null" if next_cursor is None else encode_basestring(next_cursor)},'
+        f'"facets":{_facets(facets)}}}'
+    )
+    return Response(body.encode("utf-8"), media_type="application/json")
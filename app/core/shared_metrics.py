@@ -0,0 +1,495 @@
+import fcntl
+import glob
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.metrics import (
+    ADMISSION_OUTCOMES,
+    HIST_BUCKETS,
+    INGEST_OUTCOMES,
+    OVERALL,
+    WINDOW_SLOT_SECONDS,
+    WINDOW_SLOTS,
+    WINDOWS,
+    Counters,
+    LatencyHistogram,
+    SeriesKey,
+    bucket_index,
+    render_snapshot,
+    window_oldest_slots,
+    worker_view,
+)
+
+# Each worker process owns one fixed-layout file of 8-byte words, mapped with
+# mmap: a 4 KiB header, a name table and one row per (kind, label) series.
+# Only the owner writes its file, so there is no cross-process locking on the
+# request path; readers tolerate counters that are mid-update.
+_MAGIC = 0x31544D4C574E4B  # "KNWLMT1"
+_VERSION = 1
+_HEADER_BYTES = 4096
+_NAME_BYTES = 128
+
+_H_MAGIC = 0
+_H_VERSION = 1
+_H_PID = 2
+_H_STARTED_AT = 3  # float64
+_H_MAX_SERIES = 4
+_H_USED = 5
+_H_WORKERS = 6  # workers folded into a retired file
+_H_CACHE_ENTRIES = 7
+_H_CACHE_BYTES = 8
+_H_COUNTERS = 16
+
+_COUNTERS = (
+    "cache_hits",
+    "cache_misses",
+    "cache_evictions",
+    *(f"admission.{outcome}" for outcome in ADMISSION_OUTCOMES),
+    *(f"ingest.{outcome}" for outcome in INGEST_OUTCOMES),
+)
+_COUNTER_INDEX = {name: _H_COUNTERS + index for index, name in enumerate(_COUNTERS)}
+
+_KINDS = ("overall", "endpoint", "tenant", "status")
+_K_OVERALL, _K_ENDPOINT, _K_TENANT, _K_STATUS = range(len(_KINDS))
+_OVERFLOW = "_other"
+
+# Series row layout, in words. Float64 fields share the int64 word grid.
+_S_COUNT = 0
+_S_ERRORS = 1
+_S_SHED = 2
+_S_LATENCY_SUM = 3  # float64
+_S_MAX = 4  # float64
+_S_BUCKETS = 5
+_S_SLOT_IDS = _S_BUCKETS + HIST_BUCKETS
+_S_SLOT_COUNTS = _S_SLOT_IDS + WINDOW_SLOTS
+_S_SLOT_MAX = _S_SLOT_COUNTS + WINDOW_SLOTS  # float64
+_S_SLOT_BUCKETS = _S_SLOT_MAX + WINDOW_SLOTS
+_ROW_WORDS = _S_SLOT_BUCKETS + WINDOW_SLOTS * HIST_BUCKETS
+
+_ZERO_BUCKETS = memoryview(bytes(8 * HIST_BUCKETS)).cast("q")
+
+_RETIRED = "retired.metrics"
+
+
+def _file_size(max_series: int) -> int:
+    return _HEADER_BYTES + max_series * (_NAME_BYTES + _ROW_WORDS * 8)
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Region:
+    """One mapped metrics file. Sparse on disk: untouched rows cost nothing."""
+
+    def __init__(self, path: str, max_series: int = 0, pid: int = 0) -> None:
+        create = max_series > 0
+        fd = os.open(path, os.O_RDWR | (os.O_CREAT | os.O_TRUNC if create else 0), 0o644)
+        try:
+            if create:
+                os.ftruncate(fd, _file_size(max_series))
+            self._mm = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        self.path = path
+        self.words = memoryview(self._mm).cast("q")
+        self.floats = memoryview(self._mm).cast("d")
+        if create:
+            self.words[_H_MAX_SERIES] = max_series
+            self.words[_H_PID] = pid
+            self.floats[_H_STARTED_AT] = time.time()
+            self.words[_H_VERSION] = _VERSION
+            self.words[_H_MAGIC] = _MAGIC
+        elif self.words[_H_MAGIC] != _MAGIC or self.words[_H_VERSION] != _VERSION:
+            self.close()
+            raise ValueError(f"Not a metrics file: {path}")
+        self.max_series = self.words[_H_MAX_SERIES]
+        self._names_offset = _HEADER_BYTES
+        self._rows_word = (_HEADER_BYTES + self.max_series * _NAME_BYTES) // 8
+        self._index: Dict[Tuple[int, str], int] = {
+            key: row for row, key in enumerate(self.names())
+        }
+
+    def close(self) -> None:
+        self.words.release()
+        self.floats.release()
+        self._mm.close()
+
+    def names(self) -> List[Tuple[int, str]]:
+        names = []
+        for row in range(self.words[_H_USED]):
+            offset = self._names_offset + row * _NAME_BYTES
+            size = self._mm[offset + 1]
+            name = self._mm[offset + 2 : offset + 2 + size].decode("utf-8", "ignore")
+            names.append((self._mm[offset], name))
+        return names
+
+    def row(self, kind: int, name: str) -> int:
+        """Word offset of the series row for (kind, name), added on first use.
+
+        Once the table is nearly full, new labels share one ``_other`` row per
+        kind; the last ``len(_KINDS)`` rows are reserved for those.
+        """
+        index = self._index.get((kind, name))
+        if index is None:
+            used = self.words[_H_USED]
+            if used >= self.max_series - len(_KINDS) and name != _OVERFLOW:
+                return self.row(kind, _OVERFLOW)
+            encoded = name.encode("utf-8")[: _NAME_BYTES - 2]
+            offset = self._names_offset + used * _NAME_BYTES
+            self._mm[offset] = kind
+            self._mm[offset + 1] = len(encoded)
+            self._mm[offset + 2 : offset + 2 + len(encoded)] = encoded
+            # Publish the row only after its name is written.
+            self.words[_H_USED] = used + 1
+            index = self._index[(kind, name)] = used
+        return self._rows_word + index * _ROW_WORDS
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the header words and the used series rows."""
+        used = self.words[_H_USED]
+        header = np.frombuffer(self._mm, dtype=np.int64, count=_HEADER_BYTES // 8).copy()
+        rows = np.frombuffer(
+            self._mm,
+            dtype=np.int64,
+            count=used * _ROW_WORDS,
+            offset=self._rows_word * 8,
+        ).reshape(used, _ROW_WORDS).copy()
+        return header, rows
+
+
+def _fold(source: _Region, target: _Region) -> None:
+    """Add a finished worker's counters to the retired totals."""
+    header, rows = source.arrays()
+    floats = rows.view(np.float64)
+    words, target_floats = target.words, target.floats
+    for index in range(_H_COUNTERS, _H_COUNTERS + len(_COUNTERS)):
+        words[index] += int(header[index])
+    words[_H_WORKERS] += int(header[_H_WORKERS]) + 1
+    started = float(header[_H_STARTED_AT : _H_STARTED_AT + 1].view(np.float64)[0])
+    if not target_floats[_H_STARTED_AT] or started < target_floats[_H_STARTED_AT]:
+        target_floats[_H_STARTED_AT] = started
+    for (kind, name), row, row_floats in zip(source.names(), rows, floats):
+        base = target.row(kind, name)
+        for field in (_S_COUNT, _S_ERRORS, _S_SHED):
+            words[base + field] += int(row[field])
+        target_floats[base + _S_LATENCY_SUM] += float(row_floats[_S_LATENCY_SUM])
+        target_floats[base + _S_MAX] = max(
+            target_floats[base + _S_MAX], float(row_floats[_S_MAX])
+        )
+        for bucket in np.flatnonzero(row[_S_BUCKETS : _S_BUCKETS + HIST_BUCKETS]):
+            words[base + _S_BUCKETS + int(bucket)] += int(row[_S_BUCKETS + bucket])
+        for position in range(WINDOW_SLOTS):
+            slot_id = int(row[_S_SLOT_IDS + position])
+            current = words[base + _S_SLOT_IDS + position]
+            if not slot_id or slot_id < current:
+                continue
+            start = _S_SLOT_BUCKETS + position * HIST_BUCKETS
+            if slot_id > current:
+                words[base + _S_SLOT_IDS + position] = slot_id
+                words[base + _S_SLOT_COUNTS + position] = 0
+                target_floats[base + _S_SLOT_MAX + position] = 0.0
+                words[base + start : base + start + HIST_BUCKETS] = _ZERO_BUCKETS
+            words[base + _S_SLOT_COUNTS + position] += int(row[_S_SLOT_COUNTS + position])
+            target_floats[base + _S_SLOT_MAX + position] = max(
+                target_floats[base + _S_SLOT_MAX + position],
+                float(row_floats[_S_SLOT_MAX + position]),
+            )
+            for bucket in np.flatnonzero(row[start : start + HIST_BUCKETS]):
+                words[base + start + int(bucket)] += int(row[start + bucket])
+
+
+def _histogram(buckets: np.ndarray, count: int, maximum: float) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    nonzero = np.flatnonzero(buckets)
+    histogram.buckets = dict(zip(nonzero.tolist(), buckets[nonzero].tolist()))
+    histogram.count = count
+    histogram.max = maximum
+    return histogram
+
+
+class SharedMetricsCollector:
+    """``MetricsCollector`` for several worker processes sharing ``directory``.
+
+    Every worker records into its own memory-mapped file; ``snapshot`` reads
+    all of them and returns the same shape as ``MetricsCollector.snapshot``,
+    with a per-worker breakdown under ``workers``. Files of workers that
+    exited (cleanly via ``close`` or by crashing) are folded into
+    ``retired.metrics``, so totals survive worker restarts.
+    """
+
+    def __init__(self, directory: str, max_series: int, pid: Optional[int] = None) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._pid = pid if pid is not None else os.getpid()
+        self._max_series = max(len(_KINDS) * 2, max_series)
+        self._lock = threading.Lock()
+        self._lock_fd = os.open(os.path.join(directory, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        path = os.path.join(directory, f"worker-{self._pid}.metrics")
+        with self._file_lock(fcntl.LOCK_EX):
+            if os.path.exists(path):
+                # Left behind by an earlier process with the same pid.
+                self._retire(path)
+            self._region: Optional[_Region] = _Region(path, self._max_series, self._pid)
+        self._reap()
+
+    @contextmanager
+    def _file_lock(self, mode: int) -> Iterator[None]:
+        fcntl.flock(self._lock_fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _retire(self, path: str) -> None:
+        # Caller holds the exclusive file lock.
+        try:
+            source = _Region(path)
+        except ValueError:
+            os.unlink(path)
+            return
+        retired_path = os.path.join(self._directory, _RETIRED)
+        if os.path.exists(retired_path):
+            target = _Region(retired_path)
+        else:
+            target = _Region(retired_path, self._max_series)
+        try:
+            _fold(source, target)
+            target._mm.flush()
+        finally:
+            target.close()
+            source.close()
+        os.unlink(path)
+
+    def _reap(self) -> None:
+        dead = [
+            path
+            for path in glob.glob(os.path.join(self._directory, "worker-*.metrics"))
+            if not _alive(int(os.path.basename(path)[7:-8]))
+        ]
+        if not dead:
+            return
+        with self._file_lock(fcntl.LOCK_EX):
+            for path in dead:
+                if os.path.exists(path):
+                    self._retire(path)
+
+    def close(self) -> None:
+        with self._lock:
+            region, self._region = self._region, None
+        if region is None:
+            return
+        with self._file_lock(fcntl.LOCK_EX):
+            region.close()
+            self._retire(region.path)
+        os.close(self._lock_fd)
+
+    def _observe(self, base: int, latency_ms: float, bucket: int, slot_id: int) -> None:
+        words, floats = self._region.words, self._region.floats
+        words[base + _S_COUNT] += 1
+        floats[base + _S_LATENCY_SUM] += latency_ms
+        if latency_ms > floats[base + _S_MAX]:
+            floats[base + _S_MAX] = latency_ms
+        words[base + _S_BUCKETS + bucket] += 1
+        position = slot_id % WINDOW_SLOTS
+        start = base + _S_SLOT_BUCKETS + position * HIST_BUCKETS
+        if words[base + _S_SLOT_IDS + position] != slot_id:
+            words[start : start + HIST_BUCKETS] = _ZERO_BUCKETS
+            words[base + _S_SLOT_COUNTS + position] = 0
+            floats[base + _S_SLOT_MAX + position] = 0.0
+            words[base + _S_SLOT_IDS + position] = slot_id
+        words[base + _S_SLOT_COUNTS + position] += 1
+        if latency_ms > floats[base + _S_SLOT_MAX + position]:
+            floats[base + _S_SLOT_MAX + position] = latency_ms
+        words[start + bucket] += 1
+
+    def record_request(
+        self,
+        endpoint: str,
+        tenant_id: Optional[str],
+        status_code: int,
+        latency_ms: float,
+    ) -> None:
+        bucket = bucket_index(latency_ms)
+        slot_id = int(time.time()) // WINDOW_SLOT_SECONDS
+        with self._lock:
+            region = self._region
+            if region is None:
+                return
+            overall = region.row(_K_OVERALL, "")
+            self._observe(overall, latency_ms, bucket, slot_id)
+            self._observe(region.row(_K_ENDPOINT, endpoint), latency_ms, bucket, slot_id)
+            tenant = region.row(_K_TENANT, tenant_id) if tenant_id else None
+            if tenant is not None:
+                self._observe(tenant, latency_ms, bucket, slot_id)
+            if status_code >= 400:
+                region.words[overall + _S_ERRORS] += 1
+                region.words[region.row(_K_STATUS, str(status_code)) + _S_ERRORS] += 1
+                if tenant is not None:
+                    region.words[tenant + _S_ERRORS] += 1
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            if self._region is not None:
+                self._region.words[_COUNTER_INDEX[name]] += amount
+
+    def record_cache_lookup(self, hit: bool) -> None:
+        self._count("cache_hits" if hit else "cache_misses")
+
+    def record_cache_store(self, evicted: int, entries: int, size_bytes: int) -> None:
+        with self._lock:
+            if self._region is None:
+                return
+            self._region.words[_COUNTER_INDEX["cache_evictions"]] += evicted
+            self._region.words[_H_CACHE_ENTRIES] = entries
+            self._region.words[_H_CACHE_BYTES] = size_bytes
+
+    def record_admission(self, tenant_id: str, outcome: str) -> None:
+        with self._lock:
+            if self._region is None:
+                return
+            self._region.words[_COUNTER_INDEX[f"admission.{outcome}"]] += 1
+            if outcome in ("rate_limited", "overloaded"):
+                self._region.words[self._region.row(_K_TENANT, tenant_id) + _S_SHED] += 1
+
+    def record_ingest(self, outcome: str, count: int = 1) -> None:
+        self._count(f"ingest.{outcome}", count)
+
+    def _read_all(self) -> List[Tuple[str, np.ndarray, np.ndarray, List[Tuple[int, str]]]]:
+        files = []
+        with self._file_lock(fcntl.LOCK_SH):
+            paths = sorted(glob.glob(os.path.join(self._directory, "worker-*.metrics")))
+            retired = os.path.join(self._directory, _RETIRED)
+            if os.path.exists(retired):
+                paths.append(retired)
+            for path in paths:
+                try:
+                    region = _Region(path)
+                except (FileNotFoundError, ValueError):
+                    continue
+                try:
+                    header, rows = region.arrays()
+                    files.append((path, header, rows, region.names()[: len(rows)]))
+                finally:
+                    region.close()
+        return files
+
+    def snapshot(self) -> dict:
+        self._reap()
+        now = time.time()
+        oldest = window_oldest_slots(now)
+        now_slot = int(now) // WINDOW_SLOT_SECONDS
+        merged = Counters()
+        totals: Dict[SeriesKey, LatencyHistogram] = {}
+        windows: Dict[str, Dict[SeriesKey, LatencyHistogram]] = {
+            name: {} for name in WINDOWS
+        }
+        by_worker: Dict[str, dict] = {}
+        retired = {"workers": 0, "requests": 0, "errors": 0}
+        cache_entries = cache_bytes = 0
+        start_time = now
+        for path, header, rows, names in self._read_all():
+            floats = rows.view(np.float64)
+            for name in _COUNTERS:
+                value = int(header[_COUNTER_INDEX[name]])
+                if name.startswith("admission."):
+                    merged.admission[name[10:]] = merged.admission.get(name[10:], 0) + value
+                elif name.startswith("ingest."):
+                    merged.ingest[name[7:]] = merged.ingest.get(name[7:], 0) + value
+            merged.cache_hits += int(header[_COUNTER_INDEX["cache_hits"]])
+            merged.cache_misses += int(header[_COUNTER_INDEX["cache_misses"]])
+            merged.cache_evictions += int(header[_COUNTER_INDEX["cache_evictions"]])
+            overall = LatencyHistogram()
+            requests = errors = 0
+            for (kind_index, label), row, row_floats in zip(names, rows, floats):
+                kind = _KINDS[kind_index]
+                key: SeriesKey = OVERALL if kind == "overall" else (kind, label)
+                count = int(row[_S_COUNT])
+                if kind == "status":
+                    merged.errors_by_status[label] = (
+                        merged.errors_by_status.get(label, 0) + int(row[_S_ERRORS])
+                    )
+                    continue
+                histogram = _histogram(
+                    row[_S_BUCKETS : _S_BUCKETS + HIST_BUCKETS],
+                    count,
+                    float(row_floats[_S_MAX]),
+                )
+                totals.setdefault(key, LatencyHistogram()).merge(histogram)
+                for position in range(WINDOW_SLOTS):
+                    slot_id = int(row[_S_SLOT_IDS + position])
+                    if not slot_id or slot_id > now_slot:
+                        continue
+                    start = _S_SLOT_BUCKETS + position * HIST_BUCKETS
+                    slot = _histogram(
+                        row[start : start + HIST_BUCKETS],
+                        int(row[_S_SLOT_COUNTS + position]),
+                        float(row_floats[_S_SLOT_MAX + position]),
+                    )
+                    for window, first_slot in oldest.items():
+                        if slot_id >= first_slot:
+                            windows[window].setdefault(key, LatencyHistogram()).merge(slot)
+                if kind == "overall":
+                    overall = histogram
+                    requests, errors = count, int(row[_S_ERRORS])
+                    merged.requests_total += count
+                    merged.latency_sum_total += float(row_floats[_S_LATENCY_SUM])
+                    merged.errors_total += errors
+                elif kind == "endpoint":
+                    merged.requests_by_endpoint[label] = (
+                        merged.requests_by_endpoint.get(label, 0) + count
+                    )
+                    merged.latency_sum_by_endpoint[label] = merged.latency_sum_by_endpoint.get(
+                        label, 0.0
+                    ) + float(row_floats[_S_LATENCY_SUM])
+                else:
+                    for target, value in (
+                        (merged.requests_by_tenant, count),
+                        (merged.errors_by_tenant, int(row[_S_ERRORS])),
+                        (merged.shed_by_tenant, int(row[_S_SHED])),
+                    ):
+                        if value:
+                            target[label] = target.get(label, 0) + value
+            if os.path.basename(path) == _RETIRED:
+                retired = {
+                    "workers": int(header[_H_WORKERS]),
+                    "requests": requests,
+                    "errors": errors,
+                }
+                continue
+            started_at = float(header[_H_STARTED_AT : _H_STARTED_AT + 1].view(np.float64)[0])
+            start_time = min(start_time, started_at)
+            cache_entries += int(header[_H_CACHE_ENTRIES])
+            cache_bytes += int(header[_H_CACHE_BYTES])
+            by_worker[str(int(header[_H_PID]))] = worker_view(
+                int(header[_H_PID]),
+                started_at,
+                requests,
+                errors,
+                overall,
+                int(header[_H_CACHE_ENTRIES]),
+                int(header[_H_CACHE_BYTES]),
+            )
+        return render_snapshot(
+            merged,
+            totals,
+            windows,
+            cache_entries,
+            cache_bytes,
+            start_time,
+            {"count": len(by_worker), "byWorker": by_worker, "retired": retired},
+        )
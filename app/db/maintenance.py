@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.db.sqlite import ConnectionManager, ShardRouter
+
+logger = logging.getLogger("app.maintenance")
+
+# FTS5 keeps its segment list in one record of the %_data table.
+_STRUCTURE_ROWID = 10
+_STRUCTURE_V2 = b"\xff\x00\x00\x01"
+
+
+def configure_fts(conn, automerge: int, crisismerge: int, usermerge: int) -> None:
+    """Persist FTS5 merge tuning in the index's config table.
+
+    Options that already hold the requested value are not rewritten, so a
+    restart with unchanged settings opens no write transaction.
+    """
+    current = {
+        row[0]: row[1]
+        for row in conn.execute("SELECT k, v FROM documents_fts_config")
+    }
+    changed = False
+    for option, value in (
+        ("automerge", automerge),
+        ("crisismerge", crisismerge),
+        ("usermerge", usermerge),
+    ):
+        if current.get(option) == value:
+            continue
+        conn.execute(
+            "INSERT INTO documents_fts(documents_fts, rank) VALUES (?, ?)",
+            (option, value),
+        )
+        changed = True
+    if changed:
+        conn.commit()
+
+
+def segment_count(conn) -> int:
+    """Exact segment count from a scan of the whole FTS index."""
+    row = conn.execute("SELECT COUNT(DISTINCT segid) FROM documents_fts_idx").fetchone()
+    return int(row[0]) if row else 0
+
+
+def structure_segment_count(conn) -> int:
+    """Segment count from the FTS5 structure record: one row read.
+
+    The record starts with a 4-byte cookie, an optional version marker, then
+    the level and segment counts as SQLite varints.
+    """
+    row = conn.execute(
+        "SELECT block FROM documents_fts_data WHERE id = ?", (_STRUCTURE_ROWID,)
+    ).fetchone()
+    if row is None:
+        return 0
+    data = bytes(row[0])
+    position = 4
+    if data[position : position + 4] == _STRUCTURE_V2:
+        position += 4
+    _, position = _varint(data, position)
+    segments, _ = _varint(data, position)
+    return segments
+
+
+def _varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = 0
+    for index in range(8):
+        byte = data[position + index]
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, position + index + 1
+    return (value << 8) | data[position + 8], position + 9
+
+
+def merge_step(db: ConnectionManager, pages: int) -> bool:
+    """Run one incremental FTS5 merge; return True if it did any work."""
+    with db.writer(background=True) as conn:
+        before = conn.total_changes
+        conn.execute(
+            "INSERT INTO documents_fts(documents_fts, rank) VALUES ('merge', ?)",
+            (pages,),
+        )
+        conn.commit()
+        # FTS5 reports work done through the change counter (>= 2 means merged).
+        return conn.total_changes - before >= 2
+
+
+def optimize(db: ConnectionManager) -> None:
+    with db.writer(background=True) as conn:
+        conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+        conn.commit()
+
+
+class FtsMaintenance:
+    """Background thread that merges FTS5 segments while writes are idle.
+
+    Every ``interval_s`` it visits each open shard that has seen no writes for
+    ``idle_ms`` and runs ``merge`` steps of ``merge_pages`` pages until the index
+    has nothing left to merge or ``budget_ms`` for the pass is used up. A shard
+    whose merges ran out is skipped until it is written again, and the
+    per-shard segment gauge is read from the FTS structure record; only passes
+    started from the admin endpoint scan the index for an exact count.
+    """
+
+    def __init__(
+        self,
+        db: ShardRouter,
+        interval_s: float,
+        idle_ms: int,
+        budget_ms: int,
+        merge_pages: int,
+    ) -> None:
+        self._db = db
+        self._interval_s = interval_s
+        self._idle_s = idle_ms / 1000.0
+        self._budget_s = budget_ms / 1000.0
+        self._merge_pages = merge_pages
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._runs = 0
+        self._merge_steps = 0
+        self._last_run: Optional[dict] = None
+        self._segments: dict = {}
+        # Shard path -> last_write at which merging found nothing left to do.
+        self._settled: Dict[str, float] = {}
+
+    def start(self) -> None:
+        if self._interval_s <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._loop, name="fts-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.run_pass()
+            except Exception:
+                logger.exception("FTS maintenance pass failed")
+
+    def run_pass(self, force: bool = False, full_optimize: bool = False) -> dict:
+        """Run one pass over open shards; ``force`` ignores the idle check."""
+        started = time.monotonic()
+        deadline = started + self._budget_s
+        steps = 0
+        skipped_busy = 0
+        segments: dict = {}
+
+        def visit(db: ConnectionManager) -> None:
+            nonlocal steps, skipped_busy
+            last_write = db.last_write
+            if full_optimize:
+                optimize(db)
+            elif not force and time.monotonic() - last_write < self._idle_s:
+                skipped_busy += 1
+            elif force or self._settled.get(db.db_path) != last_write:
+                while time.monotonic() < deadline and not self._stop.is_set():
+                    if not merge_step(db, self._merge_pages):
+                        self._settled[db.db_path] = last_write
+                        break
+                    steps += 1
+            count = segment_count if force else structure_segment_count
+            with db.reader() as conn:
+                segments[db.db_path] = count(conn)
+
+        self._db.map_open_shards(visit)
+        run = {
+            "startedAt": time.time(),
+            "durationMs": (time.monotonic() - started) * 1000,
+            "mergeSteps": steps,
+            "skippedBusyShards": skipped_busy,
+            "optimized": full_optimize,
+        }
+        with self._lock:
+            self._runs += 1
+            self._merge_steps += steps
+            self._last_run = run
+            self._segments.update(segments)
+        return run
+
+    def stats(self) -> dict:
+        with self._lock:
+            segments: List[int] = list(self._segments.values())
+            return {
+                "runs": self._runs,
+                "mergeSteps": self._merge_steps,
+                "lastRun": self._last_run,
+                "segments": {
+                    "total": sum(segments),
+                    "maxPerShard": max(segments, default=0),
+                    "byShard": dict(self._segments),
+                },
+            }
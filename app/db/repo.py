@@ -1,8 +1,16 @@
+import hashlib
+import itertools
 import json
-import threading
+import sqlite3
+import time
 import uuid
 from datetime import datetime, timezone
-from typing import Any, List, Tuple
+from functools import lru_cache
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.serialization import compact_tags
+from app.db.schema import tenant_match
+from app.db.sqlite import ConnectionManager
 
 
 def _now_iso() -> str:
@@ -14,100 +22,758 @@ def _now_iso() -> str:
     )
 
 
+# Outcomes of ingest and update writes.
+CREATED = "created"
+DUPLICATE = "duplicate"
+REPLACED = "replaced"
+UNCHANGED = "unchanged"
+
+# (tenant_id, title, content, tags, source_id, idempotency_key)
+IngestItem = Tuple[str, str, str, List[str], Optional[str], Optional[str]]
+# Operations for write_documents:
+#   ("ingest", IngestItem)
+#   ("update", (tenant_id, document_id, {"title"?, "content"?, "tags"?}))
+#   ("delete", (tenant_id, document_id))
+WriteOp = Tuple[str, tuple]
+# A row removed by a write: (rowid, title, content). Derived indexes use it to
+# drop the old version.
+RemovedDocument = Tuple[int, str, str]
+
+_INSERT_SQL = """
+INSERT INTO documents (rowid, tenant_id, document_id, title, content, tags, created_at,
+                       updated_at, source_id, idempotency_key, content_hash)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with a different document."""
+
+
+def content_hash(title: str, content: str, tags_json: str) -> str:
+    digest = hashlib.sha256()
+    for part in (title, content, tags_json):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
 def insert_document(
-    conn,
-    lock: threading.Lock,
+    db: ConnectionManager,
     tenant_id: str,
     title: str,
     content: str,
     tags: List[str],
 ) -> Tuple[str, str]:
-    document_id = str(uuid.uuid4())
-    created_at = _now_iso()
-    tags_json = json.dumps(tags)
-    with lock:
+    return insert_tenant_documents(db, [(tenant_id, title, content, tags)])[0]
+
+
+def insert_documents(
+    db: ConnectionManager,
+    tenant_id: str,
+    documents: List[Tuple[str, str, List[str]]],
+) -> List[Tuple[str, str]]:
+    return insert_tenant_documents(
+        db, [(tenant_id, title, content, tags) for title, content, tags in documents]
+    )
+
+
+def insert_tenant_documents(
+    db: ConnectionManager,
+    documents: List[Tuple[str, str, str, List[str]]],
+) -> List[Tuple[str, str]]:
+    ingested, _ = ingest_tenant_documents(
+        db,
+        [
+            (tenant_id, title, content, tags, None, None)
+            for tenant_id, title, content, tags in documents
+        ],
+    )
+    return [(document_id, created_at) for document_id, created_at, _ in ingested]
+
+
+def ingest_tenant_documents(
+    db: ConnectionManager,
+    documents: List[IngestItem],
+) -> Tuple[List[Tuple[str, str, str]], List[RemovedDocument]]:
+    """Ingest documents in one transaction; see ``write_documents``."""
+    written = write_documents(db, [("ingest", document) for document in documents])
+    results = [result for result, _ in written]
+    return results, [row for _, removed in written for row in removed]
+
+
+def write_documents(
+    db: ConnectionManager, ops: List[WriteOp]
+) -> List[Tuple[Any, List[RemovedDocument]]]:
+    """Apply ``ops`` in order in one transaction; return (result, removed rows)
+    per op.
+
+    ``ingest`` results are (documentId, createdAt, outcome). Documents with
+    neither a source id nor an idempotency key are plain inserts. Otherwise
+    the key, then the source id, is looked up first:
+
+    - same key, same content hash -> the existing document (``DUPLICATE``)
+    - same key, different hash -> ``IdempotencyConflict``
+    - same source id, same hash -> the existing document (``DUPLICATE``)
+    - same source id, different hash -> the row is replaced (``REPLACED``)
+
+    ``update`` results are (documentId, createdAt, updatedAt, outcome), or None
+    if the document does not exist. Fields not given keep their values; if
+    the content hash is unchanged nothing is written (``UNCHANGED``).
+
+    ``delete`` results are whether the document existed.
+
+    Duplicates and unchanged updates write nothing, so the FTS triggers never
+    run for them. A replacement is one UPDATE of the row that keeps its
+    documentId and createdAt. If the title or content changed, the row also
+    gets a new rowid, so rowid-watermarked indexes (vectors, suggest
+    vocabularies) pick it up like any new document, and the removed rows let
+    them drop the old version. A tag-only change keeps the rowid, skips FTS
+    and removes nothing.
+    """
+    if not ops:
+        return []
+    now = _now_iso()
+    written: List[Tuple[Any, List[RemovedDocument]]] = []
+    with db.writer() as conn:
+        try:
+            # Take the database write lock before reading anything: rowid
+            # allocation and key lookups must not race another process's
+            # writer between the read and the insert.
+            conn.execute("BEGIN IMMEDIATE;")
+            rowids = itertools.count(_next_rowid(conn))
+            for kind, group in itertools.groupby(ops, key=lambda op: op[0]):
+                args = [op[1] for op in group]
+                if kind == "ingest":
+                    written.extend(_ingest(conn, args, rowids, now))
+                elif kind == "update":
+                    written.extend(_update(conn, arg, rowids, now) for arg in args)
+                elif kind == "delete":
+                    written.extend(_delete(conn, arg) for arg in args)
+                else:
+                    raise ValueError(f"Unknown write operation: {kind}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return written
+
+
+def _next_rowid(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        """
+        SELECT max(
+          coalesce((SELECT max(rowid) FROM documents), 0),
+          coalesce((SELECT max_deleted FROM documents_rowid_floor), 0)
+        ) + 1;
+        """
+    ).fetchone()
+    return int(row[0])
+
+
+def _ingest(
+    conn: sqlite3.Connection,
+    documents: List[IngestItem],
+    rowids: Iterator[int],
+    now: str,
+) -> List[Tuple[Tuple[str, str, str], List[RemovedDocument]]]:
+    rows = []
+    for tenant_id, title, content, tags, source_id, idempotency_key in documents:
+        tags_json = json.dumps(tags)
+        rows.append(
+            (
+                None,
+                tenant_id,
+                str(uuid.uuid4()),
+                title,
+                content,
+                tags_json,
+                now,
+                now,
+                source_id,
+                idempotency_key,
+                content_hash(title, content, tags_json),
+            )
+        )
+    plain = [
+        (next(rowids), *row[1:]) for row in rows if row[8] is None and row[9] is None
+    ]
+    conn.executemany(_INSERT_SQL, plain)
+    written = []
+    for row in rows:
+        if row[8] is None and row[9] is None:
+            written.append(((row[2], now, CREATED), []))
+        else:
+            written.append(_ingest_keyed(conn, row, rowids))
+    return written
+
+
+def _ingest_keyed(
+    conn: sqlite3.Connection, row: tuple, rowids: Iterator[int]
+) -> Tuple[Tuple[str, str, str], List[RemovedDocument]]:
+    _, tenant_id, document_id, title, content, tags_json, now, _, source_id, key, digest = row
+    if key is not None:
+        existing = conn.execute(
+            """
+            SELECT document_id, created_at, content_hash
+            FROM documents
+            WHERE tenant_id = ? AND idempotency_key = ?;
+            """,
+            (tenant_id, key),
+        ).fetchone()
+        if existing is not None:
+            if existing["content_hash"] != digest:
+                raise IdempotencyConflict(
+                    "Idempotency-Key was already used for a different document"
+                )
+            return (existing["document_id"], existing["created_at"], DUPLICATE), []
+    if source_id is not None:
+        existing = conn.execute(
+            """
+            SELECT rowid, *
+            FROM documents
+            WHERE tenant_id = ? AND source_id = ?;
+            """,
+            (tenant_id, source_id),
+        ).fetchone()
+        if existing is not None:
+            if existing["content_hash"] == digest:
+                return (existing["document_id"], existing["created_at"], DUPLICATE), []
+            removed = _replace(
+                conn,
+                existing,
+                (title, content, tags_json, source_id, key, digest),
+                rowids,
+                now,
+            )
+            return (existing["document_id"], existing["created_at"], REPLACED), removed
+    conn.execute(_INSERT_SQL, (next(rowids), *row[1:]))
+    return (document_id, now, CREATED), []
+
+
+def _replace(
+    conn: sqlite3.Connection,
+    existing: sqlite3.Row,
+    values: tuple,
+    rowids: Iterator[int],
+    now: str,
+) -> List[RemovedDocument]:
+    """Rewrite ``existing`` in place as a new version (title, content,
+    tags_json, source_id, idempotency_key, content_hash) under its documentId.
+
+    A new title or content moves the row to a fresh rowid in the same UPDATE,
+    so the FTS trigger reindexes it and rowid-watermarked indexes pick it up;
+    the old row is returned as removed. Any other change keeps the rowid and
+    touches only the row and ``document_tags``.
+    """
+    title, content, tags_json, source_id, key, digest = values
+    if title == existing["title"] and content == existing["content"]:
         conn.execute(
             """
-            INSERT INTO documents (tenant_id, document_id, title, content, tags, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            UPDATE documents
+            SET tags = ?, updated_at = ?, source_id = ?, idempotency_key = ?,
+                content_hash = ?
+            WHERE rowid = ?;
             """,
-            (tenant_id, document_id, title, content, tags_json, created_at, created_at),
+            (tags_json, now, source_id, key, digest, existing["rowid"]),
         )
-        conn.commit()
-    return document_id, created_at
+        return []
+    conn.execute(
+        """
+        UPDATE documents
+        SET rowid = ?, title = ?, content = ?, tags = ?, updated_at = ?,
+            source_id = ?, idempotency_key = ?, content_hash = ?
+        WHERE rowid = ?;
+        """,
+        (
+            next(rowids),
+            title,
+            content,
+            tags_json,
+            now,
+            source_id,
+            key,
+            digest,
+            existing["rowid"],
+        ),
+    )
+    return [(int(existing["rowid"]), existing["title"], existing["content"])]
+
+
+def _update(
+    conn: sqlite3.Connection, arg: tuple, rowids: Iterator[int], now: str
+) -> Tuple[Optional[Tuple[str, str, str, str]], List[RemovedDocument]]:
+    tenant_id, document_id, fields = arg
+    existing = conn.execute(
+        "SELECT rowid, * FROM documents WHERE tenant_id = ? AND document_id = ?;",
+        (tenant_id, document_id),
+    ).fetchone()
+    if existing is None:
+        return None, []
+    title = fields.get("title", existing["title"])
+    content = fields.get("content", existing["content"])
+    tags_json = json.dumps(fields["tags"]) if "tags" in fields else existing["tags"]
+    digest = content_hash(title, content, tags_json)
+    if digest == existing["content_hash"]:
+        return (document_id, existing["created_at"], existing["updated_at"], UNCHANGED), []
+    removed = _replace(
+        conn,
+        existing,
+        (title, content, tags_json, existing["source_id"], existing["idempotency_key"], digest),
+        rowids,
+        now,
+    )
+    return (document_id, existing["created_at"], now, REPLACED), removed
+
+
+def _delete(
+    conn: sqlite3.Connection, arg: tuple
+) -> Tuple[bool, List[RemovedDocument]]:
+    tenant_id, document_id = arg
+    existing = conn.execute(
+        """
+        DELETE FROM documents
+        WHERE tenant_id = ? AND document_id = ?
+        RETURNING rowid, title, content;
+        """,
+        (tenant_id, document_id),
+    ).fetchone()
+    if existing is None:
+        return False, []
+    return True, [(int(existing[0]), existing[1], existing[2])]
+
+
+_SEARCH_SQL = """
+WITH ranked AS MATERIALIZED (
+  SELECT rowid AS rid,
+         bm25(documents_fts, 0.0, 1.0, 1.0, 0.0) AS score_raw
+  FROM documents_fts
+  WHERE documents_fts MATCH ?
+    AND documents_fts MATCH ?{tags}
+),
+counted AS (
+  SELECT rid, score_raw, COUNT(*) OVER () AS total
+  FROM ranked
+),
+page AS (
+  SELECT rid, score_raw, total
+  FROM counted
+  {after}
+  ORDER BY score_raw, rid
+  LIMIT ? OFFSET ?
+)
+SELECT page.rid,
+       d.document_id,
+       d.title,
+       json(d.tags) AS tags,
+       d.created_at,
+       snippet(documents_fts, 2, '<b>', '</b>', '...', 10) AS snippet,
+       page.score_raw,
+       page.total
+FROM page
+JOIN documents_fts ON documents_fts.rowid = page.rid
+JOIN documents d ON d.rowid = page.rid
+WHERE documents_fts MATCH ?
+ORDER BY page.score_raw, page.rid;
+"""
+
+_SEARCH_AFTER_SQL = "WHERE score_raw > ? OR (score_raw = ? AND rid > ?)"
+
+# One clause per required tag; each subquery is one range of document_tags'
+# primary key, built once into an in-memory set that FTS matches probe. The
+# unary + keeps SQLite from pushing the IN list into FTS5 as rowid lookups,
+# which reruns the MATCH per tagged document and is ~300x slower for broad
+# tags.
+_TAG_FILTER_SQL = """
+    AND +documents_fts.rowid IN (
+      SELECT doc_rowid FROM document_tags WHERE tenant_id = ? AND tag = ?
+    )"""
+
+
+def _tag_filter(tenant_id: str, tags: Sequence[str]) -> Tuple[str, tuple]:
+    params: tuple = ()
+    for tag in tags:
+        params += (tenant_id, tag)
+    return _TAG_FILTER_SQL * len(tags), params
+
+
+@lru_cache(maxsize=64)
+def _search_sql(with_after: bool, tag_count: int) -> str:
+    return _SEARCH_SQL.format(
+        tags=_TAG_FILTER_SQL * tag_count,
+        after=_SEARCH_AFTER_SQL if with_after else "",
+    )
+
+
+SearchPosition = Tuple[float, int]
+
+_HEAD_SNIPPET_CHARS = 160
 
 
 def search_documents(
-    conn,
-    lock: threading.Lock,
+    db: ConnectionManager,
     tenant_id: str,
     query: str,
     limit: int,
     offset: int,
-) -> List[dict[str, Any]]:
-    with lock:
+    count_mode: str = "exact",
+    count_cap: int = 0,
+    after: Optional[SearchPosition] = None,
+    tags: Sequence[str] = (),
+) -> Tuple[List[dict[str, Any]], int, bool, Optional[SearchPosition]]:
+    """Return one ranked page, the match total, whether it is estimated, and
+    the (score, rowid) position to resume after (None on the last page).
+
+    Runs in two phases within one statement (one read snapshot): ``ranked``
+    scores every match from the FTS postings and keeps only rowid and score,
+    and ``page`` cuts that down to ``offset + limit`` rows. Titles, tags and
+    snippets are then fetched for the page rows only, so snippet generation
+    over large ``content`` never runs for rows the sorter discards.
+
+    Each result's ``tags`` is compact JSON array text, ready to be spliced
+    into the response body (see ``app.core.serialization``).
+
+    ``tags`` restricts matches to documents carrying every listed tag; the
+    filter runs inside ``ranked`` against ``document_tags``.
+
+    With ``after`` the page starts past that position in rank order, so the
+    sorter keeps only ``limit`` rows instead of skipping every earlier page;
+    ``offset`` then counts from that position.
+
+    The page and the total come from a single pass over the postings. A
+    separate COUNT only runs when the page is empty (offset past the end); in
+    that case ``count_mode`` bounds it at ``count_cap`` ("capped") or skips it
+    ("none"), and the returned total is flagged as an estimate.
+    """
+    # One extra row tells whether a next page exists.
+    _, tag_params = _tag_filter(tenant_id, tags)
+    after_params: tuple = () if after is None else (after[0], after[0], after[1])
+    sql = _search_sql(after is not None, len(tags))
+    params = (
+        tenant_match(tenant_id),
+        query,
+        *tag_params,
+        *after_params,
+        limit + 1,
+        offset,
+        query,
+    )
+    with db.reader() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    next_after: Optional[SearchPosition] = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = (float(rows[-1]["score_raw"]), int(rows[-1]["rid"]))
+    # Rows arrive in rank order. FTS5's bm25() is the negated Okapi score
+    # (more negative = better), so negating it gives higher = better while
+    # keeping that order; 1 / (1 + raw) is not monotonic for negative raw.
+    results: List[dict[str, Any]] = [
+        {
+            "documentId": row["document_id"],
+            "title": row["title"],
+            "tags": compact_tags(row["tags"]),
+            "createdAt": row["created_at"],
+            "snippet": row["snippet"],
+            "score": -float(row["score_raw"]),
+        }
+        for row in rows
+    ]
+
+    if rows:
+        return results, int(rows[0]["total"]), False, next_after
+    if offset == 0 and after is None:
+        return results, 0, False, None
+    if count_mode == "none":
+        return results, 0, True, None
+    if count_mode == "capped":
+        total = count_documents(db, tenant_id, query, count_cap, tags)
+        return results, min(total, count_cap), total > count_cap, None
+    return results, count_documents(db, tenant_id, query, tags=tags), False, None
+
+
+def rank_documents(
+    db: ConnectionManager,
+    tenant_id: str,
+    query: str,
+    limit: int,
+    tags: Sequence[str] = (),
+) -> List[int]:
+    """Rowids of the top ``limit`` lexical matches, best first."""
+    tag_sql, tag_params = _tag_filter(tenant_id, tags)
+    with db.reader() as conn:
         rows = conn.execute(
-            """
-            SELECT d.document_id,
-                   d.title,
-                   d.tags,
-                   d.created_at,
-                   snippet(documents_fts, 2, '<b>', '</b>', '...', 10) AS snippet,
-                   bm25(documents_fts) AS score_raw
+            f"""
+            SELECT rowid
             FROM documents_fts
-            JOIN documents d ON d.rowid = documents_fts.rowid
-            WHERE documents_fts.tenant_id = ?
-              AND documents_fts MATCH ?
-            ORDER BY score_raw
-            LIMIT ? OFFSET ?;
+            WHERE documents_fts MATCH ?
+              AND documents_fts MATCH ?{tag_sql}
+            ORDER BY bm25(documents_fts, 0.0, 1.0, 1.0, 0.0), rowid
+            LIMIT ?;
             """,
-            (tenant_id, query, limit, offset),
+            (tenant_match(tenant_id), query, *tag_params, limit),
         ).fetchall()
-    results: List[dict[str, Any]] = []
-    for row in rows:
-        score_raw = float(row["score_raw"])
-        score = 1.0 / (1.0 + score_raw)
-        results.append(
-            {
-                "documentId": row["document_id"],
-                "title": row["title"],
-                "tags": json.loads(row["tags"]),
-                "createdAt": row["created_at"],
-                "snippet": row["snippet"],
-                "score": score,
+    return [int(row[0]) for row in rows]
+
+
+def tagged_rowids(db: ConnectionManager, tenant_id: str, tags: Sequence[str]) -> List[int]:
+    """Rowids of the tenant's documents that carry every tag in ``tags``."""
+    with db.reader() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT doc_rowid
+            FROM document_tags
+            WHERE tenant_id = ? AND tag IN ({",".join("?" * len(tags))})
+            GROUP BY doc_rowid
+            HAVING COUNT(*) = ?;
+            """,
+            (tenant_id, *tags, len(tags)),
+        ).fetchall()
+    return [int(row[0]) for row in rows]
+
+
+def facet_tags(
+    db: ConnectionManager,
+    tenant_id: str,
+    query: str,
+    limit: int,
+    tags: Sequence[str] = (),
+) -> List[Tuple[str, int]]:
+    """Most common tags over the full matching set, with document counts.
+
+    Reads only FTS postings and the covering ``(doc_rowid, tag)`` index, never
+    the documents rows themselves.
+    """
+    tag_sql, tag_params = _tag_filter(tenant_id, tags)
+    with db.reader() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT t.tag, COUNT(*) AS doc_count
+            FROM documents_fts
+            JOIN document_tags t ON t.doc_rowid = documents_fts.rowid
+            WHERE documents_fts MATCH ?
+              AND documents_fts MATCH ?{tag_sql}
+            GROUP BY t.tag
+            ORDER BY doc_count DESC, t.tag
+            LIMIT ?;
+            """,
+            (tenant_match(tenant_id), query, *tag_params, limit),
+        ).fetchall()
+    return [(row[0], int(row[1])) for row in rows]
+
+
+def fetch_documents(
+    db: ConnectionManager,
+    tenant_id: str,
+    rowids: List[int],
+    query: Optional[str] = None,
+) -> dict[int, dict[str, Any]]:
+    """Result rows for ``rowids``, keyed by rowid.
+
+    Rows that match ``query`` get an FTS ``snippet()``; the rest (e.g. vector
+    hits without lexical overlap) get the head of their content. ``tags`` is
+    compact JSON array text, as in ``search_documents``.
+    """
+    if not rowids:
+        return {}
+    placeholders = ",".join("?" * len(rowids))
+    with db.reader() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT rowid, document_id, title, json(tags) AS tags, created_at,
+                   substr(content, 1, {_HEAD_SNIPPET_CHARS}) AS head
+            FROM documents
+            WHERE tenant_id = ? AND rowid IN ({placeholders});
+            """,
+            (tenant_id, *rowids),
+        ).fetchall()
+        snippets: dict[int, str] = {}
+        if query is not None:
+            snippets = {
+                int(row[0]): row[1]
+                for row in conn.execute(
+                    f"""
+                    SELECT rowid, snippet(documents_fts, 2, '<b>', '</b>', '...', 10)
+                    FROM documents_fts
+                    WHERE documents_fts MATCH ? AND rowid IN ({placeholders});
+                    """,
+                    (query, *rowids),
+                )
             }
+    return {
+        int(row["rowid"]): {
+            "documentId": row["document_id"],
+            "title": row["title"],
+            "tags": compact_tags(row["tags"]),
+            "createdAt": row["created_at"],
+            "snippet": snippets.get(int(row["rowid"])) or row["head"],
+        }
+        for row in rows
+    }
+
+
+def export_documents(
+    db: ConnectionManager,
+    tenant_id: str,
+    after: Tuple[str, int],
+    limit: int,
+    max_bytes: int,
+) -> List[dict[str, Any]]:
+    """Next export chunk past ``after`` = (updatedAt, rowid): up to ``limit``
+    rows, ending early at the first row that brings the UTF-8 size of titles
+    and contents to ``max_bytes``.
+
+    Keyset iteration on ``idx_documents_tenant_updated``, so each chunk is an
+    index range scan whatever the tenant's size. ``tags`` is compact JSON
+    array text.
+    """
+    rows = []
+    size = 0
+    with db.reader() as conn:
+        cursor = conn.execute(
+            """
+            SELECT rowid, document_id, title, content, json(tags) AS tags, source_id,
+                   created_at, updated_at,
+                   length(CAST(title AS BLOB)) + length(CAST(content AS BLOB)) AS size
+            FROM documents
+            WHERE tenant_id = ? AND (updated_at, rowid) > (?, ?)
+            ORDER BY updated_at, rowid
+            LIMIT ?;
+            """,
+            (tenant_id, after[0], after[1], limit),
         )
-    results.sort(key=lambda item: item["score"], reverse=True)
-    return results
+        try:
+            for row in cursor:
+                rows.append(row)
+                size += row["size"]
+                if size >= max_bytes:
+                    break
+        finally:
+            # Ends the read snapshot before the connection goes back to the pool.
+            cursor.close()
+    return [
+        {
+            "rowid": int(row["rowid"]),
+            "documentId": row["document_id"],
+            "title": row["title"],
+            "content": row["content"],
+            "tags": compact_tags(row["tags"]),
+            "sourceId": row["source_id"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+        }
+        for row in rows
+    ]
+
+
+def suggest_titles(
+    db: ConnectionManager,
+    tenant_id: str,
+    tokens: List[str],
+    limit: int,
+    budget_ms: int,
+) -> Tuple[List[dict[str, str]], bool]:
+    """Titles whose words match ``tokens``, the last one as a prefix.
+
+    The prefix term is answered from the FTS prefix index. The statement is
+    interrupted once ``budget_ms`` has passed; the second value is True when
+    that happened and the list is empty.
+    """
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += " *"
+    deadline = time.monotonic() + budget_ms / 1000.0
+    with db.reader() as conn:
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            rows = conn.execute(
+                """
+                SELECT d.document_id, d.title
+                FROM documents_fts
+                JOIN documents d ON d.rowid = documents_fts.rowid
+                WHERE documents_fts MATCH ?
+                  AND documents_fts MATCH ?
+                ORDER BY bm25(documents_fts, 0.0, 1.0, 0.0, 0.0)
+                LIMIT ?;
+                """,
+                (tenant_match(tenant_id), f"title : ({' '.join(terms)})", limit),
+            ).fetchall()
+        except sqlite3.OperationalError as exc:
+            if "interrupted" not in str(exc):
+                raise
+            return [], True
+        finally:
+            conn.set_progress_handler(None, 0)
+    return [{"documentId": row[0], "title": row[1]} for row in rows], False
 
 
 def count_documents(
-    conn,
-    lock: threading.Lock,
+    db: ConnectionManager,
     tenant_id: str,
     query: str,
+    cap: int | None = None,
+    tags: Sequence[str] = (),
 ) -> int:
-    with lock:
-        row = conn.execute(
-            """
-            SELECT COUNT(*)
-            FROM documents_fts
-            WHERE tenant_id = ?
-              AND documents_fts MATCH ?;
-            """,
-            (tenant_id, query),
-        ).fetchone()
+    tag_sql, tag_params = _tag_filter(tenant_id, tags)
+    with db.reader() as conn:
+        if cap is None:
+            row = conn.execute(
+                f"""
+                SELECT COUNT(*)
+                FROM documents_fts
+                WHERE documents_fts MATCH ?
+                  AND documents_fts MATCH ?{tag_sql};
+                """,
+                (tenant_match(tenant_id), query, *tag_params),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                f"""
+                SELECT COUNT(*) FROM (
+                  SELECT 1
+                  FROM documents_fts
+                  WHERE documents_fts MATCH ?
+                    AND documents_fts MATCH ?{tag_sql}
+                  LIMIT ?
+                );
+                """,
+                (tenant_match(tenant_id), query, *tag_params, cap + 1),
+            ).fetchone()
     return int(row[0]) if row else 0
 
 
-def document_counts_by_tenant(conn, lock: threading.Lock) -> dict[str, int]:
-    with lock:
+def tenant_stats(db: ConnectionManager) -> dict[str, dict[str, int]]:
+    with db.reader() as conn:
         rows = conn.execute(
             """
-            SELECT tenant_id, COUNT(*)
-            FROM documents
-            GROUP BY tenant_id;
+            SELECT tenant_id, doc_count, content_bytes
+            FROM tenant_stats
+            WHERE doc_count > 0;
             """
         ).fetchall()
-    return {row["tenant_id"]: int(row[1]) for row in rows}
+    return {
+        row["tenant_id"]: {
+            "documents": int(row["doc_count"]),
+            "contentBytes": int(row["content_bytes"]),
+        }
+        for row in rows
+    }
+
+
+def tenant_version(db: ConnectionManager, tenant_id: str) -> Tuple[int, int]:
+    """(version, document count) of a tenant; (0, 0) if it never had documents.
+
+    The version grows with every write to the tenant's documents, including
+    writes made by other worker processes.
+    """
+    with db.reader() as conn:
+        row = conn.execute(
+            "SELECT version, doc_count FROM tenant_stats WHERE tenant_id = ?;",
+            (tenant_id,),
+        ).fetchone()
+    return (0, 0) if row is None else (int(row[0]), int(row[1]))
+
 
+def document_counts_by_tenant(db: ConnectionManager) -> dict[str, int]:
+    return {
+        tenant_id: stats["documents"] for tenant_id, stats in tenant_stats(db).items()
+    }
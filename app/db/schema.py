@@ -1,4 +1,7 @@
-SCHEMA_SQL = """
+import sqlite3
+from typing import Callable, List, Tuple
+
+DOCUMENTS_SQL = """
 -- Base table
 CREATE TABLE IF NOT EXISTS documents (
   tenant_id   TEXT NOT NULL,
@@ -8,42 +11,322 @@ CREATE TABLE IF NOT EXISTS documents (
   tags        TEXT NOT NULL, -- JSON array string
   created_at  TEXT NOT NULL, -- ISO8601
   updated_at  TEXT NOT NULL, -- ISO8601
+  source_id       TEXT,        -- client's id for the source object (optional)
+  idempotency_key TEXT,        -- Idempotency-Key header of the creating request
+  content_hash    TEXT,        -- sha256 of title, content and tags
+  tenant_key  TEXT GENERATED ALWAYS AS ('tk' || lower(hex(tenant_id))) VIRTUAL,
   PRIMARY KEY (tenant_id, document_id)
 );
 
 CREATE INDEX IF NOT EXISTS idx_documents_tenant_created
 ON documents(tenant_id, created_at DESC);
 
--- External-content FTS5 table (links to documents via rowid)
+-- Export keyset: (updated_at, rowid) per tenant; rowid is implicit at the end.
+CREATE INDEX IF NOT EXISTS idx_documents_tenant_updated
+ON documents(tenant_id, updated_at);
+
+-- Index entries end with the rowid, so this serves "tenant rows past rowid N"
+-- range scans (incremental vector and vocabulary sync) without a sort.
+CREATE INDEX IF NOT EXISTS idx_documents_tenant_rowid
+ON documents(tenant_id);
+
+-- Ingest deduplication lookups; rows without a key or source id are not indexed.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_idempotency
+ON documents(tenant_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_source
+ON documents(tenant_id, source_id) WHERE source_id IS NOT NULL;
+
+-- Highest rowid ever deleted. Inserts assign rowids above it, so a rowid is
+-- never reused: vector and vocabulary indexes key on rowids and only sync
+-- forward past a watermark.
+CREATE TABLE IF NOT EXISTS documents_rowid_floor (
+  id          INTEGER PRIMARY KEY CHECK (id = 1),
+  max_deleted INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS documents_rowid_floor_ad AFTER DELETE ON documents BEGIN
+  INSERT INTO documents_rowid_floor(id, max_deleted) VALUES (1, old.rowid)
+  ON CONFLICT(id) DO UPDATE SET max_deleted = max(max_deleted, excluded.max_deleted);
+END;
+
+-- Per-tenant aggregates kept current by triggers, so metrics never scan documents.
+-- version grows with every write to the tenant's documents, from any process:
+-- workers compare it with what their caches and derived indexes last saw.
+CREATE TABLE IF NOT EXISTS tenant_stats (
+  tenant_id     TEXT PRIMARY KEY,
+  doc_count     INTEGER NOT NULL,
+  content_bytes INTEGER NOT NULL,
+  version       INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS documents_stats_ai AFTER INSERT ON documents BEGIN
+  INSERT INTO tenant_stats(tenant_id, doc_count, content_bytes, version)
+  VALUES (new.tenant_id, 1, length(CAST(new.content AS BLOB)), 1)
+  ON CONFLICT(tenant_id) DO UPDATE SET
+    doc_count = doc_count + 1,
+    content_bytes = content_bytes + excluded.content_bytes,
+    version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_stats_ad AFTER DELETE ON documents BEGIN
+  UPDATE tenant_stats
+  SET doc_count = doc_count - 1,
+      content_bytes = content_bytes - length(CAST(old.content AS BLOB)),
+      version = version + 1
+  WHERE tenant_id = old.tenant_id;
+END;
+
+-- Normalized tags: one row per (document, distinct tag), kept in sync with the
+-- JSON tags column. The primary key serves tag filters; the second index
+-- serves facet counts and is covering for rowid -> tags.
+CREATE TABLE IF NOT EXISTS document_tags (
+  tenant_id TEXT NOT NULL,
+  tag       TEXT NOT NULL,
+  doc_rowid INTEGER NOT NULL,
+  PRIMARY KEY (tenant_id, tag, doc_rowid)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_document_tags_rowid
+ON document_tags(doc_rowid, tag);
+
+CREATE TRIGGER IF NOT EXISTS documents_tags_ai AFTER INSERT ON documents BEGIN
+  INSERT OR IGNORE INTO document_tags(tenant_id, tag, doc_rowid)
+  SELECT new.tenant_id, value, new.rowid FROM json_each(new.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_tags_ad AFTER DELETE ON documents BEGIN
+  DELETE FROM document_tags WHERE doc_rowid = old.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_tags_au AFTER UPDATE OF tags ON documents BEGIN
+  DELETE FROM document_tags WHERE doc_rowid = old.rowid;
+  INSERT OR IGNORE INTO document_tags(tenant_id, tag, doc_rowid)
+  SELECT new.tenant_id, value, new.rowid FROM json_each(new.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_stats_au AFTER UPDATE OF content ON documents BEGIN
+  UPDATE tenant_stats
+  SET content_bytes = content_bytes
+      - length(CAST(old.content AS BLOB))
+      + length(CAST(new.content AS BLOB))
+  WHERE tenant_id = new.tenant_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_version_au AFTER UPDATE ON documents BEGIN
+  UPDATE tenant_stats SET version = version + 1 WHERE tenant_id = new.tenant_id;
+END;
+"""
+
+FTS_SQL = """
+-- External-content FTS5 table (links to documents via rowid). tenant_key holds
+-- one token per tenant so a query ANDs against that tenant's postings only.
+-- prefix='2 3' adds prefix indexes so short prefix queries (suggest) read one
+-- posting list instead of walking every term that starts with the prefix.
+-- Tags are not indexed here: tag filters and facets read document_tags, so a
+-- tag-only update never reindexes the document's text.
 CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
   tenant_id UNINDEXED,
   title,
   content,
-  tags,
+  tenant_key,
   content='documents',
-  content_rowid='rowid'
+  content_rowid='rowid',
+  prefix='2 3'
 );
 
 -- Triggers to keep FTS in sync
 CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
-  INSERT INTO documents_fts(rowid, tenant_id, title, content, tags)
-  VALUES (new.rowid, new.tenant_id, new.title, new.content, new.tags);
+  INSERT INTO documents_fts(rowid, tenant_id, title, content, tenant_key)
+  VALUES (new.rowid, new.tenant_id, new.title, new.content, new.tenant_key);
 END;
 
 CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
-  INSERT INTO documents_fts(documents_fts, rowid, tenant_id, title, content, tags)
-  VALUES('delete', old.rowid, old.tenant_id, old.title, old.content, old.tags);
+  INSERT INTO documents_fts(documents_fts, rowid, tenant_id, title, content, tenant_key)
+  VALUES('delete', old.rowid, old.tenant_id, old.title, old.content, old.tenant_key);
 END;
 
-CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
-  INSERT INTO documents_fts(documents_fts, rowid, tenant_id, title, content, tags)
-  VALUES('delete', old.rowid, old.tenant_id, old.title, old.content, old.tags);
-  INSERT INTO documents_fts(rowid, tenant_id, title, content, tags)
-  VALUES (new.rowid, new.tenant_id, new.title, new.content, new.tags);
+-- Writes that change the title or content also set a new rowid (see
+-- repo.write_documents), so no other column needs to reindex.
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF title, content ON documents BEGIN
+  INSERT INTO documents_fts(documents_fts, rowid, tenant_id, title, content, tenant_key)
+  VALUES('delete', old.rowid, old.tenant_id, old.title, old.content, old.tenant_key);
+  INSERT INTO documents_fts(rowid, tenant_id, title, content, tenant_key)
+  VALUES (new.rowid, new.tenant_id, new.title, new.content, new.tenant_key);
 END;
 """
 
 
-def apply_schema(conn) -> None:
+SCHEMA_SQL = DOCUMENTS_SQL + FTS_SQL
+
+# Pre-partitioning databases index tenant_id as UNINDEXED only. The FTS table
+# is rebuilt in one transaction; in WAL mode readers keep searching the old
+# snapshot until it commits.
+_PARTITION_FTS_MIGRATION_SQL = (
+    """
+BEGIN;
+DROP TRIGGER IF EXISTS documents_ai;
+DROP TRIGGER IF EXISTS documents_ad;
+DROP TRIGGER IF EXISTS documents_au;
+DROP TABLE IF EXISTS documents_fts;
+ALTER TABLE documents
+  ADD COLUMN tenant_key TEXT GENERATED ALWAYS AS ('tk' || lower(hex(tenant_id))) VIRTUAL;
+"""
+    + FTS_SQL
+    + """
+INSERT INTO documents_fts(documents_fts) VALUES('rebuild');
+COMMIT;
+"""
+)
+
+
+# Databases created before prefix indexes existed, or whose FTS table still
+# indexes tags: same in-place FTS rebuild.
+_REBUILD_FTS_SQL = (
+    """
+BEGIN;
+DROP TRIGGER IF EXISTS documents_ai;
+DROP TRIGGER IF EXISTS documents_ad;
+DROP TRIGGER IF EXISTS documents_au;
+DROP TABLE IF EXISTS documents_fts;
+"""
+    + FTS_SQL
+    + """
+INSERT INTO documents_fts(documents_fts) VALUES('rebuild');
+COMMIT;
+"""
+)
+
+
+def tenant_match(tenant_id: str) -> str:
+    """FTS5 query selecting one tenant's rows; mirrors the tenant_key column."""
+    return f"tenant_key : tk{tenant_id.encode('utf-8').hex()}"
+
+
+def _needs_partition_migration(conn) -> bool:
+    columns = [row[1] for row in conn.execute("PRAGMA table_xinfo(documents)")]
+    return bool(columns) and "tenant_key" not in columns
+
+
+_DEDUP_COLUMNS = ("source_id", "idempotency_key", "content_hash")
+
+
+def _add_dedup_columns(conn) -> None:
+    # Rows written before these columns existed have no hash and are never
+    # treated as duplicates.
+    columns = [row[1] for row in conn.execute("PRAGMA table_xinfo(documents)")]
+    if not columns:
+        return
+    for column in _DEDUP_COLUMNS:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE documents ADD COLUMN {column} TEXT")
+
+
+def _needs_prefix_migration(conn) -> bool:
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'"
+    ).fetchone()
+    return row is not None and "prefix=" not in row[0]
+
+
+_SEED_TENANT_STATS_SQL = """
+INSERT OR REPLACE INTO tenant_stats(tenant_id, doc_count, content_bytes)
+SELECT tenant_id, COUNT(*), COALESCE(SUM(length(CAST(content AS BLOB))), 0)
+FROM documents
+GROUP BY tenant_id;
+"""
+
+
+_SEED_DOCUMENT_TAGS_SQL = """
+INSERT OR IGNORE INTO document_tags(tenant_id, tag, doc_rowid)
+SELECT d.tenant_id, j.value, d.rowid
+FROM documents d, json_each(d.tags) j;
+"""
+
+
+def _table_exists(conn, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def _migrate_baseline(conn) -> None:
+    # Databases created before versioning have user_version 0 and any of the
+    # older layouts above; each step detects what is missing.
+    if _needs_partition_migration(conn):
+        conn.executescript(_PARTITION_FTS_MIGRATION_SQL)
+    elif _needs_prefix_migration(conn):
+        conn.executescript(_REBUILD_FTS_SQL)
+    _add_dedup_columns(conn)
+    seed_stats = not _table_exists(conn, "tenant_stats")
+    seed_tags = not _table_exists(conn, "document_tags")
     conn.executescript(SCHEMA_SQL)
+    if seed_stats:
+        conn.execute(_SEED_TENANT_STATS_SQL)
+    if seed_tags:
+        conn.execute(_SEED_DOCUMENT_TAGS_SQL)
+
+
+_EXPORT_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_documents_tenant_updated
+ON documents(tenant_id, updated_at);
+"""
+
+
+def _add_export_index(conn) -> None:
+    conn.executescript(_EXPORT_INDEX_SQL)
+
+
+def _add_tenant_versions(conn) -> None:
+    columns = [row[1] for row in conn.execute("PRAGMA table_xinfo(tenant_stats)")]
+    if "version" in columns:
+        return
+    conn.execute("ALTER TABLE tenant_stats ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    # Recreated from DOCUMENTS_SQL with the version bump.
+    conn.execute("DROP TRIGGER IF EXISTS documents_stats_ai")
+    conn.execute("DROP TRIGGER IF EXISTS documents_stats_ad")
+    conn.executescript(DOCUMENTS_SQL)
+
+
+def _drop_fts_tags(conn) -> None:
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(documents_fts)")]
+    if "tags" in columns:
+        conn.executescript(_REBUILD_FTS_SQL)
+
+
+# Ordered (version, migration) pairs; the schema version is stored in
+# PRAGMA user_version. New schema changes append a step here, and
+# SCHEMA_VERSION is always the last one. A new database runs the baseline,
+# which already creates the current SCHEMA_SQL, so later steps must be
+# idempotent.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migrate_baseline),
+    (2, _add_export_index),
+    (3, _add_tenant_versions),
+    (4, _drop_fts_tags),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def apply_schema(conn) -> None:
+    """Run the migrations newer than the database's ``user_version``.
 
+    A current database costs one PRAGMA read and no DDL.
+    """
+    version = schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this build ({SCHEMA_VERSION})"
+        )
+    for target, migrate in MIGRATIONS:
+        if target > version:
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
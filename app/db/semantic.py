@@ -0,0 +1,96 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.db import repo
+from app.db.sqlite import ConnectionManager
+from app.db.vectors import VectorStore
+
+SearchPage = Tuple[List[dict[str, Any]], int, bool, None]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int) -> List[Tuple[int, float]]:
+    """Fuse ranked rowid lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, rowid in enumerate(ranking, start=1):
+            scores[rowid] = scores.get(rowid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _page(
+    db: ConnectionManager,
+    tenant_id: str,
+    scored: Sequence[Tuple[int, float]],
+    snippet_query: str | None,
+) -> List[dict[str, Any]]:
+    rows = repo.fetch_documents(
+        db, tenant_id, [rowid for rowid, _ in scored], snippet_query
+    )
+    # A rowid can be missing if the document was deleted after it was ranked.
+    return [
+        {**rows[rowid], "score": score} for rowid, score in scored if rowid in rows
+    ]
+
+
+def _allowed(
+    db: ConnectionManager, tenant_id: str, tags: Sequence[str]
+) -> Optional[np.ndarray]:
+    if not tags:
+        return None
+    return np.array(sorted(repo.tagged_rowids(db, tenant_id, tags)), dtype=np.int64)
+
+
+def search_vector(
+    db: ConnectionManager,
+    vectors: VectorStore,
+    tenant_id: str,
+    query: str,
+    limit: int,
+    offset: int,
+    tags: Sequence[str] = (),
+) -> SearchPage:
+    """Rank every tenant document (or every one carrying ``tags``) by cosine
+    similarity to the query embedding."""
+    allowed = _allowed(db, tenant_id, tags)
+    rowids, scores = vectors.search(
+        db, tenant_id, vectors.embedder.embed([query])[0], offset + limit, allowed
+    )
+    scored = list(zip(rowids[offset:].tolist(), scores[offset:].tolist()))
+    # Every document is a candidate, embedded yet or not.
+    total = repo.tenant_version(db, tenant_id)[1] if allowed is None else allowed.shape[0]
+    return _page(db, tenant_id, scored, None), total, False, None
+
+
+def search_hybrid(
+    db: ConnectionManager,
+    vectors: VectorStore,
+    tenant_id: str,
+    query: str,
+    limit: int,
+    offset: int,
+    candidates: int,
+    rrf_k: int,
+    tags: Sequence[str] = (),
+) -> SearchPage:
+    """Fuse the top lexical and vector candidates with reciprocal rank fusion.
+
+    Each side contributes ``max(candidates, offset + limit)`` rowids; ``total``
+    is the size of the fused candidate set and is flagged as an estimate.
+    """
+    depth = max(candidates, offset + limit)
+    lexical = repo.rank_documents(db, tenant_id, query, depth, tags)
+    rowids, _ = vectors.search(
+        db,
+        tenant_id,
+        vectors.embedder.embed([query])[0],
+        depth,
+        _allowed(db, tenant_id, tags),
+    )
+    fused = reciprocal_rank_fusion([lexical, rowids.tolist()], rrf_k)
+    return (
+        _page(db, tenant_id, fused[offset : offset + limit], query),
+        len(fused),
+        True,
+        None,
+    )
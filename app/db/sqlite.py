@@ -1,12 +1,402 @@
 import os
+import queue
 import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, TypeVar, Union
 
+T = TypeVar("T")
 
-def get_connection(db_path: str) -> sqlite3.Connection:
+
+class PoolTimeoutError(Exception):
+    """Raised when no reader connection becomes available in time."""
+
+
+# Per-connection PRAGMAs by profile name (DB_PRAGMA_PROFILE). All profiles run
+# in WAL mode with temp B-trees in memory, a 256 MiB mmap window (index and FTS
+# pages are read through the OS page cache instead of being copied into each
+# connection's cache) and a page cache sized for the FTS working set.
+#   durable:   every commit is fsynced (synchronous=FULL); the default.
+#   balanced:  WAL is fsynced at checkpoints only (synchronous=NORMAL); a power
+#              loss can drop the last commits but never corrupts the database.
+#   bulk-load: no fsync, larger cache and rarer checkpoints, for one-off
+#              imports and rebuilds; not crash-safe.
+PRAGMA_PROFILES: Dict[str, Dict[str, Union[int, str]]] = {
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size": -16384,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -16384,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "bulk-load": {
+        "synchronous": "OFF",
+        "cache_size": -131072,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 16384,
+    },
+}
+DEFAULT_PRAGMA_PROFILE = "durable"
+
+
+def get_connection(
+    db_path: str, read_only: bool = False, profile: str = DEFAULT_PRAGMA_PROFILE
+) -> sqlite3.Connection:
     dir_name = os.path.dirname(db_path)
     if dir_name:
         os.makedirs(dir_name, exist_ok=True)
     conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for name, value in PRAGMA_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON;")
     return conn
 
+
+class ConnectionManager:
+    """One WAL-mode database file: a dedicated writer plus a pool of readers.
+
+    Readers never take the write lock, so searches run concurrently with each
+    other and with ingest; writers serialize on ``write_lock`` only.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        pool_size: int,
+        checkout_timeout_ms: int,
+        pragma_profile: str = DEFAULT_PRAGMA_PROFILE,
+    ) -> None:
+        if pragma_profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown PRAGMA profile: {pragma_profile}")
+        self.db_path = db_path
+        self._pool_size = max(1, pool_size)
+        self._checkout_timeout_s = checkout_timeout_ms / 1000.0
+        self._pragma_profile = pragma_profile
+        self._writer = get_connection(db_path, profile=pragma_profile)
+        self._writer.execute("PRAGMA journal_mode = WAL;")
+        self.write_lock = threading.Lock()
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers: List[sqlite3.Connection] = []
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_ms_sum = 0.0
+        self._wait_ms_max = 0.0
+        self.last_write = 0.0
+
+    @contextmanager
+    def writer(self, background: bool = False) -> Iterator[sqlite3.Connection]:
+        """Hold the write lock; ``background`` work does not reset ``last_write``."""
+        with self.write_lock:
+            try:
+                yield self._writer
+            finally:
+                if not background:
+                    self.last_write = time.monotonic()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._grow()
+        if conn is not None:
+            with self._stats_lock:
+                self._checkouts += 1
+            return conn
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self._checkout_timeout_s)
+        except queue.Empty:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise PoolTimeoutError("Timed out waiting for a database connection")
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._checkouts += 1
+            self._waits += 1
+            self._wait_ms_sum += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+        return conn
+
+    def _grow(self) -> sqlite3.Connection | None:
+        with self._stats_lock:
+            if len(self._readers) >= self._pool_size:
+                return None
+            conn = get_connection(
+                self.db_path, read_only=True, profile=self._pragma_profile
+            )
+            self._readers.append(conn)
+            return conn
+
+    def pool_stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "size": self._pool_size,
+                "open": len(self._readers),
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "waitMsAvg": self._wait_ms_sum / self._waits if self._waits else 0.0,
+                "waitMsMax": self._wait_ms_max,
+            }
+
+    def close(self) -> None:
+        with self._stats_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        with self.write_lock:
+            self._writer.close()
+
+
+SHARD_MODES = ("none", "tenant", "hash")
+
+
+class _Shard:
+    def __init__(self, db: ConnectionManager) -> None:
+        self.db = db
+        self.leases = 0
+
+
+class ShardRouter:
+    """Routes each tenant to the ConnectionManager of its database file.
+
+    ``mode`` is ``none`` (every tenant in ``db_path``), ``tenant`` (one file per
+    tenant) or ``hash`` (``shard_count`` files chosen by a stable hash). Shards
+    are opened and migrated lazily on first use; once more than ``max_open``
+    are open, the least recently used shards with no active lease are closed.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        mode: str,
+        shard_count: int,
+        shard_dir: str,
+        max_open: int,
+        pool_size: int,
+        checkout_timeout_ms: int,
+        init_shard: Callable[[sqlite3.Connection], None],
+        pragma_profile: str = DEFAULT_PRAGMA_PROFILE,
+    ) -> None:
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode: {mode}")
+        if pragma_profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown PRAGMA profile: {pragma_profile}")
+        self.mode = mode
+        self._db_path = db_path
+        self._shard_count = max(1, shard_count)
+        self._shard_dir = shard_dir
+        self._max_open = max(1, max_open)
+        self._pool_size = pool_size
+        self._checkout_timeout_ms = checkout_timeout_ms
+        self._init_shard = init_shard
+        self._pragma_profile = pragma_profile
+        self._lock = threading.Lock()
+        self._open: "OrderedDict[str, _Shard]" = OrderedDict()
+        # Paths being opened and migrated, outside ``_lock``; set when done.
+        self._opening: Dict[str, threading.Event] = {}
+        self._closed_total = 0
+
+    def warm(self) -> None:
+        """Open and migrate the fixed shard set up front (not used per tenant)."""
+        if self.mode != "tenant":
+            self.map_shards(lambda db: None)
+
+    def shard_path(self, tenant_id: str) -> str:
+        if self.mode == "tenant":
+            name = f"tenant_{tenant_id.encode('utf-8').hex()}.db"
+            return os.path.join(self._shard_dir, name)
+        if self.mode == "hash":
+            index = zlib.crc32(tenant_id.encode("utf-8")) % self._shard_count
+            return os.path.join(self._shard_dir, f"shard_{index:03d}.db")
+        return self._db_path
+
+    def known_paths(self) -> List[str]:
+        if self.mode == "hash":
+            return [
+                os.path.join(self._shard_dir, f"shard_{index:03d}.db")
+                for index in range(self._shard_count)
+            ]
+        if self.mode == "tenant":
+            with self._lock:
+                paths = set(self._open)
+            if os.path.isdir(self._shard_dir):
+                paths.update(
+                    os.path.join(self._shard_dir, name)
+                    for name in os.listdir(self._shard_dir)
+                    if name.startswith("tenant_") and name.endswith(".db")
+                )
+            return sorted(paths)
+        return [self._db_path]
+
+    @contextmanager
+    def lease(self, tenant_id: str) -> Iterator[ConnectionManager]:
+        with self._lease_path(self.shard_path(tenant_id)) as db:
+            yield db
+
+    def map_shards(self, fn: Callable[[ConnectionManager], T]) -> List[T]:
+        results = []
+        for path in self.known_paths():
+            with self._lease_path(path) as db:
+                results.append(fn(db))
+        return results
+
+    def map_open_shards(self, fn: Callable[[ConnectionManager], T]) -> List[T]:
+        """Like ``map_shards`` but only visits shards that are already open."""
+        with self._lock:
+            paths = list(self._open)
+        results = []
+        for path in paths:
+            with self._lock:
+                if path not in self._open:
+                    continue
+            with self._lease_path(path) as db:
+                results.append(fn(db))
+        return results
+
+    def map_shards_cached(
+        self, fn: Callable[[ConnectionManager], T], cache: Dict[str, T]
+    ) -> List[T]:
+        """Like ``map_shards`` but closed shards are not reopened once seen.
+
+        Open shards are visited and their result is stored in ``cache``; a
+        closed shard reuses its cached result, so repeated calls in tenant mode
+        do not cycle every tenant's database through the open set.
+        """
+        results = []
+        for path in self.known_paths():
+            with self._lock:
+                is_open = path in self._open
+            if not is_open and path in cache:
+                results.append(cache[path])
+                continue
+            with self._lease_path(path) as db:
+                cache[path] = fn(db)
+            results.append(cache[path])
+        return results
+
+    @contextmanager
+    def _lease_path(self, path: str) -> Iterator[ConnectionManager]:
+        shard = self._acquire(path)
+        try:
+            yield shard.db
+        finally:
+            with self._lock:
+                shard.leases -= 1
+            self._evict_idle()
+
+    def _acquire(self, path: str) -> _Shard:
+        # Opening and migrating a shard can take long (a first-time schema or
+        # FTS rebuild), so it runs outside ``_lock``: leases of other shards
+        # proceed, and leases of the same path wait for its event.
+        while True:
+            with self._lock:
+                shard = self._open.get(path)
+                if shard is not None:
+                    self._open.move_to_end(path)
+                    shard.leases += 1
+                    return shard
+                opening = self._opening.get(path)
+                if opening is None:
+                    opening = self._opening[path] = threading.Event()
+                    break
+            # If the opener failed, the next waiter retries.
+            opening.wait()
+        try:
+            db = ConnectionManager(
+                path,
+                self._pool_size,
+                self._checkout_timeout_ms,
+                self._pragma_profile,
+            )
+            try:
+                with db.writer() as conn:
+                    self._init_shard(conn)
+            except BaseException:
+                db.close()
+                raise
+            with self._lock:
+                shard = self._open[path] = _Shard(db)
+                shard.leases += 1
+        finally:
+            with self._lock:
+                del self._opening[path]
+            opening.set()
+        return shard
+
+    def _evict_idle(self) -> None:
+        to_close = []
+        with self._lock:
+            excess = len(self._open) - self._max_open
+            for path, shard in list(self._open.items()):
+                if excess <= 0:
+                    break
+                if shard.leases == 0:
+                    del self._open[path]
+                    to_close.append(shard.db)
+                    excess -= 1
+            self._closed_total += len(to_close)
+        for db in to_close:
+            db.close()
+
+    def pool_stats(self) -> dict:
+        with self._lock:
+            shards = [shard.db for shard in self._open.values()]
+            closed_total = self._closed_total
+        pool = {
+            "size": 0,
+            "open": 0,
+            "idle": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "waitMsAvg": 0.0,
+            "waitMsMax": 0.0,
+        }
+        wait_ms_sum = 0.0
+        for db in shards:
+            stats = db.pool_stats()
+            for key in ("size", "open", "idle", "checkouts", "waits", "timeouts"):
+                pool[key] += stats[key]
+            wait_ms_sum += stats["waitMsAvg"] * stats["waits"]
+            pool["waitMsMax"] = max(pool["waitMsMax"], stats["waitMsMax"])
+        if pool["waits"]:
+            pool["waitMsAvg"] = wait_ms_sum / pool["waits"]
+        return {
+            "pool": pool,
+            "shards": {
+                "mode": self.mode,
+                "open": len(shards),
+                "maxOpen": self._max_open,
+                "closedIdle": closed_total,
+            },
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            shards, self._open = list(self._open.values()), OrderedDict()
+        for shard in shards:
+            shard.db.close()
@@ -0,0 +1,285 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.db import repo
+from app.db.sqlite import ConnectionManager, ShardRouter
+
+logger = logging.getLogger("app.suggest")
+
+# Mirrors FTS5's unicode61 tokenizer closely enough for completions:
+# case-folded, diacritics removed, underscores are separators.
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Vocabulary is built from the title and the head of the content; common
+# terms almost always appear there and it bounds the cost of large documents.
+_VOCAB_CONTENT_CHARS = 4096
+_SYNC_CHUNK = 512
+# Prefixes this short match huge term ranges; their top-k lists are cached.
+_CACHED_PREFIX_LEN = 2
+# Up to this many new terms are inserted in place; more trigger one merge.
+_INSORT_MAX = 64
+
+
+def tokenize(text: str) -> List[str]:
+    if text.isascii():
+        return _TOKEN_RE.findall(text.lower())
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(stripped)
+
+
+def _document_terms(title: str, content: str) -> Set[str]:
+    return set(tokenize(f"{title} {content[:_VOCAB_CONTENT_CHARS]}"))
+
+
+class _TenantVocabulary:
+    """Per-tenant term -> document frequency with sorted-term prefix lookup."""
+
+    def __init__(self) -> None:
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.watermark = 0
+        # Documents counted; compared with the tenant's document count.
+        self.documents = 0
+        # tenant_stats version of the last sync that matched the document
+        # count, and of the last one that did not.
+        self.version: Optional[int] = None
+        self.mismatch_version: Optional[int] = None
+        # (rowid, title, content) of removed documents, applied by the next sync.
+        self.removed: List[Tuple[int, str, str]] = []
+        self.df: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.pending: Set[str] = set()
+        self.top_cache: Dict[Tuple[str, int], List[Tuple[str, int]]] = {}
+
+    def add(self, documents: Iterable[Set[str]]) -> None:
+        counts: Counter = Counter()
+        for terms in documents:
+            counts.update(terms)
+            self.documents += 1
+        with self.lock:
+            df = self.df
+            for term, count in counts.items():
+                previous = df.get(term, 0)
+                if not previous:
+                    self.pending.add(term)
+                df[term] = previous + count
+            self._invalidate(counts)
+
+    def remove(self, documents: Iterable[Set[str]]) -> None:
+        counts: Counter = Counter()
+        for terms in documents:
+            counts.update(terms)
+            self.documents -= 1
+        with self.lock:
+            df = self.df
+            for term, count in counts.items():
+                remaining = df.get(term, 0) - count
+                if remaining > 0:
+                    df[term] = remaining
+                    continue
+                df.pop(term, None)
+                if term in self.pending:
+                    self.pending.discard(term)
+                    continue
+                index = bisect.bisect_left(self.terms, term)
+                if index < len(self.terms) and self.terms[index] == term:
+                    del self.terms[index]
+            self._invalidate(counts)
+
+    def _invalidate(self, terms: Iterable[str]) -> None:
+        if not self.top_cache:
+            return
+        stale = {
+            term[:length] for term in terms for length in range(1, _CACHED_PREFIX_LEN + 1)
+        }
+        for key in [key for key in self.top_cache if key[0] in stale]:
+            del self.top_cache[key]
+
+    def complete(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        with self.lock:
+            if len(self.pending) > _INSORT_MAX:
+                self.terms = list(heapq.merge(self.terms, sorted(self.pending)))
+            else:
+                for term in self.pending:
+                    bisect.insort(self.terms, term)
+            self.pending.clear()
+            cache_key = (prefix, limit)
+            if len(prefix) <= _CACHED_PREFIX_LEN and cache_key in self.top_cache:
+                return self.top_cache[cache_key]
+            start = bisect.bisect_left(self.terms, prefix)
+            end = bisect.bisect_left(self.terms, prefix + "\U0010ffff", start)
+            df = self.df
+            top = heapq.nsmallest(
+                limit, ((-df[term], term) for term in self.terms[start:end])
+            )
+            result = [(term, -negated) for negated, term in top]
+            if len(prefix) <= _CACHED_PREFIX_LEN:
+                self.top_cache[cache_key] = result
+            return result
+
+    @property
+    def size(self) -> int:
+        return len(self.df)
+
+
+class SuggestIndex:
+    """In-memory per-tenant vocabularies for term completion.
+
+    A tenant's vocabulary is built from the documents table after its first
+    suggest request and then refreshed incrementally: ingest routes call
+    ``refresh`` after their commit, and a suggest request that finds the
+    tenant's ``tenant_stats`` version moved (a write by another worker) marks
+    it dirty too. A background thread does all tokenizing, reading only rows
+    past the last rowid seen, so neither suggest nor ingest requests pay for
+    it. Tenants never asked for suggestions cost nothing.
+    """
+
+    def __init__(self, db: ShardRouter) -> None:
+        self._db = db
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantVocabulary] = {}
+        self._dirty: Set[str] = set()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="suggest-indexer", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _mark_dirty(self, tenant_id: str) -> None:
+        # Caller holds ``_lock``.
+        self._dirty.add(tenant_id)
+        self._wakeup.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._dirty and not self._stopped:
+                    self._wakeup.wait()
+                if self._stopped:
+                    return
+                tenant_id = next(iter(self._dirty))
+                vocab = self._tenants[tenant_id]
+            try:
+                with self._db.lease(tenant_id) as db:
+                    self._sync(db, tenant_id, vocab)
+            except Exception:
+                logger.exception("Vocabulary sync failed for tenant %s", tenant_id)
+                time.sleep(1.0)
+
+    def _sync(
+        self, db: ConnectionManager, tenant_id: str, vocab: _TenantVocabulary
+    ) -> None:
+        with self._lock:
+            self._dirty.discard(tenant_id)
+            removed, vocab.removed = vocab.removed, []
+        # Only rows at or below the watermark were ever counted.
+        vocab.remove(
+            _document_terms(title, content)
+            for rowid, title, content in removed
+            if rowid <= vocab.watermark
+        )
+        version, documents = self._catch_up(db, tenant_id, vocab)
+        vocab.ready.set()
+        if vocab.documents == documents:
+            vocab.version = version
+            return
+        # Documents were removed without their rows reaching this process: by
+        # another worker, or a local removal is not queued yet. The version is
+        # left behind so the next suggest request syncs again; if the counts
+        # still differ at the same version, rebuild while the stale vocabulary
+        # keeps serving.
+        if vocab.mismatch_version != version:
+            vocab.mismatch_version = version
+            return
+        fresh = _TenantVocabulary()
+        version, documents = self._catch_up(db, tenant_id, fresh)
+        fresh.ready.set()
+        if fresh.documents == documents:
+            fresh.version = version
+        with self._lock:
+            fresh.removed = vocab.removed
+            self._tenants[tenant_id] = fresh
+            if fresh.removed:
+                self._mark_dirty(tenant_id)
+
+    def _catch_up(
+        self, db: ConnectionManager, tenant_id: str, vocab: _TenantVocabulary
+    ) -> Tuple[int, int]:
+        """Count rows past the watermark; return the tenant's (version,
+        document count) read just before the last, empty, chunk."""
+        while True:
+            version, documents = repo.tenant_version(db, tenant_id)
+            with db.reader() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT rowid, title, substr(content, 1, ?) AS head
+                    FROM documents
+                    WHERE tenant_id = ? AND rowid > ?
+                    ORDER BY rowid
+                    LIMIT ?;
+                    """,
+                    (_VOCAB_CONTENT_CHARS, tenant_id, vocab.watermark, _SYNC_CHUNK),
+                ).fetchall()
+            if not rows:
+                return version, documents
+            vocab.add(_document_terms(row["title"], row["head"]) for row in rows)
+            vocab.watermark = int(rows[-1]["rowid"])
+
+    def refresh(self, tenant_id: str) -> None:
+        """Schedule newly ingested rows if this tenant's vocabulary is loaded."""
+        with self._lock:
+            if tenant_id in self._tenants:
+                self._mark_dirty(tenant_id)
+
+    def discard(self, tenant_id: str, removed: Iterable[Tuple[int, str, str]]) -> None:
+        """Schedule removed (rowid, title, content) rows to be taken out of a
+        loaded vocabulary."""
+        with self._lock:
+            vocab = self._tenants.get(tenant_id)
+            if vocab is None:
+                return
+            vocab.removed.extend(removed)
+            self._mark_dirty(tenant_id)
+
+    def complete(
+        self, db: ConnectionManager, tenant_id: str, prefix: str, limit: int
+    ) -> Optional[List[Tuple[str, int]]]:
+        """Top completions of ``prefix``, or None while the tenant's vocabulary
+        is still being built."""
+        version, _ = repo.tenant_version(db, tenant_id)
+        with self._lock:
+            vocab = self._tenants.get(tenant_id)
+            if vocab is None:
+                vocab = self._tenants[tenant_id] = _TenantVocabulary()
+                self._mark_dirty(tenant_id)
+            elif vocab.version != version:
+                self._mark_dirty(tenant_id)
+        if not vocab.ready.is_set():
+            return None
+        return vocab.complete(prefix, limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tenants = list(self._tenants.values())
+        return {"tenants": len(tenants), "terms": sum(vocab.size for vocab in tenants)}
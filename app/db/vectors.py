@@ -0,0 +1,562 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.embedding import Embedder, document_text
+from app.db import repo
+from app.db.sqlite import ConnectionManager, ShardRouter
+
+logger = logging.getLogger("app.vectors")
+
+_SYNC_CHUNK = 256
+_IVF_TRAIN_PER_LIST = 64
+_IVF_ITERATIONS = 8
+# Rows appended after an IVF build are scanned exactly; rebuild once they
+# exceed this fraction of the indexed rows.
+_IVF_REBUILD_TAIL = 0.2
+# Deleted documents' vectors are masked out of searches; the files are
+# rewritten without them once they exceed this fraction of the rows.
+_COMPACT_DEAD_FRACTION = 0.2
+# Rows past the stored vectors that a search embeds and scans itself while the
+# background thread catches up; older pending rows wait for the thread.
+_SEARCH_TAIL_ROWS = 16
+
+
+class IvfIndex:
+    """Inverted-file ANN index: spherical k-means lists over unit vectors.
+
+    Covers the first ``rows`` vectors of the matrix it was built from. A query
+    scores the ``nprobe`` closest centroids' lists only.
+    """
+
+    def __init__(self, matrix: np.ndarray, seed: int = 0) -> None:
+        rows = matrix.shape[0]
+        nlist = max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(seed)
+        sample_size = min(rows, nlist * _IVF_TRAIN_PER_LIST)
+        sample = np.asarray(matrix[np.sort(rng.choice(rows, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(_IVF_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid.
+            np.divide(sums, norms, out=centroids, where=norms > 0)
+        assign = np.concatenate(
+            [
+                np.argmax(np.asarray(matrix[start : start + 8192]) @ centroids.T, axis=1)
+                for start in range(0, rows, 8192)
+            ]
+        )
+        self.rows = rows
+        self.centroids = centroids
+        self.order = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(assign[self.order], np.arange(nlist + 1))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        probes = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        return np.concatenate(
+            [self.order[self.offsets[probe] : self.offsets[probe + 1]] for probe in probes]
+        )
+
+
+class _TenantVectors:
+    """Append-only float32 matrix plus int64 document rowids for one tenant.
+
+    Readers take ``snapshot`` (an immutable tuple swapped on every change) and
+    never block on ``sync``. Its last element is a boolean mask of live rows,
+    or None while no stored document has been deleted.
+
+    The files are shared by every worker process; anything that writes them
+    holds ``file_lock`` and calls ``refresh`` first, so the watermark always
+    comes from the files on disk rather than from this process's last look.
+    """
+
+    def __init__(self, base_path: str, dim: int) -> None:
+        self.vec_path = base_path + ".f32"
+        self.ids_path = base_path + ".ids"
+        self.lock_path = base_path + ".lock"
+        # Inode of the mapped ids file; a compaction in another process
+        # replaces the files and shows up as a new inode.
+        self.inode: Optional[int] = None
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.ivf: Optional[IvfIndex] = None
+        self.live: Optional[np.ndarray] = None
+        # tenant_stats version of the last sync; None before the first one.
+        self.version: Optional[int] = None
+        self.snapshot: Tuple[
+            np.ndarray, np.ndarray, Optional[IvfIndex], Optional[np.ndarray]
+        ] = (
+            np.zeros((0, dim), dtype=np.float32),
+            np.zeros(0, dtype=np.int64),
+            None,
+            None,
+        )
+        with self.file_lock():
+            self._load()
+
+    @contextmanager
+    def file_lock(self) -> Iterator[None]:
+        """Exclusive flock on the tenant's files, across processes."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the descriptor releases the lock.
+            os.close(fd)
+
+    def _load(self) -> None:
+        if any(os.path.exists(path + ".tmp") for path in (self.vec_path, self.ids_path)):
+            # Interrupted compaction: the pair may be inconsistent, re-embed.
+            for path in (self.vec_path, self.ids_path):
+                for leftover in (path, path + ".tmp"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+        vec_rows = _file_size(self.vec_path) // (4 * self.dim)
+        id_rows = _file_size(self.ids_path) // 8
+        rows = min(vec_rows, id_rows)
+        # Drop a torn append (one file written past the other).
+        for path, width in ((self.vec_path, 4 * self.dim), (self.ids_path, 8)):
+            if _file_size(path) != rows * width:
+                with open(path, "ab") as handle:
+                    handle.truncate(rows * width)
+        self._remap(rows)
+
+    def _remap(self, rows: int) -> None:
+        self.inode = _inode(self.ids_path)
+        if rows == 0:
+            self.snapshot = (
+                np.zeros((0, self.dim), dtype=np.float32),
+                np.zeros(0, dtype=np.int64),
+                None,
+                None,
+            )
+            return
+        matrix = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(rows,))
+        if self.live is not None and self.live.shape[0] < rows:
+            self.live = np.concatenate(
+                [self.live, np.ones(rows - self.live.shape[0], dtype=bool)]
+            )
+        self.snapshot = (matrix, ids, self.ivf, self.live)
+
+    def refresh(self) -> None:
+        """Map what other processes appended or compacted since the last look.
+
+        Caller holds ``file_lock``; appends and compactions are only made under
+        it, so both files are complete.
+        """
+        inode = _inode(self.ids_path)
+        rows = min(_file_size(self.vec_path) // (4 * self.dim), _file_size(self.ids_path) // 8)
+        if self.inode is not None and inode != self.inode:
+            # Compacted elsewhere: row positions changed, so the IVF lists and
+            # the live mask no longer apply. Deletions this process knew of
+            # are found again by the next sync's reconcile.
+            self.ivf = None
+            self.live = None
+            self._remap(rows)
+        elif rows != self.rows:
+            self._remap(rows)
+
+    def changed_on_disk(self) -> bool:
+        """Whether another process appended or compacted since the last look."""
+        try:
+            stat = os.stat(self.ids_path)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self.inode or stat.st_size != self.rows * 8
+
+    @property
+    def rows(self) -> int:
+        return self.snapshot[1].shape[0]
+
+    @property
+    def watermark(self) -> int:
+        ids = self.snapshot[1]
+        return int(ids[-1]) if ids.shape[0] else 0
+
+    def append(self, rids: np.ndarray, vectors: np.ndarray) -> None:
+        # Caller holds ``file_lock`` and has called ``refresh``.
+        with open(self.vec_path, "ab") as handle:
+            handle.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.ids_path, "ab") as handle:
+            handle.write(np.ascontiguousarray(rids, dtype=np.int64).tobytes())
+        self._remap(self.rows + len(rids))
+
+    @property
+    def dead(self) -> int:
+        live = self.snapshot[3]
+        return 0 if live is None else live.shape[0] - int(np.count_nonzero(live))
+
+    def discard(self, rowids: np.ndarray) -> None:
+        """Mask out the stored vectors of deleted documents."""
+        matrix, ids, ivf, live = self.snapshot
+        positions = np.searchsorted(ids, rowids)
+        found = positions < ids.shape[0]
+        positions = positions[found]
+        positions = positions[np.asarray(ids[positions]) == rowids[found]]
+        if not positions.shape[0]:
+            return
+        self.live = np.ones(ids.shape[0], dtype=bool) if live is None else live.copy()
+        self.live[positions] = False
+        self.snapshot = (matrix, ids, ivf, self.live)
+
+    def maybe_compact(self) -> None:
+        """Rewrite the files without dead rows once there are enough of them.
+
+        Caller holds ``file_lock`` and has called ``refresh``. Both files are
+        written to temporaries first; ``_load`` treats a leftover temporary as
+        an interrupted compaction and starts over. Other processes keep
+        reading their mappings of the replaced files until their next
+        ``refresh``.
+        """
+        matrix, ids, _, live = self.snapshot
+        if live is None or self.dead <= live.shape[0] * _COMPACT_DEAD_FRACTION:
+            return
+        keep = np.flatnonzero(live)
+        for path, data in ((self.vec_path, matrix), (self.ids_path, ids)):
+            with open(path + ".tmp", "wb") as handle:
+                for start in range(0, keep.shape[0], 8192):
+                    chunk = np.asarray(data[keep[start : start + 8192]])
+                    handle.write(np.ascontiguousarray(chunk).tobytes())
+        os.replace(self.ids_path + ".tmp", self.ids_path)
+        os.replace(self.vec_path + ".tmp", self.vec_path)
+        self.ivf = None
+        self.live = None
+        self._remap(keep.shape[0])
+
+    def maybe_build_ivf(self, min_rows: int) -> None:
+        matrix, ids, ivf, live = self.snapshot
+        rows = ids.shape[0]
+        if min_rows <= 0 or rows < min_rows:
+            return
+        if ivf is not None and rows - ivf.rows <= ivf.rows * _IVF_REBUILD_TAIL:
+            return
+        self.ivf = IvfIndex(matrix)
+        self.snapshot = (matrix, ids, self.ivf, live)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class VectorStore:
+    """Per-tenant embedding store kept in sync with the documents table.
+
+    Vectors are derived data: each tenant's files are appended in document
+    rowid order, and ``sync`` embeds rows past the last stored rowid. Ingest
+    routes call ``mark_dirty``; a background thread catches dirty tenants up,
+    compacts their files and builds IVF indexes, then swaps in the new
+    snapshot. Searches never sync: they score the current snapshot, and on a
+    tenant with pending rows they also embed and scan the first
+    ``_SEARCH_TAIL_ROWS`` rows past it, so a search sees recent writes. A
+    search marks the tenant dirty when another worker appended to or
+    compacted its files, or wrote to its documents (its ``tenant_stats``
+    version moved), so every worker catches up with every write. Tenants seen
+    for the first time in this process are treated as dirty, which also
+    backfills documents written before vectors existed.
+    """
+
+    def __init__(
+        self,
+        db: ShardRouter,
+        directory: str,
+        embedder: Embedder,
+        ivf_min_rows: int,
+        nprobe: int,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._db = db
+        self._directory = directory
+        self.embedder = embedder
+        self._ivf_min_rows = ivf_min_rows
+        self._nprobe = max(1, nprobe)
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantVectors] = {}
+        self._dirty: Set[str] = set()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._embedded = 0
+        self._embed_ms_sum = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="vector-indexer", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def mark_dirty(self, tenant_id: str) -> None:
+        with self._lock:
+            self._dirty.add(tenant_id)
+            self._wakeup.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._dirty and not self._stopped:
+                    self._wakeup.wait()
+                if self._stopped:
+                    return
+                tenant_id = next(iter(self._dirty))
+            try:
+                with self._db.lease(tenant_id) as db:
+                    self.sync(db, tenant_id)
+            except Exception:
+                logger.exception("Vector sync failed for tenant %s", tenant_id)
+                time.sleep(1.0)
+
+    def _tenant(self, tenant_id: str) -> _TenantVectors:
+        with self._lock:
+            vectors = self._tenants.get(tenant_id)
+            if vectors is None:
+                base = os.path.join(self._directory, tenant_id.encode("utf-8").hex())
+                vectors = self._tenants[tenant_id] = _TenantVectors(
+                    base, self.embedder.dim
+                )
+                self._dirty.add(tenant_id)
+            return vectors
+
+    def sync(self, db: ConnectionManager, tenant_id: str) -> int:
+        """Embed and append documents newer than the tenant's last vector.
+
+        Once caught up, more live vectors than documents means deletions this
+        process did not see (made by another worker, or while it was down);
+        the stored rowids are then reconciled with the documents table.
+        """
+        vectors = self._tenant(tenant_id)
+        appended = 0
+        with vectors.lock:
+            with self._lock:
+                self._dirty.discard(tenant_id)
+            while True:
+                # Another worker may have embedded the same rows already: the
+                # watermark is re-read from disk under the file lock, and the
+                # lock is held until this chunk is appended.
+                with vectors.file_lock():
+                    vectors.refresh()
+                    # Read before the rows: if none follow, the count covers
+                    # exactly the documents up to the watermark.
+                    version, documents = repo.tenant_version(db, tenant_id)
+                    with db.reader() as conn:
+                        rows = conn.execute(
+                            """
+                            SELECT rowid, title, content
+                            FROM documents
+                            WHERE tenant_id = ? AND rowid > ?
+                            ORDER BY rowid
+                            LIMIT ?;
+                            """,
+                            (tenant_id, vectors.watermark, _SYNC_CHUNK),
+                        ).fetchall()
+                    if not rows:
+                        if vectors.rows - vectors.dead != documents:
+                            self._reconcile(db, tenant_id, vectors)
+                        break
+                    start = time.perf_counter()
+                    embedded = self.embedder.embed(
+                        [document_text(row["title"], row["content"]) for row in rows]
+                    )
+                    vectors.append(
+                        np.fromiter((row["rowid"] for row in rows), np.int64, len(rows)),
+                        embedded,
+                    )
+                appended += len(rows)
+                with self._lock:
+                    self._embedded += len(rows)
+                    self._embed_ms_sum += (time.perf_counter() - start) * 1000
+            with vectors.file_lock():
+                vectors.refresh()
+                vectors.maybe_compact()
+            vectors.maybe_build_ivf(self._ivf_min_rows)
+            vectors.version = version
+        return appended
+
+    def _reconcile(
+        self, db: ConnectionManager, tenant_id: str, vectors: _TenantVectors
+    ) -> None:
+        with db.reader() as conn:
+            live_rowids = np.fromiter(
+                (
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT rowid FROM documents WHERE tenant_id = ?;", (tenant_id,)
+                    )
+                ),
+                np.int64,
+            )
+        ids = np.asarray(vectors.snapshot[1])
+        vectors.discard(ids[~np.isin(ids, live_rowids)])
+
+    def discard(self, tenant_id: str, rowids: Sequence[int]) -> None:
+        """Drop deleted documents from vector search.
+
+        Tenants not loaded yet, and other workers, find the deletion by
+        reconciling with the documents table on their next sync instead.
+        """
+        with self._lock:
+            vectors = self._tenants.get(tenant_id)
+        if vectors is None or not rowids:
+            return
+        with vectors.lock:
+            vectors.discard(np.asarray(rowids, dtype=np.int64))
+
+    def count(self, tenant_id: str) -> int:
+        vectors = self._tenant(tenant_id)
+        return vectors.rows - vectors.dead
+
+    def search(
+        self,
+        db: ConnectionManager,
+        tenant_id: str,
+        query: np.ndarray,
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-``k`` document rowids by cosine similarity, best first.
+
+        ``allowed`` (sorted rowids) restricts the result to those documents.
+        """
+        vectors = self._tenant(tenant_id)
+        snapshot = vectors.snapshot
+        with self._lock:
+            pending = tenant_id in self._dirty
+        if not pending and (
+            vectors.changed_on_disk()
+            or repo.tenant_version(db, tenant_id)[0] != vectors.version
+        ):
+            self.mark_dirty(tenant_id)
+            pending = True
+        rowids, scores = self._scan(snapshot, query, k, allowed)
+        if not pending or k <= 0:
+            return rowids, scores
+        ids = snapshot[1]
+        tail_ids, tail_scores = self._scan_tail(
+            db, tenant_id, int(ids[-1]) if ids.shape[0] else 0, query, allowed
+        )
+        if not tail_ids.shape[0]:
+            return rowids, scores
+        rowids = np.concatenate([rowids, tail_ids])
+        scores = np.concatenate([scores, tail_scores])
+        top = np.argsort(-scores, kind="stable")[:k]
+        return rowids[top], scores[top]
+
+    def _scan(
+        self,
+        snapshot: Tuple[np.ndarray, np.ndarray, Optional[IvfIndex], Optional[np.ndarray]],
+        query: np.ndarray,
+        k: int,
+        allowed: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        matrix, ids, ivf, live = snapshot
+        if k <= 0 or not ids.shape[0]:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if ivf is None:
+            rows = None
+            scores = matrix @ query
+        else:
+            # Approximate over the indexed rows, exact over rows appended since.
+            rows = np.sort(
+                np.concatenate(
+                    [ivf.candidates(query, self._nprobe), np.arange(ivf.rows, ids.shape[0])]
+                )
+            )
+            scores = matrix[rows] @ query
+        keep = None
+        if allowed is not None:
+            keep = np.isin(ids if rows is None else ids[rows], allowed, assume_unique=True)
+        if live is not None:
+            alive = live if rows is None else live[rows]
+            keep = alive if keep is None else keep & alive
+        if keep is not None:
+            rows = np.flatnonzero(keep) if rows is None else rows[keep]
+            scores = scores[keep]
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        positions = top if rows is None else rows[top]
+        return np.asarray(ids[positions]), np.asarray(scores[top])
+
+    def _scan_tail(
+        self,
+        db: ConnectionManager,
+        tenant_id: str,
+        watermark: int,
+        query: np.ndarray,
+        allowed: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact scores of the first rows past ``watermark``, embedded here
+        and not stored."""
+        with db.reader() as conn:
+            rows = conn.execute(
+                """
+                SELECT rowid, title, content
+                FROM documents
+                WHERE tenant_id = ? AND rowid > ?
+                ORDER BY rowid
+                LIMIT ?;
+                """,
+                (tenant_id, watermark, _SEARCH_TAIL_ROWS),
+            ).fetchall()
+        rids = np.fromiter((row["rowid"] for row in rows), np.int64, len(rows))
+        if allowed is not None:
+            keep = np.isin(rids, allowed)
+            rows = [row for row, kept in zip(rows, keep) if kept]
+            rids = rids[keep]
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        embedded = self.embedder.embed(
+            [document_text(row["title"], row["content"]) for row in rows]
+        )
+        return rids, embedded @ query
+
+    def stats(self) -> dict:
+        with self._lock:
+            tenants = list(self._tenants.values())
+            dirty = len(self._dirty)
+            embedded = self._embedded
+            embed_ms = self._embed_ms_sum
+        return {
+            "dim": self.embedder.dim,
+            "tenants": len(tenants),
+            "vectors": sum(vectors.rows for vectors in tenants),
+            "deleted": sum(vectors.dead for vectors in tenants),
+            "ivfIndexes": sum(1 for vectors in tenants if vectors.snapshot[2] is not None),
+            "dirtyTenants": dirty,
+            "embedded": embedded,
+            "embedMsPerDoc": embed_ms / embedded if embedded else 0.0,
+        }
@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import repo
+from app.db.sqlite import ShardRouter
+
+_PendingWrite = Tuple[repo.WriteOp, Future]
+
+
+def _size_bucket(size: int) -> str:
+    bucket = 1
+    while bucket < size:
+        bucket *= 2
+    return str(bucket)
+
+
+def _coalesce(batch: List[_PendingWrite]) -> List[Tuple[repo.WriteOp, List[Future]]]:
+    """Merge queued updates of the same document into one update.
+
+    Later fields win, so the merged update writes (and reindexes) only the
+    latest version; every merged caller gets its result. Merging moves an
+    update ahead of the ops queued between it and the first one, so a run
+    ends at any op that could touch the document: a delete of it, or an
+    ingest with a source id for its tenant (which may replace it).
+    """
+    merged: List[Tuple[repo.WriteOp, List[Future]]] = []
+    # tenant -> document -> index in ``merged`` of its open update
+    open_updates: Dict[str, Dict[str, int]] = {}
+    for op, future in batch:
+        kind, args = op
+        if kind == "update":
+            documents = open_updates.setdefault(args[0], {})
+            index = documents.get(args[1])
+            if index is not None:
+                (_, (tenant_id, document_id, fields)), futures = merged[index]
+                merged[index] = (
+                    ("update", (tenant_id, document_id, {**fields, **args[2]})),
+                    futures + [future],
+                )
+                continue
+            documents[args[1]] = len(merged)
+        elif kind == "delete":
+            open_updates.get(args[0], {}).pop(args[1], None)
+        elif kind == "ingest" and args[4] is not None:
+            open_updates.pop(args[0], None)
+        merged.append((op, [future]))
+    return merged
+
+
+def _resolve(futures: List[Future], written: Tuple[Any, List[repo.RemovedDocument]]) -> None:
+    # Removed rows go to the first caller only, so derived indexes drop each
+    # old version once.
+    result, removed = written
+    futures[0].set_result((result, removed))
+    for future in futures[1:]:
+        future.set_result((result, []))
+
+
+class WriteQueue:
+    """Group-commit queue for single-document writes.
+
+    A dedicated writer thread drains pending ingests, updates and deletes and
+    commits them in one transaction per shard once ``max_batch`` writes are
+    queued or ``max_wait_ms`` has passed since the first one arrived. Each
+    caller blocks on its own future, which resolves only after the commit to
+    (result, removed rows) as returned by ``repo.write_documents``.
+
+    Batches holding an update wait at least ``update_coalesce_ms`` so rapid
+    successive updates of one document collapse into a single write.
+    """
+
+    def __init__(
+        self,
+        db: ShardRouter,
+        max_batch: int,
+        max_wait_ms: int,
+        update_coalesce_ms: int = 0,
+    ) -> None:
+        self._db = db
+        self._max_batch = max(1, max_batch)
+        self._max_wait_s = max(0, max_wait_ms) / 1000.0
+        self._update_wait_s = max(self._max_wait_s, update_coalesce_ms / 1000.0)
+        self._queue: "queue.Queue[Optional[_PendingWrite]]" = queue.Queue()
+        self._closed = False
+        self._closed_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._documents = 0
+        self._failures = 0
+        self._coalesced = 0
+        self._batch_sizes: Dict[str, int] = {}
+        self._commit_ms_sum = 0.0
+        self._commit_ms_max = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="ingest-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, op: repo.WriteOp) -> "Future[Tuple[Any, List[repo.RemovedDocument]]]":
+        future: "Future[Tuple[Any, List[repo.RemovedDocument]]]" = Future()
+        with self._closed_lock:
+            # The writer thread is gone after close, so nothing would ever
+            # resolve a queued future.
+            if self._closed:
+                future.set_exception(RuntimeError("Write queue is closed"))
+                return future
+            self._queue.put((op, future))
+        return future
+
+    def submit(
+        self,
+        tenant_id: str,
+        title: str,
+        content: str,
+        tags: List[str],
+        source_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> "Future[Tuple[Any, List[repo.RemovedDocument]]]":
+        return self._put(
+            ("ingest", (tenant_id, title, content, tags, source_id, idempotency_key))
+        )
+
+    def submit_update(
+        self, tenant_id: str, document_id: str, fields: Dict[str, Any]
+    ) -> "Future[Tuple[Any, List[repo.RemovedDocument]]]":
+        return self._put(("update", (tenant_id, document_id, fields)))
+
+    def submit_delete(
+        self, tenant_id: str, document_id: str
+    ) -> "Future[Tuple[Any, List[repo.RemovedDocument]]]":
+        return self._put(("delete", (tenant_id, document_id)))
+
+    def close(self) -> None:
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = self._fill(batch)
+            groups: Dict[str, List[_PendingWrite]] = {}
+            for pending in batch:
+                # Every op's arguments start with the tenant id.
+                groups.setdefault(self._db.shard_path(pending[0][1][0]), []).append(
+                    pending
+                )
+            for group in groups.values():
+                self._commit(group)
+            if stop:
+                return
+
+    def _fill(self, batch: List[_PendingWrite]) -> bool:
+        start = time.monotonic()
+        wait = self._update_wait_s if batch[0][0][0] == "update" else self._max_wait_s
+        while len(batch) < self._max_batch:
+            remaining = start + wait - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+            if item[0][0] == "update":
+                wait = self._update_wait_s
+        return False
+
+    def _commit(self, batch: List[_PendingWrite]) -> None:
+        merged = _coalesce(batch)
+        start = time.perf_counter()
+        try:
+            with self._db.lease(merged[0][0][1][0]) as db:
+                written = repo.write_documents(db, [op for op, _ in merged])
+        except Exception:
+            # Retry one by one so a single bad write fails only its own callers.
+            self._commit_individually(merged)
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record(len(batch), len(batch) - len(merged), elapsed_ms)
+        for (_, futures), result in zip(merged, written):
+            _resolve(futures, result)
+
+    def _commit_individually(
+        self, merged: List[Tuple[repo.WriteOp, List[Future]]]
+    ) -> None:
+        for op, futures in merged:
+            start = time.perf_counter()
+            try:
+                with self._db.lease(op[1][0]) as db:
+                    result = repo.write_documents(db, [op])[0]
+            except Exception as exc:
+                with self._stats_lock:
+                    self._failures += len(futures)
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._record(len(futures), len(futures) - 1, elapsed_ms)
+            _resolve(futures, result)
+
+    def _record(self, size: int, coalesced: int, commit_ms: float) -> None:
+        bucket = _size_bucket(size)
+        with self._stats_lock:
+            self._batches += 1
+            self._documents += size
+            self._coalesced += coalesced
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+            self._commit_ms_sum += commit_ms
+            self._commit_ms_max = max(self._commit_ms_max, commit_ms)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queueDepth": self._queue.qsize(),
+                "maxBatch": self._max_batch,
+                "maxWaitMs": self._max_wait_s * 1000,
+                "batches": self._batches,
+                "documents": self._documents,
+                "failures": self._failures,
+                "coalescedUpdates": self._coalesced,
+                "batchSizes": dict(self._batch_sizes),
+                "commitMsAvg": self._commit_ms_sum / self._batches if self._batches else 0.0,
+                "commitMsMax": self._commit_ms_max,
+            }
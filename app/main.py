@@ -1,94 +1,155 @@
-import os
 import threading
-import time
-import uuid
 from contextlib import asynccontextmanager
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
-from app.api import routes_docs, routes_health, routes_metrics, routes_search
+from app.api import (
+    routes_admin,
+    routes_docs,
+    routes_export,
+    routes_health,
+    routes_metrics,
+    routes_search,
+    routes_suggest,
+)
+from app.core.admission import AdmissionController
+from app.core.cache import SearchCache
 from app.core.config import get_settings
-from app.core.logging import log_request, setup_logging
+from app.core.embedding import load_embedder
+from app.core.logging import setup_logging, shutdown_logging
 from app.core.metrics import MetricsCollector
+from app.core.middleware import RequestContextMiddleware
+from app.core.shared_metrics import SharedMetricsCollector
+from app.db.maintenance import FtsMaintenance, configure_fts
 from app.db.schema import apply_schema
-from app.db.sqlite import get_connection
-
-
-def _get_endpoint_label(request: Request) -> str:
-    route = request.scope.get("route")
-    if route and hasattr(route, "path"):
-        return f"{request.method} {route.path}"
-    return f"{request.method} {request.url.path}"
-
-
-def _get_tenant_id(request: Request) -> Optional[str]:
-    return request.path_params.get("tenantId") if request.path_params else None
+from app.db.sqlite import PoolTimeoutError, ShardRouter
+from app.db.suggest import SuggestIndex
+from app.db.vectors import VectorStore
+from app.db.write_queue import WriteQueue
 
 
 def create_app() -> FastAPI:
     settings = get_settings()
-    setup_logging(settings.log_level)
+    setup_logging(
+        settings.log_level,
+        settings.log_queue_size,
+        settings.log_sample_rates,
+        settings.log_sample_default,
+    )
 
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncIterator[None]:
         yield
+        app.state.fts_maintenance.close()
+        app.state.write_queue.close()
+        app.state.vectors.close()
+        app.state.suggest.close()
         app.state.db.close()
+        app.state.metrics.close()
+        shutdown_logging()
+
+    def init_shard(conn) -> None:
+        apply_schema(conn)
+        configure_fts(
+            conn,
+            settings.fts_automerge,
+            settings.fts_crisismerge,
+            settings.fts_usermerge,
+        )
 
     app = FastAPI(lifespan=lifespan)
-    conn = get_connection(settings.db_path)
-    apply_schema(conn)
-
-    app.state.db = conn
-    app.state.db_lock = threading.Lock()
+    db = ShardRouter(
+        settings.db_path,
+        settings.db_shard_mode,
+        settings.db_shard_count,
+        settings.db_shard_dir,
+        settings.db_shard_max_open,
+        settings.db_pool_size,
+        settings.db_pool_timeout_ms,
+        init_shard=init_shard,
+        pragma_profile=settings.db_pragma_profile,
+    )
+    db.warm()
+
+    app.state.db = db
+    # Last tenant_stats per shard path, for metrics scrapes (map_shards_cached).
+    app.state.shard_stats = {}
+    app.state.write_queue = WriteQueue(
+        db,
+        settings.ingest_group_max_docs,
+        settings.ingest_group_max_wait_ms,
+        settings.ingest_update_coalesce_ms,
+    )
+    app.state.fts_maintenance = FtsMaintenance(
+        db,
+        settings.fts_maintenance_interval_s,
+        settings.fts_maintenance_idle_ms,
+        settings.fts_maintenance_budget_ms,
+        settings.fts_merge_pages,
+    )
+    app.state.fts_maintenance.start()
+    app.state.vectors = VectorStore(
+        db,
+        settings.vector_dir,
+        load_embedder(settings.embedder, settings.embedding_dim),
+        settings.vector_ivf_min_rows,
+        settings.vector_ivf_nprobe,
+    )
+    app.state.vectors.start()
+    app.state.suggest = SuggestIndex(db)
+    app.state.suggest.start()
     app.state.settings = settings
-    app.state.metrics = MetricsCollector()
+    app.state.export_slots = threading.BoundedSemaphore(max(1, settings.export_max_concurrent))
+    if settings.metrics_backend == "shared":
+        app.state.metrics = SharedMetricsCollector(
+            settings.metrics_dir, settings.metrics_max_series
+        )
+    else:
+        app.state.metrics = MetricsCollector()
+    app.state.search_cache = SearchCache(
+        settings.search_cache_max_bytes,
+        settings.search_cache_ttl_seconds,
+        app.state.metrics,
+        settings.search_cache_version_check_seconds,
+    )
+    app.state.admission = AdmissionController(
+        app.state.metrics,
+        settings.admission_max_concurrent,
+        settings.admission_max_queue,
+        settings.admission_queue_timeout_ms,
+        settings.tenant_rate_limits,
+        settings.tenant_rate_default,
+    )
 
     @app.exception_handler(RequestValidationError)
     async def validation_exception_handler(request: Request, exc: RequestValidationError):
         return JSONResponse(status_code=400, content={"detail": "Invalid request"})
 
-    @app.middleware("http")
-    async def request_context_middleware(request: Request, call_next):
-        request_id = request.headers.get("X-Request-Id") or str(uuid.uuid4())
-        start = time.perf_counter()
-        status_code = 500
-        try:
-            response = await call_next(request)
-            status_code = response.status_code
-        except Exception:
-            response = JSONResponse(
-                status_code=500, content={"detail": "Internal Server Error"}
-            )
-        latency_ms = (time.perf_counter() - start) * 1000
-        endpoint_label = _get_endpoint_label(request)
-        tenant_id = _get_tenant_id(request)
-        app.state.metrics.record_request(endpoint_label, tenant_id, status_code, latency_ms)
-        log_request(
-            {
-                "request_id": request_id,
-                "tenant_id": tenant_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status": status_code,
-                "latency_ms": latency_ms,
-            }
-        )
-        response.headers["X-Request-Id"] = request_id
-        return response
+    @app.exception_handler(PoolTimeoutError)
+    async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+        return JSONResponse(status_code=503, content={"detail": "Service busy"})
+
+    app.add_middleware(RequestContextMiddleware, metrics=app.state.metrics)
 
     app.include_router(routes_docs.router)
+    app.include_router(routes_export.router)
     app.include_router(routes_search.router)
+    app.include_router(routes_suggest.router)
     app.include_router(routes_health.router)
     app.include_router(routes_metrics.router)
+    app.include_router(routes_admin.router)
 
     return app
 
 
-if os.getenv("APP_DISABLE_AUTOCREATE") == "1":
-    app = FastAPI()
-else:
-    app = create_app()
-
+def __getattr__(name: str) -> FastAPI:
+    # ``uvicorn app.main:app`` resolves ``app`` with getattr, so the app is
+    # built on first access rather than on import.
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
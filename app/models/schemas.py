@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -7,6 +7,7 @@ class DocumentIn(BaseModel):
     title: str = Field(..., min_length=1)
     content: str = Field(..., min_length=1)
     tags: List[str]
+    sourceId: Optional[str] = Field(None, min_length=1, max_length=256)
 
 
 class IngestResponse(BaseModel):
@@ -15,6 +16,45 @@ class IngestResponse(BaseModel):
     createdAt: str
 
 
+class DocumentReplace(BaseModel):
+    title: str = Field(..., min_length=1)
+    content: str = Field(..., min_length=1)
+    tags: List[str]
+
+
+class DocumentPatch(BaseModel):
+    title: Optional[str] = Field(None, min_length=1)
+    content: Optional[str] = Field(None, min_length=1)
+    tags: Optional[List[str]] = None
+
+
+class UpdateResponse(BaseModel):
+    documentId: str
+    tenantId: str
+    createdAt: str
+    updatedAt: str
+    reindexed: bool
+
+
+class BatchIngestIn(BaseModel):
+    documents: List[Any]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: int
+    documentId: Optional[str] = None
+    createdAt: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchIngestResponse(BaseModel):
+    tenantId: str
+    accepted: int
+    rejected: int
+    results: List[BatchItemResult]
+
+
 class SearchResult(BaseModel):
     documentId: str
     title: str
@@ -24,13 +64,39 @@ class SearchResult(BaseModel):
     createdAt: str
 
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
 class SearchResponse(BaseModel):
     tenantId: str
     query: str
     limit: int
     offset: int
     total: int
+    totalIsEstimate: bool = False
     results: List[SearchResult]
+    nextCursor: Optional[str] = None
+    facets: Optional[Dict[str, List[FacetCount]]] = None
+
+
+class SuggestTerm(BaseModel):
+    term: str
+    docFreq: int
+
+
+class SuggestTitle(BaseModel):
+    documentId: str
+    title: str
+
+
+class SuggestResponse(BaseModel):
+    tenantId: str
+    query: str
+    terms: List[SuggestTerm]
+    titles: List[SuggestTitle]
+    partial: bool = False
 
 
 class HealthResponse(BaseModel):
@@ -43,5 +109,14 @@ class MetricsResponse(BaseModel):
     requests: dict
     latencyMs: dict
     errors: dict
+    cache: dict
+    admission: dict
     documents: dict
+    db: dict
+    ingest: dict
+    logging: dict
+    fts: dict
+    vectors: dict
+    suggest: dict
+    workers: dict
 
@@ -1,92 +1,371 @@
+"""Concurrent load benchmark against a real uvicorn server.
+
+Seeds a multi-tenant corpus (Zipfian vocabulary, skewed tenant sizes) straight
+into the database, starts ``uvicorn app.main:app`` locally, drives a mix of
+search / ingest / metrics traffic either closed-loop (``--concurrency``) or
+open-loop (``--rate``), and prints throughput plus p50/p95/p99 per operation as
+JSON. With ``--baseline`` the run fails if any operation regressed.
+"""
 import argparse
+import asyncio
+import bisect
+import itertools
 import json
 import os
 import random
-import statistics
+import shutil
+import subprocess
+import sys
 import time
+from typing import Dict, List, Optional
 
-from fastapi.testclient import TestClient
+import httpx
 
 from app.core import config
 from app.db import repo
-from app.main import create_app
+from app.db.schema import apply_schema
+from app.db.sqlite import ShardRouter
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "de", "va", "zu", "che"]
+
+
+def _vocabulary(size: int) -> List[str]:
+    words: List[str] = []
+    for length in itertools.count(2):
+        for parts in itertools.product(_SYLLABLES, repeat=length):
+            words.append("".join(parts))
+            if len(words) == size:
+                return words
+    return words
+
+
+class Zipf:
+    """Samples indexes 0..n-1 with P(i) proportional to 1 / (i + 1) ** s."""
+
+    def __init__(self, n: int, s: float, rng: random.Random) -> None:
+        weights = [1.0 / (rank**s) for rank in range(1, n + 1)]
+        total = sum(weights)
+        self._cdf = list(itertools.accumulate(w / total for w in weights))
+        self._rng = rng
+
+    def sample(self) -> int:
+        return min(bisect.bisect_left(self._cdf, self._rng.random()), len(self._cdf) - 1)
+
+
+def _parse_mix(raw: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("search", "ingest", "metrics"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def _tenant_sizes(total_docs: int, tenants: int, skew: float) -> Dict[str, int]:
+    weights = [1.0 / (rank**skew) for rank in range(1, tenants + 1)]
+    scale = total_docs / sum(weights)
+    return {f"bt{idx}": max(1, int(w * scale)) for idx, w in enumerate(weights)}
+
 
-def _random_text(words, count):
-    return " ".join(random.choice(words) for _ in range(count))
+class Workload:
+    def __init__(self, args: argparse.Namespace, tenants: List[str]) -> None:
+        self.rng = random.Random(args.seed)
+        self.vocab = _vocabulary(args.vocab)
+        self.words = Zipf(len(self.vocab), args.zipf, self.rng)
+        self.tenants = tenants
+        self.tenant_pick = Zipf(len(tenants), args.tenant_skew, self.rng)
+        self.doc_words = args.doc_words
+        self.mix = _parse_mix(args.mix)
 
+    def text(self, count: int) -> str:
+        return " ".join(self.vocab[self.words.sample()] for _ in range(count))
 
-def _ensure_api_keys(api_key: str, tenant_id: str) -> None:
-    raw = os.getenv("API_KEYS_JSON")
-    if not raw:
-        os.environ["API_KEYS_JSON"] = f'{{"{api_key}":["{tenant_id}"]}}'
-        return
+    def document(self) -> dict:
+        return {
+            "title": self.text(5),
+            "content": self.text(self.doc_words),
+            "tags": [self.vocab[self.words.sample()] for _ in range(2)],
+        }
+
+    def tenant(self) -> str:
+        return self.tenants[self.tenant_pick.sample()]
+
+    def operation(self) -> str:
+        names = list(self.mix)
+        return self.rng.choices(names, weights=[self.mix[n] for n in names])[0]
+
+
+def seed_corpus(args: argparse.Namespace, workload: Workload, sizes: Dict[str, int]) -> None:
+    settings = config.get_settings()
+    router = ShardRouter(
+        settings.db_path,
+        settings.db_shard_mode,
+        settings.db_shard_count,
+        settings.db_shard_dir,
+        settings.db_shard_max_open,
+        settings.db_pool_size,
+        settings.db_pool_timeout_ms,
+        init_shard=apply_schema,
+    )
     try:
-        parsed = json.loads(raw)
-        if not isinstance(parsed, dict):
-            raise ValueError("API_KEYS_JSON must be an object")
-    except Exception:
-        parsed = {}
-    tenants = parsed.get(api_key, [])
-    if tenant_id not in tenants:
-        tenants = list({*tenants, tenant_id})
-    parsed[api_key] = tenants
-    os.environ["API_KEYS_JSON"] = json.dumps(parsed)
+        for tenant_id, size in sizes.items():
+            with router.lease(tenant_id) as db:
+                for start in range(0, size, 1000):
+                    batch = []
+                    for _ in range(min(1000, size - start)):
+                        doc = workload.document()
+                        batch.append((doc["title"], doc["content"], doc["tags"]))
+                    repo.insert_documents(db, tenant_id, batch)
+    finally:
+        router.close()
+
+
+def start_server(args: argparse.Namespace) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.main:app",
+        "--host",
+        args.host,
+        "--port",
+        str(args.port),
+        "--workers",
+        str(args.workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, env=os.environ.copy())
+
+
+def wait_for_health(base_url: str, timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/v1/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("Server did not become healthy in time")
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.dropped = 0
+
+    def add(self, op: str, latency_ms: float, ok: bool) -> None:
+        self.latencies.setdefault(op, []).append(latency_ms)
+        if not ok:
+            self.errors[op] = self.errors.get(op, 0) + 1
+
+
+async def _request(
+    client: httpx.AsyncClient, workload: Workload, op: str, api_key: str
+) -> bool:
+    headers = {"X-API-Key": api_key}
+    if op == "metrics":
+        response = await client.get("/api/v1/metrics")
+        return response.status_code == 200
+    tenant_id = workload.tenant()
+    if op == "ingest":
+        response = await client.post(
+            f"/api/v1/tenants/{tenant_id}/documents",
+            headers=headers,
+            json=workload.document(),
+        )
+        return response.status_code == 201
+    terms = workload.text(workload.rng.choice((1, 1, 2)))
+    response = await client.get(
+        f"/api/v1/tenants/{tenant_id}/documents/search",
+        headers=headers,
+        params={"q": terms, "limit": 10},
+    )
+    return response.status_code == 200
+
+
+async def _timed(client, workload, op, api_key, recorder, started: float) -> None:
+    try:
+        ok = await _request(client, workload, op, api_key)
+    except httpx.HTTPError:
+        ok = False
+    recorder.add(op, (time.perf_counter() - started) * 1000, ok)
+
+
+async def run_closed_loop(args, workload, recorder, deadline: float) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                op = workload.operation()
+                await _timed(client, workload, op, args.api_key, recorder, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def run_open_loop(args, workload, recorder, deadline: float) -> None:
+    # Latency is measured from the scheduled send time, so server stalls are
+    # not hidden by the generator slowing down (no coordinated omission).
+    limits = httpx.Limits(max_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        in_flight: set = set()
+        next_send = time.perf_counter()
+        while next_send < deadline:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= args.max_in_flight:
+                recorder.dropped += 1
+            else:
+                op = workload.operation()
+                task = asyncio.create_task(
+                    _timed(client, workload, op, args.api_key, recorder, next_send)
+                )
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            next_send += workload.rng.expovariate(args.rate)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed_s: float) -> Dict[str, dict]:
+    report: Dict[str, dict] = {}
+    for op, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        report[op] = {
+            "count": len(values),
+            "errors": recorder.errors.get(op, 0),
+            "throughputRps": round(len(values) / elapsed_s, 2),
+            "p50": round(_percentile(values, 0.50), 3),
+            "p95": round(_percentile(values, 0.95), 3),
+            "p99": round(_percentile(values, 0.99), 3),
+        }
+    return report
+
+
+def compare(report: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for op, base in baseline.items():
+        current = report.get(op)
+        if current is None:
+            regressions.append(f"{op}: missing from this run")
+            continue
+        for field in ("p95", "p99"):
+            if current[field] > base[field] * (1 + tolerance):
+                regressions.append(
+                    f"{op}: {field} {current[field]:.2f}ms > baseline {base[field]:.2f}ms"
+                )
+        if current["throughputRps"] < base["throughputRps"] * (1 - tolerance):
+            regressions.append(
+                f"{op}: throughput {current['throughputRps']:.1f}/s < "
+                f"baseline {base['throughputRps']:.1f}/s"
+            )
+    return regressions
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Search benchmark")
-    parser.add_argument("--tenant", default="t1")
+    parser = argparse.ArgumentParser(description="Concurrent load benchmark")
     parser.add_argument("--api-key", default="benchmark_key")
-    parser.add_argument("--docs", type=int, default=10000)
-    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--docs", type=int, default=10000, help="total seeded docs")
+    parser.add_argument("--tenants", type=int, default=5)
+    parser.add_argument("--tenant-skew", type=float, default=1.0)
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--doc-words", type=int, default=60)
+    parser.add_argument("--mix", default="search=0.85,ingest=0.1,metrics=0.05")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop req/s")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--db-path", default="./data/benchmark.db")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="fail if worse than this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2)
     parser.add_argument("--threshold-ms", type=float, default=100.0)
     args = parser.parse_args()
+    args.base_url = f"http://{args.host}:{args.port}"
 
-    _ensure_api_keys(args.api_key, args.tenant)
-    if not os.getenv("DB_PATH"):
-        os.environ["DB_PATH"] = "./data/benchmark.db"
-
+    sizes = _tenant_sizes(args.docs, args.tenants, args.tenant_skew)
+    os.environ["API_KEYS_JSON"] = json.dumps({args.api_key: list(sizes)})
+    os.environ["DB_PATH"] = args.db_path
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
     config.get_settings.cache_clear()
-    app = create_app()
-    client = TestClient(app)
-
-    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta"]
-    conn = app.state.db
-    lock = app.state.db_lock
-
-    for idx in range(args.docs):
-        title = f"Doc {idx}"
-        content = _random_text(words, 20)
-        tags = [random.choice(words)]
-        repo.insert_document(conn, lock, args.tenant, title, content, tags)
-
-    for _ in range(20):
-        client.get(
-            f"/api/v1/tenants/{args.tenant}/documents/search",
-            headers={"X-API-Key": args.api_key},
-            params={"q": random.choice(words)},
-        )
+    if not args.keep_db:
+        for path in (args.db_path, args.db_path + "-wal", args.db_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(config.get_settings().db_shard_dir, ignore_errors=True)
 
-    latencies = []
-    for _ in range(args.queries):
-        query = random.choice(words)
-        start = time.perf_counter()
-        response = client.get(
-            f"/api/v1/tenants/{args.tenant}/documents/search",
-            headers={"X-API-Key": args.api_key},
-            params={"q": query},
-        )
-        if response.status_code != 200:
-            raise SystemExit(f"Unexpected status: {response.status_code}")
-        latencies.append((time.perf_counter() - start) * 1000)
+    workload = Workload(args, list(sizes))
+    seed_start = time.perf_counter()
+    seed_corpus(args, workload, sizes)
+    seed_s = time.perf_counter() - seed_start
+
+    server = start_server(args)
+    try:
+        wait_for_health(args.base_url)
+        runner = run_open_loop if args.rate > 0 else run_closed_loop
+        asyncio.run(runner(args, workload, Recorder(), time.perf_counter() + args.warmup))
+        recorder = Recorder()
+        started = time.perf_counter()
+        asyncio.run(runner(args, workload, recorder, started + args.duration))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    operations = summarize(recorder, elapsed)
+    report = {
+        "config": {
+            "docs": args.docs,
+            "tenantSizes": sizes,
+            "vocab": args.vocab,
+            "zipf": args.zipf,
+            "mix": workload.mix,
+            "mode": "open" if args.rate > 0 else "closed",
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "workers": args.workers,
+            "durationSeconds": round(elapsed, 2),
+            "seedSeconds": round(seed_s, 2),
+        },
+        "throughputRps": round(sum(op["count"] for op in operations.values()) / elapsed, 2),
+        "dropped": recorder.dropped,
+        "operations": operations,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
 
-    p50 = statistics.median(latencies)
-    p95 = statistics.quantiles(latencies, n=100)[94]
-    print(f"p50={p50:.2f}ms p95={p95:.2f}ms")
-    if p95 > args.threshold_ms:
-        raise SystemExit(f"p95 {p95:.2f}ms exceeded threshold {args.threshold_ms}ms")
+    failures: List[str] = []
+    search_p95: Optional[float] = operations.get("search", {}).get("p95")
+    if search_p95 is not None and search_p95 > args.threshold_ms:
+        failures.append(f"search p95 {search_p95:.2f}ms exceeded threshold {args.threshold_ms}ms")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            failures.extend(compare(operations, json.load(handle)["operations"], args.tolerance))
+    if failures:
+        raise SystemExit("Benchmark regressions:\n  " + "\n  ".join(failures))
 
 
 if __name__ == "__main__":
     main()
-
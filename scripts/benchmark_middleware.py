@@ -0,0 +1,138 @@
+"""Per-request overhead of the request-context middleware.
+
+Compares a bare app, the previous ``@app.middleware("http")`` implementation
+(``BaseHTTPMiddleware``) and the raw ASGI ``RequestContextMiddleware`` by
+calling each app directly over ASGI, with no network or client in the loop.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.core.logging import log_request
+from app.core.metrics import MetricsCollector
+from app.core.middleware import RequestContextMiddleware
+
+
+def _base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/tenants/{tenantId}/ping")
+    async def ping(tenantId: str) -> dict:
+        return {"tenantId": tenantId}
+
+    return app
+
+
+def _legacy_app(metrics: MetricsCollector) -> FastAPI:
+    app = _base_app()
+
+    @app.middleware("http")
+    async def request_context_middleware(request: Request, call_next):
+        request_id = request.headers.get("X-Request-Id") or str(uuid.uuid4())
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        except Exception:
+            response = JSONResponse(
+                status_code=500, content={"detail": "Internal Server Error"}
+            )
+        latency_ms = (time.perf_counter() - start) * 1000
+        route = request.scope.get("route")
+        endpoint_label = f"{request.method} {route.path if route else request.url.path}"
+        tenant_id = request.path_params.get("tenantId") if request.path_params else None
+        metrics.record_request(endpoint_label, tenant_id, status_code, latency_ms)
+        log_request(
+            {
+                "request_id": request_id,
+                "tenant_id": tenant_id,
+                "method": request.method,
+                "path": request.url.path,
+                "status": status_code,
+                "latency_ms": latency_ms,
+            },
+            endpoint=endpoint_label,
+        )
+        response.headers["X-Request-Id"] = request_id
+        return response
+
+    return app
+
+
+def _asgi_app(metrics: MetricsCollector) -> FastAPI:
+    app = _base_app()
+    app.add_middleware(RequestContextMiddleware, metrics=metrics)
+    return app
+
+
+def _scope() -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/tenants/t1/ping",
+        "raw_path": b"/api/v1/tenants/t1/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"x-request-id", b"bench-req")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def _run(app, requests: int) -> list:
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        return None
+
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await app(_scope(), receive, send)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Middleware overhead benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    apps = {
+        "none": _base_app(),
+        "baseHttpMiddleware": _legacy_app(MetricsCollector()),
+        "asgiMiddleware": _asgi_app(MetricsCollector()),
+    }
+    results = {}
+    for name, app in apps.items():
+        asyncio.run(_run(app, 500))
+        medians = [
+            statistics.median(asyncio.run(_run(app, args.requests)))
+            for _ in range(args.rounds)
+        ]
+        results[name] = round(min(medians), 2)
+    report = {
+        "medianMicrosPerRequest": results,
+        "overheadMicros": {
+            name: round(value - results["none"], 2)
+            for name, value in results.items()
+            if name != "none"
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
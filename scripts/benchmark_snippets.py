@@ -0,0 +1,103 @@
+"""Search latency for broad queries over large documents.
+
+Compares the single-phase statement (``snippet()`` evaluated in the same query
+that sorts every match) with ``repo.search_documents``, which ranks rowids
+first and builds snippets for the returned page only. Prints one JSON object
+per document size.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.db import repo
+from app.db.schema import apply_schema, tenant_match
+from app.db.sqlite import ConnectionManager
+
+SINGLE_PHASE_SQL = """
+SELECT d.document_id,
+       d.title,
+       d.tags,
+       d.created_at,
+       snippet(documents_fts, 2, '<b>', '</b>', '...', 10) AS snippet,
+       bm25(documents_fts, 0.0, 1.0, 1.0, 0.0) AS score_raw
+FROM documents_fts
+JOIN documents d ON d.rowid = documents_fts.rowid
+WHERE documents_fts MATCH ?
+  AND documents_fts MATCH ?
+ORDER BY score_raw
+LIMIT ? OFFSET ?;
+"""
+
+# Common words appear in nearly every document, so queries match broadly.
+COMMON = ["alpha", "beta", "gamma", "delta"]
+RARE = [f"term{idx}" for idx in range(2000)]
+
+
+def _content(words):
+    tokens = random.choices(COMMON, k=words // 4) + random.choices(RARE, k=words)
+    random.shuffle(tokens)
+    return " ".join(tokens)
+
+
+def _measure(fn, queries):
+    latencies = []
+    for _ in range(queries):
+        query = random.choice(COMMON)
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50": round(statistics.median(latencies), 3),
+        "p95": round(statistics.quantiles(latencies, n=100)[94], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Snippet two-phase benchmark")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--words", default="50,2000,20000")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(11)
+    workdir = tempfile.mkdtemp(prefix="snippet_bench_")
+    for words in (int(value) for value in args.words.split(",")):
+        db = ConnectionManager(os.path.join(workdir, f"docs_{words}.db"), 2, 10000)
+        with db.writer() as conn:
+            apply_schema(conn)
+        docs = [
+            ("t1", f"Doc {idx}", _content(words), [])
+            for idx in range(args.docs)
+        ]
+        for start in range(0, len(docs), 500):
+            repo.insert_tenant_documents(db, docs[start : start + 500])
+
+        def single_phase(query):
+            with db.reader() as conn:
+                conn.execute(
+                    SINGLE_PHASE_SQL, (tenant_match("t1"), query, args.limit, 0)
+                ).fetchall()
+
+        def two_phase(query):
+            repo.search_documents(db, "t1", query, args.limit, 0)
+
+        print(
+            json.dumps(
+                {
+                    "docs": args.docs,
+                    "wordsPerDoc": words,
+                    "singlePhaseMs": _measure(single_phase, args.queries),
+                    "twoPhaseMs": _measure(two_phase, args.queries),
+                }
+            )
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Small-tenant search latency while a large neighbour tenant grows.
+
+Runs the same workload against the tenant-partitioned FTS layout and against
+the legacy layout (``tenant_id UNINDEXED`` filter) so the two curves can be
+compared. Prints one JSON object per growth step.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.db import repo
+from app.db.schema import apply_schema
+from app.db.sqlite import ConnectionManager
+
+LEGACY_SCHEMA_SQL = """
+CREATE TABLE documents (
+  tenant_id TEXT NOT NULL, document_id TEXT NOT NULL, title TEXT NOT NULL,
+  content TEXT NOT NULL, tags TEXT NOT NULL, created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL, PRIMARY KEY (tenant_id, document_id)
+);
+CREATE VIRTUAL TABLE documents_fts USING fts5(
+  tenant_id UNINDEXED, title, content, tags, content='documents', content_rowid='rowid'
+);
+CREATE TRIGGER documents_ai AFTER INSERT ON documents BEGIN
+  INSERT INTO documents_fts(rowid, tenant_id, title, content, tags)
+  VALUES (new.rowid, new.tenant_id, new.title, new.content, new.tags);
+END;
+"""
+
+LEGACY_SEARCH_SQL = """
+SELECT d.document_id,
+       snippet(documents_fts, 2, '<b>', '</b>', '...', 10) AS snippet,
+       bm25(documents_fts) AS score_raw
+FROM documents_fts
+JOIN documents d ON d.rowid = documents_fts.rowid
+WHERE documents_fts.tenant_id = ?
+  AND documents_fts MATCH ?
+ORDER BY score_raw
+LIMIT 10;
+"""
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta", "kappa"]
+
+
+def _docs(tenant_id, count):
+    return [
+        (tenant_id, f"Doc {idx}", " ".join(random.choices(WORDS, k=30)), [])
+        for idx in range(count)
+    ]
+
+
+def _open(path, legacy):
+    db = ConnectionManager(path, 2, 10000)
+    with db.writer() as conn:
+        if legacy:
+            conn.executescript(LEGACY_SCHEMA_SQL)
+        else:
+            apply_schema(conn)
+    return db
+
+
+def _measure(fn, queries):
+    latencies = []
+    for _ in range(queries):
+        query = random.choice(WORDS)
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50": round(statistics.median(latencies), 3),
+        "p95": round(statistics.quantiles(latencies, n=100)[94], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tenant isolation benchmark")
+    parser.add_argument("--small-docs", type=int, default=200)
+    parser.add_argument("--steps", default="0,10000,50000,100000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    workdir = tempfile.mkdtemp(prefix="tenant_bench_")
+    partitioned = _open(os.path.join(workdir, "partitioned.db"), legacy=False)
+    legacy = _open(os.path.join(workdir, "legacy.db"), legacy=True)
+    small_docs = _docs("small", args.small_docs)
+    for db in (partitioned, legacy):
+        repo.insert_tenant_documents(db, small_docs)
+
+    def legacy_search(query):
+        with legacy.reader() as conn:
+            conn.execute(LEGACY_SEARCH_SQL, ("small", query)).fetchall()
+
+    def partitioned_search(query):
+        repo.search_documents(partitioned, "small", query, 10, 0, count_mode="none")
+
+    large_size = 0
+    for target in (int(step) for step in args.steps.split(",")):
+        grow = _docs("large", target - large_size)
+        for start in range(0, len(grow), 5000):
+            chunk = grow[start : start + 5000]
+            for db in (partitioned, legacy):
+                repo.insert_tenant_documents(db, chunk)
+        large_size = target
+        print(
+            json.dumps(
+                {
+                    "largeTenantDocs": large_size,
+                    "smallTenantDocs": args.small_docs,
+                    "partitionedMs": _measure(partitioned_search, args.queries),
+                    "legacyMs": _measure(legacy_search, args.queries),
+                }
+            )
+        )
+
+    partitioned.close()
+    legacy.close()
+
+
+if __name__ == "__main__":
+    main()
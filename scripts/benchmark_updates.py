@@ -0,0 +1,132 @@
+"""Document update throughput.
+
+Compares, per document write, ``repo.write_documents`` updates (changed
+content, changed tags only, unchanged) with the pre-update workaround of
+deleting the document and ingesting a new copy. Tag-only updates skip the FTS
+reindex, so ``tagsOnlySpeedup`` is their rate over content changes. A last run
+sends bursts of updates to one document through the ``WriteQueue`` to show
+coalescing. Prints one JSON object.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import wait
+
+from app.db import repo
+from app.db.schema import apply_schema
+from app.db.sqlite import ShardRouter
+from app.db.write_queue import WriteQueue
+
+WORDS = [f"term{idx}" for idx in range(5000)]
+
+
+def _content(words):
+    return " ".join(random.choices(WORDS, k=words))
+
+
+def _rate(count, fn):
+    start = time.perf_counter()
+    for index in range(count):
+        fn(index)
+    elapsed = time.perf_counter() - start
+    return {"ops": count, "opsPerSec": round(count / elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Update vs delete+ingest benchmark")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--coalesce-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(5)
+    workdir = tempfile.mkdtemp(prefix="update_bench_")
+    router = ShardRouter(
+        os.path.join(workdir, "docs.db"),
+        "none",
+        1,
+        "",
+        1,
+        2,
+        10000,
+        init_shard=apply_schema,
+    )
+    with router.lease("t1") as db:
+        docs = [("t1", f"Doc {idx}", _content(args.words), []) for idx in range(args.docs)]
+        ids = []
+        for start in range(0, len(docs), 500):
+            inserted = repo.insert_tenant_documents(db, docs[start : start + 500])
+            ids.extend(document_id for document_id, _ in inserted)
+        bodies = [_content(args.words) for _ in range(64)]
+
+        def update_changed(index):
+            repo.write_documents(
+                db,
+                [("update", ("t1", ids[index % len(ids)], {"content": bodies[index % 64]}))],
+            )
+
+        def update_unchanged(index):
+            position = index % len(ids)
+            repo.write_documents(
+                db, [("update", ("t1", ids[position], {"title": f"Doc {position}"}))]
+            )
+
+        def update_tags(index):
+            repo.write_documents(
+                db, [("update", ("t1", ids[index % len(ids)], {"tags": [f"tag{index}"]}))]
+            )
+
+        def delete_and_ingest(index):
+            position = index % len(ids)
+            repo.write_documents(db, [("delete", ("t1", ids[position]))])
+            ids[position] = repo.insert_tenant_documents(
+                db, [("t1", f"Doc {position}", bodies[index % 64], [])]
+            )[0][0]
+
+        report = {
+            "docs": args.docs,
+            "wordsPerDoc": args.words,
+            "updateChanged": _rate(args.ops, update_changed),
+            "updateUnchanged": _rate(args.ops, update_unchanged),
+            "updateTagsOnly": _rate(args.ops, update_tags),
+            "deletePlusIngest": _rate(args.ops, delete_and_ingest),
+        }
+        report["tagsOnlySpeedup"] = round(
+            report["updateTagsOnly"]["opsPerSec"] / report["updateChanged"]["opsPerSec"], 1
+        )
+
+    write_queue = WriteQueue(router, 64, 5, args.coalesce_ms)
+    bursts = max(1, args.ops // args.burst)
+    start = time.perf_counter()
+    for burst in range(bursts):
+        document_id = ids[burst % len(ids)]
+        wait(
+            [
+                write_queue.submit_update(
+                    "t1", document_id, {"content": bodies[(burst + step) % 64]}
+                )
+                for step in range(args.burst)
+            ]
+        )
+    elapsed = time.perf_counter() - start
+    stats = write_queue.stats()
+    write_queue.close()
+    router.close()
+    report["queuedBursts"] = {
+        "updates": bursts * args.burst,
+        "burstSize": args.burst,
+        "coalesceMs": args.coalesce_ms,
+        "updatesPerSec": round(bursts * args.burst / elapsed, 1),
+        "writes": stats["documents"] - stats["coalescedUpdates"],
+        "coalescedUpdates": stats["coalescedUpdates"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Vector top-k latency and recall: exact NumPy scan vs. the IVF index.
+
+Builds a synthetic clustered set of unit vectors, stores it through
+``VectorStore`` (memory-mapped float32 files) and times top-k queries with
+the exact scan and with IVF at several ``nprobe`` values. Prints one JSON
+object per configuration.
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.db.vectors import IvfIndex, _TenantVectors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector search benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    centers = rng.normal(size=(max(1, args.rows // 500), args.dim))
+    matrix = centers[rng.integers(0, centers.shape[0], args.rows)]
+    matrix += 0.5 * rng.normal(size=matrix.shape)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    vectors = _TenantVectors(tempfile.mkdtemp(prefix="vector_bench_") + "/t", args.dim)
+    vectors.append(np.arange(1, args.rows + 1, dtype=np.int64), matrix.astype(np.float32))
+    mapped = vectors.snapshot[0]
+    queries = mapped[rng.choice(args.rows, args.queries, replace=False)] + 0.05 * rng.normal(
+        size=(args.queries, args.dim)
+    ).astype(np.float32)
+
+    def exact(query):
+        scores = mapped @ query
+        top = np.argpartition(-scores, args.k - 1)[: args.k]
+        return set(top[np.argsort(-scores[top])].tolist())
+
+    truth = [exact(query) for query in queries]
+
+    def run(name, fn, **extra):
+        latencies, recall = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = fn(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recall.append(len(found & expected) / args.k)
+        print(
+            json.dumps(
+                {
+                    "method": name,
+                    "rows": args.rows,
+                    **extra,
+                    "p50Ms": round(statistics.median(latencies), 3),
+                    "p95Ms": round(statistics.quantiles(latencies, n=100)[94], 3),
+                    "recallAtK": round(statistics.mean(recall), 3),
+                }
+            )
+        )
+
+    run("exact", exact)
+    start = time.perf_counter()
+    index = IvfIndex(mapped)
+    build_ms = round((time.perf_counter() - start) * 1000, 1)
+    for nprobe in (int(value) for value in args.nprobe.split(",")):
+
+        def ivf(query, nprobe=nprobe):
+            rows = np.sort(index.candidates(query, nprobe))
+            scores = mapped[rows] @ query
+            top = np.argpartition(-scores, args.k - 1)[: args.k]
+            return set(rows[top].tolist())
+
+        run("ivf", ivf, nprobe=nprobe, nlist=index.centroids.shape[0], buildMs=build_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import importlib
 import json
 
 import pytest
@@ -13,12 +12,10 @@ def client(tmp_path, monkeypatch) -> TestClient:
     monkeypatch.setenv("API_KEYS_JSON", json.dumps(api_keys))
     monkeypatch.setenv("DB_PATH", str(tmp_path / "test.db"))
     monkeypatch.setenv("LOG_LEVEL", "CRITICAL")
-    monkeypatch.setenv("APP_DISABLE_AUTOCREATE", "1")
     config.get_settings.cache_clear()
-    from app import main as main_module
+    from app.main import create_app
 
-    importlib.reload(main_module)
-    app = main_module.create_app()
+    app = create_app()
     with TestClient(app) as client:
         yield client
 
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.admission import AdmissionController
+from app.core.metrics import MetricsCollector
+
+
+def test_tenant_rate_limit_returns_429_with_retry_after(client):
+    client.app.state.admission = AdmissionController(
+        client.app.state.metrics, 0, 0, 0, {"t1": (0.01, 2)}, (0.0, 0.0)
+    )
+    params = {"q": "anything"}
+    statuses = [
+        client.get(
+            "/api/v1/tenants/t1/documents/search",
+            headers={"X-API-Key": "key_admin"},
+            params=params,
+        )
+        for _ in range(3)
+    ]
+    assert [r.status_code for r in statuses] == [200, 200, 429]
+    assert int(statuses[2].headers["Retry-After"]) >= 1
+    other = client.get(
+        "/api/v1/tenants/t2/documents/search",
+        headers={"X-API-Key": "key_admin"},
+        params=params,
+    )
+    assert other.status_code == 200
+    admission = client.get("/api/v1/metrics").json()["admission"]
+    assert admission["rateLimited"] == 1
+    assert admission["shedByTenant"] == {"t1": 1}
+
+
+def test_global_limit_queues_then_sheds_with_503():
+    metrics = MetricsCollector()
+    controller = AdmissionController(metrics, 1, 1, 50, {}, (0.0, 0.0))
+
+    async def scenario():
+        await controller.acquire("t1")
+        queued = asyncio.create_task(controller.acquire("t1"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as shed:
+            await controller.acquire("t2")
+        assert shed.value.status_code == 503
+        assert shed.value.headers["Retry-After"] == "1"
+        await controller.release()
+        await queued
+        await controller.release()
+
+    asyncio.run(scenario())
+    admission = metrics.snapshot()["admission"]
+    assert admission["admitted"] == 2
+    assert admission["queued"] == 1
+    assert admission["overloaded"] == 1
+    assert controller.stats()["inFlight"] == 0
+
+
+def test_queued_request_times_out_with_503():
+    controller = AdmissionController(MetricsCollector(), 1, 4, 10, {}, (0.0, 0.0))
+
+    async def scenario():
+        await controller.acquire("t1")
+        with pytest.raises(HTTPException) as shed:
+            await controller.acquire("t1")
+        assert shed.value.status_code == 503
+        await controller.release()
+
+    asyncio.run(scenario())
+    assert controller.stats() == {
+        "inFlight": 0,
+        "waiting": 0,
+        "maxConcurrent": 1,
+        "maxQueue": 4,
+    }
@@ -0,0 +1,80 @@
+import time
+
+from app.core.cache import SearchCache
+from app.core.metrics import MetricsCollector
+from app.db import repo
+
+
+def _page(title):
+    return ([{"title": title, "snippet": "s" * 100, "tags": '["a"]'}], 1, False)
+
+
+def test_cache_evicts_least_recently_used_within_byte_budget():
+    metrics = MetricsCollector()
+    cache = SearchCache(max_bytes=1500, ttl_seconds=60, metrics=metrics)
+    keys = [cache.key("t1", f"q{i}") for i in range(3)]
+    cache.put(keys[0], _page("a"))
+    cache.put(keys[1], _page("b"))
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], _page("c"))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    stats = metrics.snapshot()["cache"]
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert 0 < stats["bytes"] <= 1500
+
+
+def test_cache_entries_expire_after_ttl():
+    cache = SearchCache(max_bytes=10_000, ttl_seconds=0, metrics=MetricsCollector())
+    key = cache.key("t1", "q")
+    cache.put(key, _page("a"))
+    assert cache.get(key) is None
+
+
+def test_invalidate_tenant_only_changes_that_tenants_keys():
+    cache = SearchCache(max_bytes=10_000, ttl_seconds=60, metrics=MetricsCollector())
+    t1_key, t2_key = cache.key("t1", "q"), cache.key("t2", "q")
+    cache.invalidate_tenant("t1")
+    assert cache.key("t1", "q") != t1_key
+    assert cache.key("t2", "q") == t2_key
+
+
+def test_version_changes_invalidate_only_when_checked():
+    cache = SearchCache(10_000, 60, MetricsCollector(), version_check_seconds=0.05)
+    assert cache.version_check_due("t1")
+    cache.observe_version("t1", 3)
+    key = cache.key("t1", "q")
+    assert not cache.version_check_due("t1")
+    time.sleep(0.06)
+    assert cache.version_check_due("t1")
+    cache.observe_version("t1", 3)
+    assert cache.key("t1", "q") == key
+    # Another worker wrote.
+    cache.observe_version("t1", 4)
+    assert cache.key("t1", "q") != key
+    # This worker's own write re-reads the version without a second bump.
+    cache.invalidate_tenant("t1")
+    key = cache.key("t1", "q")
+    assert cache.version_check_due("t1")
+    cache.observe_version("t1", 5)
+    assert cache.key("t1", "q") == key
+
+
+def test_cache_hits_skip_the_database(client, monkeypatch):
+    reads = []
+    original = repo.tenant_version
+
+    def tenant_version(db, tenant_id):
+        reads.append(tenant_id)
+        return original(db, tenant_id)
+
+    monkeypatch.setattr(repo, "tenant_version", tenant_version)
+    for _ in range(5):
+        response = client.get(
+            "/api/v1/tenants/t1/documents/search",
+            headers={"X-API-Key": "key_t1"},
+            params={"q": "anything"},
+        )
+        assert response.status_code == 200
+    assert reads == ["t1"]
@@ -0,0 +1,446 @@
+import threading
+import time
+
+import pytest
+
+from app.db import repo, schema
+from app.db.schema import apply_schema
+from app.db.sqlite import ConnectionManager, PoolTimeoutError, ShardRouter
+from app.db.write_queue import WriteQueue
+
+
+@pytest.fixture()
+def db(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "pool.db"), 2, 50)
+    with manager.writer() as conn:
+        apply_schema(conn)
+    yield manager
+    manager.close()
+
+
+def test_readers_see_committed_writes(db):
+    repo.insert_document(db, "t1", "Doc", "pooled reader content", ["a"])
+    assert repo.count_documents(db, "t1", "pooled") == 1
+    assert repo.document_counts_by_tenant(db) == {"t1": 1}
+
+
+def test_reader_checkout_times_out_when_pool_exhausted(db):
+    with db.reader(), db.reader():
+        with pytest.raises(PoolTimeoutError):
+            with db.reader():
+                pass
+    stats = db.pool_stats()
+    assert stats["open"] == 2
+    assert stats["idle"] == 2
+    assert stats["timeouts"] == 1
+
+
+def test_reader_connections_are_read_only(db):
+    with db.reader() as conn:
+        with pytest.raises(Exception):
+            conn.execute("DELETE FROM documents")
+
+
+def test_write_queue_fails_writes_submitted_after_close(db):
+    router = ShardRouter(db.db_path, "none", 1, "", 1, 2, 50, init_shard=apply_schema)
+    write_queue = WriteQueue(router, max_batch=8, max_wait_ms=0)
+    try:
+        write_queue.close()
+        future = write_queue.submit("t1", "Late", "after close", [])
+        with pytest.raises(RuntimeError):
+            future.result(timeout=1)
+        write_queue.close()
+    finally:
+        router.close()
+
+
+def test_write_queue_coalesces_concurrent_inserts(db):
+    router = ShardRouter(db.db_path, "none", 1, "", 1, 2, 50, init_shard=apply_schema)
+    write_queue = WriteQueue(router, max_batch=8, max_wait_ms=200)
+    try:
+        futures = [
+            write_queue.submit("t1", f"Doc {i}", "grouped commit", []) for i in range(8)
+        ]
+        ids = {future.result(timeout=5)[0][0] for future in futures}
+    finally:
+        write_queue.close()
+        router.close()
+    assert len(ids) == 8
+    assert repo.count_documents(db, "t1", "grouped") == 8
+    stats = write_queue.stats()
+    assert stats["documents"] == 8
+    assert stats["batches"] < 8
+    assert stats["queueDepth"] == 0
+
+
+LEGACY_SCHEMA_SQL = """
+CREATE TABLE documents (
+  tenant_id TEXT NOT NULL, document_id TEXT NOT NULL, title TEXT NOT NULL,
+  content TEXT NOT NULL, tags TEXT NOT NULL, created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL, PRIMARY KEY (tenant_id, document_id)
+);
+CREATE VIRTUAL TABLE documents_fts USING fts5(
+  tenant_id UNINDEXED, title, content, tags, content='documents', content_rowid='rowid'
+);
+CREATE TRIGGER documents_ai AFTER INSERT ON documents BEGIN
+  INSERT INTO documents_fts(rowid, tenant_id, title, content, tags)
+  VALUES (new.rowid, new.tenant_id, new.title, new.content, new.tags);
+END;
+"""
+
+
+def test_apply_schema_migrates_legacy_fts_layout(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "legacy.db"), 2, 50)
+    with manager.writer() as conn:
+        conn.executescript(LEGACY_SCHEMA_SQL)
+        conn.execute(
+            "INSERT INTO documents VALUES ('t1', 'd1', 'Old', 'legacy words', '[]', 'x', 'x')"
+        )
+        conn.execute(
+            "INSERT INTO documents VALUES ('t2', 'd2', 'Old', 'legacy words', '[]', 'x', 'x')"
+        )
+        conn.commit()
+        apply_schema(conn)
+    try:
+        results, total, _, _ = repo.search_documents(manager, "t1", "legacy", 10, 0)
+        assert total == 1
+        assert [item["documentId"] for item in results] == ["d1"]
+    finally:
+        manager.close()
+
+
+def test_search_cannot_escape_tenant_with_query_syntax(db):
+    repo.insert_document(db, "t1", "Mine", "alpha", [])
+    repo.insert_document(db, "t2", "Theirs", "beta", [])
+    results, total, _, _ = repo.search_documents(db, "t1", "alpha OR beta", 10, 0)
+    assert total == 1
+    assert [item["title"] for item in results] == ["Mine"]
+
+
+@pytest.mark.parametrize("mode", ["tenant", "hash"])
+def test_shard_router_isolates_tenants_and_closes_idle_shards(tmp_path, mode):
+    router = ShardRouter(
+        str(tmp_path / "main.db"),
+        mode,
+        4,
+        str(tmp_path / "shards"),
+        1,
+        2,
+        50,
+        init_shard=apply_schema,
+    )
+    try:
+        for tenant_id in ("t1", "t2", "t3"):
+            with router.lease(tenant_id) as db:
+                repo.insert_document(db, tenant_id, "Doc", f"sharded {tenant_id}", [])
+        assert router.pool_stats()["shards"]["open"] == 1
+
+        with router.lease("t2") as db:
+            results, total, _, _ = repo.search_documents(db, "t2", "sharded", 10, 0)
+        assert total == 1
+
+        merged: dict = {}
+        for counts in router.map_shards(repo.document_counts_by_tenant):
+            merged.update(counts)
+        assert merged == {"t1": 1, "t2": 1, "t3": 1}
+    finally:
+        router.close()
+    if mode == "tenant":
+        assert len(list((tmp_path / "shards").glob("tenant_*.db"))) == 3
+
+
+def test_slow_shard_init_does_not_block_other_shards(tmp_path):
+    started, release = threading.Event(), threading.Event()
+    slow_name = "tenant_" + "slow".encode().hex()
+
+    def init_shard(conn):
+        apply_schema(conn)
+        if slow_name in conn.execute("PRAGMA database_list").fetchone()[2]:
+            started.set()
+            release.wait(5)
+
+    router = ShardRouter(
+        str(tmp_path / "main.db"), "tenant", 1, str(tmp_path / "shards"), 8, 1, 100, init_shard
+    )
+
+    def lease_slow():
+        with router.lease("slow") as db:
+            repo.insert_document(db, "slow", "Doc", "late", [])
+
+    threads = [threading.Thread(target=lease_slow) for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        assert started.wait(5)
+        start = time.monotonic()
+        with router.lease("fast") as db:
+            repo.insert_document(db, "fast", "Doc", "not blocked", [])
+        assert time.monotonic() - start < 1.0
+        release.set()
+        for thread in threads:
+            thread.join()
+        with router.lease("slow") as db:
+            assert repo.count_documents(db, "slow", "late") == 2
+    finally:
+        release.set()
+        router.close()
+
+
+def test_map_shards_cached_does_not_reopen_closed_shards(tmp_path):
+    router = ShardRouter(
+        str(tmp_path / "main.db"), "tenant", 1, str(tmp_path / "shards"), 1, 1, 100, apply_schema
+    )
+    cache: dict = {}
+    try:
+        for tenant_id in ("t1", "t2", "t3"):
+            with router.lease(tenant_id) as db:
+                repo.insert_document(db, tenant_id, "Doc", "cached", [])
+        first = router.map_shards_cached(repo.document_counts_by_tenant, cache)
+        closed = router.pool_stats()["shards"]["closedIdle"]
+        assert router.map_shards_cached(repo.document_counts_by_tenant, cache) == first
+        assert router.pool_stats()["shards"]["closedIdle"] == closed
+        assert sorted(tenant for counts in first for tenant in counts) == ["t1", "t2", "t3"]
+    finally:
+        router.close()
+
+
+def test_document_tags_table_is_seeded_and_kept_in_sync(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "tags.db"), 1, 100)
+    try:
+        with manager.writer() as conn:
+            apply_schema(conn)
+            # Simulate a database created before document_tags existed.
+            for trigger in ("documents_tags_ai", "documents_tags_ad", "documents_tags_au"):
+                conn.execute(f"DROP TRIGGER {trigger}")
+            conn.execute("DROP TABLE document_tags")
+            conn.execute("PRAGMA user_version = 0")
+            conn.commit()
+        repo.insert_documents(manager, "t1", [("Doc", "body", ["a", "b", "a"])])
+        with manager.writer() as conn:
+            apply_schema(conn)
+            seeded = conn.execute(
+                "SELECT tag FROM document_tags ORDER BY tag"
+            ).fetchall()
+            assert [row[0] for row in seeded] == ["a", "b"]
+            conn.execute("UPDATE documents SET tags = '[\"c\"]'")
+            assert [row[0] for row in conn.execute("SELECT tag FROM document_tags")] == ["c"]
+            conn.execute("DELETE FROM documents")
+            conn.commit()
+            assert conn.execute("SELECT COUNT(*) FROM document_tags").fetchone()[0] == 0
+    finally:
+        manager.close()
+
+
+def test_write_queue_coalesces_updates_of_one_document(db):
+    router = ShardRouter(db.db_path, "none", 1, "", 1, 2, 50, init_shard=apply_schema)
+    write_queue = WriteQueue(router, max_batch=16, max_wait_ms=0, update_coalesce_ms=200)
+    try:
+        document_id, _ = repo.insert_document(db, "t1", "Doc", "version zero", [])
+        futures = [
+            write_queue.submit_update("t1", document_id, {"content": f"version {i}"})
+            for i in range(1, 6)
+        ]
+        futures.append(write_queue.submit_update("t1", document_id, {"title": "Renamed"}))
+        written = [future.result(timeout=5) for future in futures]
+    finally:
+        write_queue.close()
+        router.close()
+    assert {result for result, _ in written} == {written[0][0]}
+    # Only the first caller gets the removed row, so it is dropped once.
+    assert [len(removed) for _, removed in written] == [1, 0, 0, 0, 0, 0]
+    assert write_queue.stats()["coalescedUpdates"] == 5
+    results, total, _, _ = repo.search_documents(db, "t1", "version", 10, 0)
+    assert total == 1
+    assert results[0]["title"] == "Renamed"
+    assert repo.count_documents(db, "t1", "5") == 1
+
+
+def test_write_queue_does_not_merge_updates_across_source_id_ingests(db):
+    router = ShardRouter(db.db_path, "none", 1, "", 1, 2, 50, init_shard=apply_schema)
+    write_queue = WriteQueue(router, max_batch=16, max_wait_ms=0, update_coalesce_ms=200)
+    try:
+        (created, _), = repo.write_documents(
+            db, [("ingest", ("t1", "Doc", "version zero", [], "src-1", None))]
+        )
+        document_id = created[0]
+        futures = [
+            write_queue.submit_update("t1", document_id, {"tags": ["a"]}),
+            write_queue.submit("t1", "Doc", "replaced by source", [], "src-1"),
+            write_queue.submit_update("t1", document_id, {"title": "Renamed"}),
+        ]
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        write_queue.close()
+        router.close()
+    assert write_queue.stats()["coalescedUpdates"] == 0
+    results, total, _, _ = repo.search_documents(db, "t1", "replaced", 10, 0)
+    assert total == 1
+    assert results[0]["title"] == "Renamed"
+
+
+def _fts_data(db):
+    with db.reader() as conn:
+        row = conn.execute("SELECT COUNT(*), max(rowid) FROM documents_fts_data").fetchone()
+    return tuple(row)
+
+
+def test_updates_rewrite_rows_in_place(db):
+    document_id, _ = repo.insert_document(db, "t1", "Doc", "steady words", ["a"])
+    with db.reader() as conn:
+        rowid = conn.execute("SELECT rowid FROM documents").fetchone()[0]
+    fts = _fts_data(db)
+
+    (result, removed), = repo.write_documents(
+        db, [("update", ("t1", document_id, {"tags": ["b", "c"]}))]
+    )
+    assert result[3] == repo.REPLACED and removed == []
+    assert _fts_data(db) == fts
+    assert repo.tagged_rowids(db, "t1", ["b", "c"]) == [rowid]
+    assert repo.tagged_rowids(db, "t1", ["a"]) == []
+
+    (result, removed), = repo.write_documents(
+        db, [("update", ("t1", document_id, {"content": "fresh words here"}))]
+    )
+    assert removed == [(rowid, "Doc", "steady words")]
+    assert _fts_data(db) != fts
+    assert repo.count_documents(db, "t1", "steady") == 0
+    assert repo.count_documents(db, "t1", "fresh") == 1
+    assert repo.tagged_rowids(db, "t1", ["b", "c"]) == [rowid + 1]
+    assert repo.tenant_stats(db)["t1"] == {"documents": 1, "contentBytes": 16}
+
+
+def test_tags_are_dropped_from_the_fts_index(db):
+    repo.insert_document(db, "t1", "Doc", "plain body", ["labelled"])
+    with db.writer() as conn:
+        columns = conn.execute("PRAGMA table_info(documents_fts)").fetchall()
+        assert "tags" not in [row[1] for row in columns]
+        # Simulate a database whose FTS table still indexes tags.
+        conn.executescript(
+            """
+            DROP TRIGGER documents_ai;
+            DROP TRIGGER documents_ad;
+            DROP TRIGGER documents_au;
+            DROP TABLE documents_fts;
+            CREATE VIRTUAL TABLE documents_fts USING fts5(
+              tenant_id UNINDEXED, title, content, tags, tenant_key,
+              content='documents', content_rowid='rowid', prefix='2 3'
+            );
+            INSERT INTO documents_fts(documents_fts) VALUES('rebuild');
+            PRAGMA user_version = 3;
+            """
+        )
+        apply_schema(conn)
+        columns = conn.execute("PRAGMA table_info(documents_fts)").fetchall()
+        assert "tags" not in [row[1] for row in columns]
+    assert repo.count_documents(db, "t1", "plain") == 1
+    assert repo.count_documents(db, "t1", "labelled") == 0
+
+
+def test_rowids_are_not_reused_after_delete(db):
+    repo.insert_document(db, "t1", "Doc", "first", [])
+    document_id, _ = repo.insert_document(db, "t1", "Doc", "second", [])
+    with db.reader() as conn:
+        last = conn.execute("SELECT max(rowid) FROM documents").fetchone()[0]
+    (existed, removed), = repo.write_documents(db, [("delete", ("t1", document_id))])
+    assert existed and removed[0][0] == last
+    repo.insert_document(db, "t1", "Doc", "third", [])
+    with db.reader() as conn:
+        assert conn.execute("SELECT max(rowid) FROM documents").fetchone()[0] == last + 1
+
+
+def test_writers_in_two_processes_do_not_race(db):
+    # A second ConnectionManager on the same file stands in for another worker
+    # process: its writer shares no Python lock with ``db``.
+    other = ConnectionManager(db.db_path, 1, 100)
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def write(manager):
+        barrier.wait()
+        for i in range(50):
+            try:
+                repo.write_documents(
+                    manager, [("ingest", ("t1", "Doc", f"racing {i}", [], f"s{i % 10}", None))]
+                )
+            except Exception as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(manager,)) for manager in (db, other)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        other.close()
+    assert errors == []
+    assert repo.count_documents(db, "t1", "racing") == 10
+
+
+def test_apply_schema_runs_only_pending_migrations(tmp_path, monkeypatch):
+    manager = ConnectionManager(str(tmp_path / "versions.db"), 1, 100)
+    try:
+        with manager.writer() as conn:
+            apply_schema(conn)
+            assert schema.schema_version(conn) == schema.SCHEMA_VERSION
+            statements = []
+            conn.set_trace_callback(statements.append)
+            apply_schema(conn)
+            assert statements == ["PRAGMA user_version"]
+            conn.set_trace_callback(None)
+
+            applied = []
+            monkeypatch.setattr(
+                schema,
+                "MIGRATIONS",
+                schema.MIGRATIONS + [(schema.SCHEMA_VERSION + 1, applied.append)],
+            )
+            monkeypatch.setattr(schema, "SCHEMA_VERSION", schema.SCHEMA_VERSION + 1)
+            apply_schema(conn)
+            apply_schema(conn)
+            assert applied == [conn]
+            assert schema.schema_version(conn) == schema.SCHEMA_VERSION
+
+            conn.execute(f"PRAGMA user_version = {schema.SCHEMA_VERSION + 1}")
+            with pytest.raises(RuntimeError):
+                apply_schema(conn)
+    finally:
+        manager.close()
+
+
+def test_tenant_version_migration_and_bumps(db):
+    repo.insert_document(db, "t1", "Doc", "before versions", [])
+    with db.writer() as conn:
+        conn.executescript(
+            """
+            DROP TRIGGER documents_stats_ai;
+            DROP TRIGGER documents_stats_ad;
+            DROP TRIGGER documents_version_au;
+            ALTER TABLE tenant_stats DROP COLUMN version;
+            PRAGMA user_version = 2;
+            """
+        )
+        apply_schema(conn)
+    assert repo.tenant_version(db, "t1") == (0, 1)
+    document_id, _ = repo.insert_document(db, "t1", "Doc", "after", [])
+    assert repo.tenant_version(db, "t1") == (1, 2)
+    repo.write_documents(db, [("update", ("t1", document_id, {"title": "Renamed"}))])
+    assert repo.tenant_version(db, "t1") == (2, 2)
+    assert repo.tenant_version(db, "t2") == (0, 0)
+
+
+def test_pragma_profile_applies_to_writer_and_readers(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "profile.db"), 1, 100, "balanced")
+    try:
+        with manager.writer() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        with manager.reader() as conn:
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] == 268435456
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -16384
+    finally:
+        manager.close()
+    with pytest.raises(ValueError):
+        ShardRouter(str(tmp_path / "x.db"), "none", 1, "", 1, 1, 100, apply_schema, "fast")
@@ -0,0 +1,125 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core import config
+from app.main import create_app
+
+
+def _doc_url(document_id=""):
+    return "/api/v1/tenants/t1/documents" + (f"/{document_id}" if document_id else "")
+
+
+HEADERS = {"X-API-Key": "key_t1"}
+
+
+def _eventually(check, timeout=5.0):
+    # The suggest vocabulary is refreshed by a background thread.
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _total(client, q, **params):
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search", headers=HEADERS, params={"q": q, **params}
+    )
+    return response.json()["total"]
+
+
+def test_update_reindexes_only_changed_documents(client):
+    created = client.post(
+        _doc_url(),
+        headers=HEADERS,
+        json={"title": "Doc", "content": "first draft", "tags": ["a"]},
+    ).json()
+    document_id = created["documentId"]
+
+    replaced = client.put(
+        _doc_url(document_id),
+        headers=HEADERS,
+        json={"title": "Doc", "content": "final wording", "tags": ["a"]},
+    )
+    assert replaced.status_code == 200
+    body = replaced.json()
+    assert body["reindexed"] is True
+    assert body["createdAt"] == created["createdAt"]
+    assert _total(client, "draft") == 0
+    assert _total(client, "final") == 1
+
+    same = client.put(
+        _doc_url(document_id),
+        headers=HEADERS,
+        json={"title": "Doc", "content": "final wording", "tags": ["a"]},
+    )
+    assert same.json()["reindexed"] is False
+    assert same.json()["updatedAt"] == body["updatedAt"]
+
+    patched = client.patch(_doc_url(document_id), headers=HEADERS, json={"tags": ["b"]})
+    assert patched.json()["reindexed"] is True
+    assert _total(client, "final", tags="b") == 1
+    assert _total(client, "final", tags="a") == 0
+    search = client.get(
+        "/api/v1/tenants/t1/documents/search", headers=HEADERS, params={"q": "final"}
+    ).json()
+    assert [item["documentId"] for item in search["results"]] == [document_id]
+
+    assert client.patch(_doc_url(document_id), headers=HEADERS, json={}).status_code == 400
+    missing = client.put(
+        _doc_url("nope"), headers=HEADERS, json={"title": "x", "content": "y", "tags": []}
+    )
+    assert missing.status_code == 404
+
+
+def test_delete_removes_document_from_every_index(client):
+    document_id = client.post(
+        _doc_url(),
+        headers=HEADERS,
+        json={"title": "Zeppelin notes", "content": "zeppelin airship", "tags": []},
+    ).json()["documentId"]
+    suggest_url = "/api/v1/tenants/t1/documents/suggest"
+    _eventually(
+        lambda: client.get(suggest_url, headers=HEADERS, params={"q": "zep"}).json()["terms"]
+    )
+    assert _total(client, "zeppelin", mode="vector") == 1
+
+    assert client.delete(_doc_url(document_id), headers=HEADERS).status_code == 204
+    assert client.delete(_doc_url(document_id), headers=HEADERS).status_code == 404
+    assert _total(client, "zeppelin") == 0
+    assert _total(client, "zeppelin", mode="vector") == 0
+    _eventually(
+        lambda: client.get(suggest_url, headers=HEADERS, params={"q": "zep"}).json()["terms"]
+        == []
+    )
+    metrics = client.get("/api/v1/metrics").json()
+    assert metrics["documents"]["byTenant"].get("t1", 0) == 0
+
+
+def test_writes_reach_caches_and_indexes_of_other_workers(client, monkeypatch):
+    # A second app on the same database stands in for another uvicorn worker.
+    monkeypatch.setenv("METRICS_BACKEND", "local")
+    monkeypatch.setenv("SEARCH_CACHE_VERSION_CHECK_SECONDS", "0.1")
+    config.get_settings.cache_clear()
+    suggest_url = "/api/v1/tenants/t1/documents/suggest"
+    with TestClient(create_app()) as other:
+
+        def other_terms():
+            return other.get(suggest_url, headers=HEADERS, params={"q": "zep"}).json()["terms"]
+
+        assert _total(other, "zeppelin") == 0
+        other_terms()
+        document_id = client.post(
+            _doc_url(),
+            headers=HEADERS,
+            json={"title": "Zeppelin notes", "content": "zeppelin airship", "tags": []},
+        ).json()["documentId"]
+        # The cached empty page is served until the next version check.
+        _eventually(lambda: _total(other, "zeppelin") == 1)
+        assert _total(other, "zeppelin", mode="vector") == 1
+        _eventually(lambda: other_terms() != [])
+
+        assert client.delete(_doc_url(document_id), headers=HEADERS).status_code == 204
+        _eventually(lambda: _total(other, "zeppelin") == 0)
+        assert _total(other, "zeppelin", mode="vector") == 0
+        _eventually(lambda: other_terms() == [])
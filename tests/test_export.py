@@ -0,0 +1,108 @@
+import dataclasses
+import gzip
+import json
+
+from app.db import repo
+
+EXPORT_URL = "/api/v1/tenants/t1/documents/export"
+HEADERS = {"X-API-Key": "key_t1"}
+
+
+def _ingest(client, count, tenant="t1", key="key_t1"):
+    return [
+        client.post(
+            f"/api/v1/tenants/{tenant}/documents",
+            headers={"X-API-Key": key},
+            json={
+                "title": f"Doc {i}",
+                "content": f"line one\nline \"{i}\" é",
+                "tags": [f"t{i}"],
+            },
+        ).json()["documentId"]
+        for i in range(count)
+    ]
+
+
+def _lines(body):
+    return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+
+def test_export_streams_all_documents_in_chunks(client):
+    client.app.state.settings = dataclasses.replace(
+        client.app.state.settings, export_chunk_size=2
+    )
+    ids = _ingest(client, 5)
+    _ingest(client, 2, tenant="t2", key="key_t2")
+    response = client.get(EXPORT_URL, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = _lines(response.content)
+    assert [line["documentId"] for line in lines] == ids
+    assert lines[3]["content"] == 'line one\nline "3" é'
+    assert lines[3]["tags"] == ["t3"]
+    assert set(lines[0]) == {
+        "documentId", "title", "content", "tags", "sourceId", "createdAt", "updatedAt"
+    }
+    assert client.get(EXPORT_URL.replace("t1", "t2"), headers=HEADERS).status_code == 403
+
+
+def test_export_gzip_and_incremental_since(client):
+    ids = _ingest(client, 3)
+    with client.app.state.db.lease("t1") as db, db.writer() as conn:
+        conn.execute(
+            "UPDATE documents SET updated_at = '2020-01-01T00:00:00Z' WHERE document_id != ?",
+            (ids[2],),
+        )
+        conn.commit()
+
+    with client.stream(
+        "GET", EXPORT_URL, headers={**HEADERS, "Accept-Encoding": "gzip"}
+    ) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    assert [line["documentId"] for line in _lines(gzip.decompress(raw))] == ids
+
+    since = {"since": "2021-06-01T00:00:00+02:00"}
+    recent = client.get(
+        EXPORT_URL, headers={**HEADERS, "Accept-Encoding": "identity"}, params=since
+    )
+    assert "content-encoding" not in recent.headers
+    assert [line["documentId"] for line in _lines(recent.content)] == [ids[2]]
+    inclusive = client.get(
+        EXPORT_URL, headers=HEADERS, params={"since": "2020-01-01T00:00:00Z"}
+    )
+    assert len(_lines(inclusive.content)) == 3
+    invalid = client.get(EXPORT_URL, headers=HEADERS, params={"since": "yesterday"})
+    assert invalid.status_code == 400
+
+
+def test_export_chunks_are_capped_in_bytes(client):
+    ids = _ingest(client, 5)
+    with client.app.state.db.lease("t1") as db:
+        # Each document is 25 bytes of title and content ("é" is two bytes).
+        chunk = repo.export_documents(db, "t1", ("", 0), 500, 30)
+        assert [row["documentId"] for row in chunk] == ids[:2]
+        assert len(repo.export_documents(db, "t1", ("", 0), 500, 1)) == 1
+    client.app.state.settings = dataclasses.replace(
+        client.app.state.settings, export_chunk_bytes=1
+    )
+    lines = _lines(client.get(EXPORT_URL, headers=HEADERS).content)
+    assert [line["documentId"] for line in lines] == ids
+
+
+def test_export_concurrency_is_capped(client):
+    _ingest(client, 2)
+    slots = client.app.state.export_slots
+    taken = 0
+    while slots.acquire(blocking=False):
+        taken += 1
+    try:
+        busy = client.get(EXPORT_URL, headers=HEADERS)
+        assert busy.status_code == 503
+        assert busy.headers["retry-after"] == "1"
+    finally:
+        for _ in range(taken):
+            slots.release()
+    # Finished exports give their slot back.
+    for _ in range(taken + 1):
+        assert len(_lines(client.get(EXPORT_URL, headers=HEADERS).content)) == 2
@@ -19,3 +19,101 @@ def test_ingest_returns_document_id(client):
     assert "documentId" in payload
     assert "createdAt" in payload
 
+
+def test_batch_ingest_reports_per_item_results(client):
+    response = client.post(
+        "/api/v1/tenants/t1/documents:batch",
+        headers={"X-API-Key": "key_t1"},
+        json={
+            "documents": [
+                {"title": "Doc A", "content": "batched alpha", "tags": ["a"]},
+                {"title": "", "content": "Content", "tags": []},
+                {"title": "Doc C", "content": "batched gamma", "tags": ["c"]},
+                {"title": "Doc D", "content": "x", "tags": [str(i) for i in range(50)]},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["accepted"] == 2
+    assert payload["rejected"] == 2
+    statuses = [item["status"] for item in payload["results"]]
+    assert statuses == [201, 400, 201, 400]
+    assert payload["results"][3]["error"] == "Too many tags"
+    assert payload["results"][0]["documentId"]
+
+    search = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "batched"},
+    )
+    assert search.json()["total"] == 2
+
+
+def test_batch_ingest_rejects_oversized_batch(client):
+    doc = {"title": "Doc", "content": "Content", "tags": []}
+    response = client.post(
+        "/api/v1/tenants/t1/documents:batch",
+        headers={"X-API-Key": "key_t1"},
+        json={"documents": [doc] * 101},
+    )
+    assert response.status_code == 400
+
+
+def test_idempotent_ingest_returns_existing_document(client):
+    headers = {"X-API-Key": "key_t1", "Idempotency-Key": "req-1"}
+    doc = {"title": "Doc", "content": "idempotent body", "tags": ["a"]}
+    first = client.post("/api/v1/tenants/t1/documents", headers=headers, json=doc)
+    retry = client.post("/api/v1/tenants/t1/documents", headers=headers, json=doc)
+    assert first.status_code == 201
+    assert retry.status_code == 200
+    assert retry.json()["documentId"] == first.json()["documentId"]
+
+    conflict = client.post(
+        "/api/v1/tenants/t1/documents",
+        headers=headers,
+        json={**doc, "content": "something else"},
+    )
+    assert conflict.status_code == 409
+
+    # Keys are scoped per tenant.
+    other = client.post(
+        "/api/v1/tenants/t2/documents",
+        headers={"X-API-Key": "key_t2", "Idempotency-Key": "req-1"},
+        json=doc,
+    )
+    assert other.status_code == 201
+
+    metrics = client.get("/api/v1/metrics").json()["ingest"]
+    assert metrics["created"] == 2
+    assert metrics["duplicates"] == 1
+    assert metrics["dedupHitRate"] == 1 / 3
+
+
+def test_source_id_dedups_unchanged_and_replaces_changed_documents(client):
+    headers = {"X-API-Key": "key_t1"}
+    doc = {"title": "Doc", "content": "original wording", "tags": [], "sourceId": "s-1"}
+    first = client.post("/api/v1/tenants/t1/documents", headers=headers, json=doc)
+    same = client.post(
+        "/api/v1/tenants/t1/documents:batch", headers=headers, json={"documents": [doc]}
+    )
+    assert same.json()["results"][0]["status"] == 200
+    assert same.json()["results"][0]["documentId"] == first.json()["documentId"]
+
+    changed = client.post(
+        "/api/v1/tenants/t1/documents",
+        headers=headers,
+        json={**doc, "content": "revised wording"},
+    )
+    assert changed.status_code == 200
+    assert changed.json()["documentId"] == first.json()["documentId"]
+    assert changed.json()["createdAt"] == first.json()["createdAt"]
+
+    def total(q):
+        return client.get(
+            "/api/v1/tenants/t1/documents/search", headers=headers, params={"q": q}
+        ).json()["total"]
+
+    assert total("original") == 0
+    assert total("revised") == 1
+    assert total("wording") == 1
@@ -0,0 +1,58 @@
+import json
+import logging
+
+from app.core import logging as app_logging
+
+
+def _lines(capsys):
+    return [json.loads(line) for line in capsys.readouterr().err.splitlines() if line]
+
+
+def test_request_logs_are_json_lines_with_sampling(capsys):
+    app_logging.setup_logging(
+        "INFO", sample_rates={"GET /search": 0.0}, default_sample_rate=1.0
+    )
+    try:
+        app_logging.log_request({"status": 200, "path": "/a"}, endpoint="GET /other")
+        app_logging.log_request({"status": 200, "path": "/s"}, endpoint="GET /search")
+        app_logging.log_request({"status": 500, "path": "/s"}, endpoint="GET /search")
+    finally:
+        app_logging.shutdown_logging()
+    records = _lines(capsys)
+    assert [(r["path"], r["status"]) for r in records] == [("/a", 200), ("/s", 500)]
+    assert records[0]["logger"] == "app.request"
+    assert app_logging.logging_stats()["sampledOut"] >= 1
+
+
+def test_full_log_queue_drops_instead_of_blocking(capsys):
+    app_logging.setup_logging("INFO", queue_size=1)
+    app_logging._state.listener.stop()
+    dropped_before = app_logging.logging_stats()["dropped"]
+    try:
+        for idx in range(5):
+            logging.getLogger("app.test").info("message %s", idx)
+    finally:
+        app_logging._state.listener = None
+        app_logging.shutdown_logging()
+    assert app_logging.logging_stats()["dropped"] - dropped_before == 4
+
+
+def test_setup_keeps_handlers_installed_by_the_host(capsys, caplog):
+    root = logging.getLogger()
+    host = logging.NullHandler()
+    root.addHandler(host)
+    try:
+        app_logging.setup_logging("INFO")
+        app_logging.setup_logging("INFO")
+        try:
+            assert host in root.handlers
+            assert caplog.handler in root.handlers
+            assert root.handlers.count(app_logging._state.handler) == 1
+            logging.getLogger("app.test").info("kept")
+        finally:
+            app_logging.shutdown_logging()
+        assert host in root.handlers
+        assert [record.getMessage() for record in caplog.records] == ["kept"]
+        assert [line["message"] for line in _lines(capsys)] == ["kept"]
+    finally:
+        root.removeHandler(host)
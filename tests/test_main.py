@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_APP_SCRIPT = """
+import os
+import sys
+
+import app.main
+
+assert "app" not in vars(app.main)
+assert not os.path.exists(sys.argv[1])
+assert app.main.app is app.main.app
+assert os.path.exists(sys.argv[1])
+"""
+
+
+def test_importing_app_main_has_no_side_effects(tmp_path):
+    db_path = tmp_path / "lazy.db"
+    env = {**os.environ, "DB_PATH": str(db_path), "LOG_LEVEL": "CRITICAL"}
+    subprocess.run(
+        [sys.executable, "-c", LAZY_APP_SCRIPT, str(db_path)], check=True, cwd=ROOT, env=env
+    )
@@ -0,0 +1,110 @@
+from dataclasses import replace
+
+from app.db import maintenance as maintenance_module
+from app.db import repo
+from app.db.maintenance import (
+    FtsMaintenance,
+    configure_fts,
+    segment_count,
+    structure_segment_count,
+)
+from app.db.schema import apply_schema
+from app.db.sqlite import ShardRouter
+
+
+def _init_shard(conn):
+    apply_schema(conn)
+    # automerge=0 leaves every commit as its own segment until we merge.
+    configure_fts(conn, automerge=0, crisismerge=64, usermerge=2)
+
+
+def test_maintenance_pass_merges_segments(tmp_path):
+    router = ShardRouter(
+        str(tmp_path / "fts.db"), "none", 1, "", 1, 2, 500, init_shard=_init_shard
+    )
+    router.warm()
+    try:
+        for index in range(12):
+            with router.lease("t1") as db:
+                repo.insert_document(db, "t1", f"Doc {index}", "alpha beta", [])
+        with router.lease("t1") as db, db.reader() as conn:
+            before = segment_count(conn)
+        assert before >= 12
+
+        maintenance = FtsMaintenance(
+            router, interval_s=0, idle_ms=60_000, budget_ms=5_000, merge_pages=64
+        )
+        skipped = maintenance.run_pass()
+        assert skipped["skippedBusyShards"] == 1
+        assert skipped["mergeSteps"] == 0
+
+        run = maintenance.run_pass(force=True)
+        assert run["mergeSteps"] >= 1
+        stats = maintenance.stats()
+        assert stats["runs"] == 2
+        assert stats["segments"]["maxPerShard"] < before
+
+        with router.lease("t1") as db:
+            results, total, _, _ = repo.search_documents(db, "t1", "alpha", 20, 0)
+        assert total == 12
+    finally:
+        router.close()
+
+
+def test_background_passes_read_the_structure_record_and_skip_settled_shards(
+    tmp_path, monkeypatch
+):
+    router = ShardRouter(
+        str(tmp_path / "fts.db"), "none", 1, "", 1, 2, 500, init_shard=_init_shard
+    )
+    router.warm()
+    try:
+        with router.lease("t1") as db, db.reader() as conn:
+            assert structure_segment_count(conn) == segment_count(conn) == 0
+        for index in range(200):
+            with router.lease("t1") as db:
+                repo.insert_document(db, "t1", f"Doc {index}", f"alpha w{index}", [])
+        with router.lease("t1") as db, db.reader() as conn:
+            assert structure_segment_count(conn) == segment_count(conn) >= 10
+
+        maintenance = FtsMaintenance(
+            router, interval_s=0, idle_ms=0, budget_ms=5_000, merge_pages=64
+        )
+        first = maintenance.run_pass()
+        assert first["mergeSteps"] >= 1
+        with router.lease("t1") as db, db.reader() as conn:
+            assert structure_segment_count(conn) == segment_count(conn)
+            assert maintenance.stats()["segments"]["total"] == segment_count(conn)
+
+        # Nothing was written since merging ran out: no merge transaction.
+        calls = []
+        monkeypatch.setattr(maintenance_module, "merge_step", lambda *args: calls.append(args))
+        maintenance.run_pass()
+        assert calls == []
+        with router.lease("t1") as db:
+            repo.insert_document(db, "t1", "Doc", "alpha again", [])
+        maintenance.run_pass()
+        assert len(calls) == 1
+    finally:
+        router.close()
+
+
+def test_admin_fts_endpoint_requires_admin_key(client):
+    settings = client.app.state.settings
+    client.app.state.settings = replace(settings, admin_api_keys={"ops_key"})
+
+    response = client.get("/api/v1/admin/fts", headers={"X-API-Key": "key_t1"})
+    assert response.status_code == 403
+    response = client.get("/api/v1/admin/fts", headers={"X-API-Key": "nope"})
+    assert response.status_code == 401
+
+    response = client.post(
+        "/api/v1/admin/fts/maintenance",
+        headers={"X-API-Key": "ops_key"},
+        params={"optimize": "true"},
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["run"]["optimized"] is True
+    assert payload["runs"] == 1
+    assert payload["segments"]["maxPerShard"] <= 1
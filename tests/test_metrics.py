@@ -1,3 +1,11 @@
+import multiprocessing
+import os
+import threading
+
+from app.core.metrics import MetricsCollector
+from app.core.shared_metrics import SharedMetricsCollector
+
+
 def test_metrics_reflect_requests_and_errors(client):
     client.get("/api/v1/health")
     client.post(
@@ -28,3 +36,136 @@ def test_metrics_skip_none_tenant_bucket(client):
     assert None not in by_tenant
     assert "GET /api/v1/health" in payload["requests"]["byEndpoint"]
 
+
+def test_metrics_report_latency_quantiles_per_endpoint_and_tenant(client):
+    client.get("/api/v1/health")
+    client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "anything"},
+    )
+    latency = client.get("/api/v1/metrics").json()["latencyMs"]
+    assert latency["overall"]["count"] >= 2
+    health = latency["byEndpoint"]["GET /api/v1/health"]
+    assert 0 < health["p50"] <= health["p95"] <= health["p99"] <= health["max"]
+    assert latency["byTenant"]["t1"]["count"] == 1
+    assert latency["windows"]["1m"]["byTenant"]["t1"]["count"] == 1
+    assert latency["windows"]["5m"]["overall"]["count"] >= 2
+
+
+def test_histogram_quantiles_are_within_bucket_error():
+    collector = MetricsCollector()
+
+    def record(offset):
+        for value in range(1, 501):
+            collector.record_request("GET /x", "t1", 200, float(value + offset))
+
+    threads = [threading.Thread(target=record, args=(offset,)) for offset in (0, 500)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    overall = collector.snapshot()["latencyMs"]["overall"]
+    assert overall["count"] == 1000
+    assert abs(overall["p50"] - 500) / 500 < 0.05
+    assert abs(overall["p99"] - 990) / 990 < 0.05
+    assert overall["max"] == 1000
+
+
+def test_document_stats_are_maintained_incrementally(client):
+    for content in ("one", "three"):
+        client.post(
+            "/api/v1/tenants/t1/documents",
+            headers={"X-API-Key": "key_t1"},
+            json={"title": "Doc", "content": content, "tags": []},
+        )
+    documents = client.get("/api/v1/metrics").json()["documents"]
+    assert documents["byTenant"] == {"t1": 2}
+    assert documents["contentBytesByTenant"] == {"t1": 8}
+
+
+def test_prometheus_endpoint_renders_text_format(client):
+    client.post(
+        "/api/v1/tenants/t1/documents",
+        headers={"X-API-Key": "key_t1"},
+        json={"title": "Doc", "content": "Content", "tags": []},
+    )
+    response = client.get("/api/v1/metrics/prometheus")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE knwl_requests_total counter" in body
+    assert 'knwl_documents{tenant="t1"} 1.0' in body
+    assert 'knwl_ingest_commits_total{batch_size="1"} 1.0' in body
+    assert 'knwl_request_latency_ms{endpoint="POST /api/v1/tenants/{tenantId}/documents",quantile="0.99"}' in body
+
+
+def _record_sample(collector):
+    for value in range(1, 301):
+        tenant = "t1" if value % 3 else "t2"
+        status = 500 if value % 50 == 0 else 200
+        collector.record_request("GET /x", tenant, status, value / 7)
+    collector.record_request("GET /y", None, 404, 2.5)
+    collector.record_cache_lookup(True)
+    collector.record_cache_store(1, 3, 300)
+    collector.record_admission("t2", "rate_limited")
+    collector.record_ingest("duplicate", 2)
+
+
+def test_shared_metrics_match_in_process_collector(tmp_path):
+    local = MetricsCollector()
+    shared = SharedMetricsCollector(str(tmp_path), 64)
+    _record_sample(local)
+    _record_sample(shared)
+    expected, actual = local.snapshot(), shared.snapshot()
+    for section in ("requests", "latencyMs", "errors", "cache", "admission", "ingest"):
+        assert actual[section] == expected[section]
+    assert actual["workers"]["count"] == 1
+    shared.close()
+
+
+def test_shared_metrics_aggregate_workers_and_survive_restarts(tmp_path):
+    context = multiprocessing.get_context("fork")
+    recorded, release = context.Event(), context.Event()
+
+    def worker(clean_exit):
+        collector = SharedMetricsCollector(str(tmp_path), 64)
+        for _ in range(100):
+            collector.record_request("GET /x", "t1", 200, 1.0)
+        recorded.set()
+        release.wait(10)
+        if clean_exit:
+            collector.close()
+        else:
+            os._exit(0)
+
+    live = context.Process(target=worker, args=(True,))
+    live.start()
+    assert recorded.wait(10)
+    collector = SharedMetricsCollector(str(tmp_path), 64)
+    collector.record_request("GET /x", "t1", 500, 2.0)
+    snapshot = collector.snapshot()
+    assert snapshot["requests"]["total"] == 101
+    assert snapshot["workers"]["count"] == 2
+    assert snapshot["workers"]["byWorker"][str(live.pid)]["requests"] == 100
+    assert snapshot["workers"]["byWorker"][str(os.getpid())]["errors"] == 1
+
+    release.set()
+    live.join(10)
+    recorded.clear()
+    release.clear()
+    crashed = context.Process(target=worker, args=(False,))
+    crashed.start()
+    assert recorded.wait(10)
+    release.set()
+    crashed.join(10)
+
+    snapshot = collector.snapshot()
+    assert snapshot["requests"]["byTenant"] == {"t1": 201}
+    assert snapshot["latencyMs"]["byEndpoint"]["GET /x"]["count"] == 201
+    assert snapshot["workers"]["count"] == 1
+    assert snapshot["workers"]["retired"] == {"workers": 2, "requests": 200, "errors": 0}
+    collector.close()
+    restarted = SharedMetricsCollector(str(tmp_path), 64)
+    assert restarted.snapshot()["errors"]["byStatus"] == {"500": 1}
+    restarted.close()
@@ -0,0 +1,21 @@
+def test_request_id_is_echoed_or_generated(client):
+    echoed = client.get("/api/v1/health", headers={"X-Request-Id": "req-123"})
+    assert echoed.headers["X-Request-Id"] == "req-123"
+    generated = client.get("/api/v1/health")
+    assert len(generated.headers["X-Request-Id"]) == 36
+
+
+def test_unhandled_exception_returns_500_and_is_recorded(client):
+    @client.app.get("/api/v1/tenants/{tenantId}/boom")
+    def boom(tenantId: str):
+        raise RuntimeError("boom")
+
+    response = client.get("/api/v1/tenants/t1/boom", headers={"X-Request-Id": "r-1"})
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Internal Server Error"}
+    assert response.headers["X-Request-Id"] == "r-1"
+
+    payload = client.get("/api/v1/metrics").json()
+    assert payload["errors"]["byStatus"]["500"] == 1
+    assert payload["errors"]["byTenant"]["t1"] == 1
+    assert payload["requests"]["byEndpoint"]["GET /api/v1/tenants/{tenantId}/boom"] == 1
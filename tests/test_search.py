@@ -1,3 +1,6 @@
+from dataclasses import replace
+
+
 def _ingest(client, tenant_id, api_key, title, content, tags):
     return client.post(
         f"/api/v1/tenants/{tenant_id}/documents",
@@ -46,3 +49,202 @@ def test_search_results_sorted_by_score_desc(client):
     assert len(results) >= 2
     assert results[0]["score"] >= results[1]["score"]
 
+
+def test_search_pages_follow_score_order(client):
+    for idx in range(6):
+        content = " ".join(["alpha"] * (idx + 1) + ["filler"] * 20)
+        _ingest(client, "t1", "key_t1", f"Doc {idx}", content, ["a"])
+    scores = []
+    for offset in (0, 3):
+        response = client.get(
+            "/api/v1/tenants/t1/documents/search",
+            headers={"X-API-Key": "key_t1"},
+            params={"q": "alpha", "limit": 3, "offset": offset},
+        )
+        results = response.json()["results"]
+        assert all("<b>alpha</b>" in item["snippet"] for item in results)
+        scores.extend(item["score"] for item in results)
+    assert len(scores) == 6
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] > scores[-1] > 0
+
+
+def test_search_total_comes_with_page(client):
+    for idx in range(5):
+        _ingest(client, "t1", "key_t1", f"Doc {idx}", "shared term", ["a"])
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "shared", "limit": 2, "offset": 2},
+    )
+    payload = response.json()
+    assert payload["total"] == 5
+    assert payload["totalIsEstimate"] is False
+    assert len(payload["results"]) == 2
+
+
+def test_search_capped_count_past_last_page(client):
+    for idx in range(5):
+        _ingest(client, "t1", "key_t1", f"Doc {idx}", "shared term", ["a"])
+    params = {"q": "shared", "limit": 2, "offset": 10}
+    headers = {"X-API-Key": "key_t1"}
+    exact = client.get(
+        "/api/v1/tenants/t1/documents/search", headers=headers, params=params
+    ).json()
+    assert exact["total"] == 5
+    assert exact["results"] == []
+
+    client.app.state.settings = replace(client.app.state.settings, search_count_cap=3)
+    capped = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers=headers,
+        params={**params, "countMode": "capped"},
+    ).json()
+    assert capped["total"] == 3
+    assert capped["totalIsEstimate"] is True
+
+
+def test_repeated_search_is_served_from_cache_until_ingest(client):
+    headers = {"X-API-Key": "key_admin"}
+    _ingest(client, "t1", "key_t1", "Doc One", "cached term", ["a"])
+    _ingest(client, "t2", "key_t2", "Doc Two", "cached term", ["b"])
+    for tenant in ("t1", "t2"):
+        client.get(
+            f"/api/v1/tenants/{tenant}/documents/search",
+            headers=headers,
+            params={"q": "cached"},
+        )
+    client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers=headers,
+        params={"q": "  cached "},
+    )
+    cache = client.get("/api/v1/metrics").json()["cache"]
+    assert cache["hits"] == 1
+    assert cache["misses"] == 2
+
+    _ingest(client, "t1", "key_t1", "Doc Three", "cached term", ["c"])
+    t1 = client.get(
+        "/api/v1/tenants/t1/documents/search", headers=headers, params={"q": "cached"}
+    ).json()
+    client.get(
+        "/api/v1/tenants/t2/documents/search", headers=headers, params={"q": "cached"}
+    )
+    assert t1["total"] == 2
+    cache = client.get("/api/v1/metrics").json()["cache"]
+    assert cache["hits"] == 2
+    assert cache["misses"] == 3
+
+
+def test_search_cursor_pages_through_all_results(client):
+    for idx in range(7):
+        content = " ".join(["cursor"] * (idx % 3 + 1) + ["filler"] * 10)
+        _ingest(client, "t1", "key_t1", f"Doc {idx}", content, ["a"])
+    params = {"q": "cursor", "limit": 3}
+    seen = []
+    pages = 0
+    while True:
+        response = client.get(
+            "/api/v1/tenants/t1/documents/search",
+            headers={"X-API-Key": "key_t1"},
+            params=params,
+        )
+        assert response.status_code == 200
+        payload = response.json()
+        assert payload["total"] == 7
+        seen.extend(item["documentId"] for item in payload["results"])
+        pages += 1
+        if not payload["nextCursor"]:
+            break
+        params = {**params, "cursor": payload["nextCursor"]}
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 7
+
+    by_offset = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "cursor", "limit": 7},
+    ).json()
+    assert [item["documentId"] for item in by_offset["results"]] == seen
+    assert by_offset["nextCursor"] is None
+
+
+def test_search_cursor_is_bound_to_tenant_and_query(client):
+    for idx in range(3):
+        _ingest(client, "t1", "key_t1", f"Doc {idx}", "bound term", ["a"])
+    first = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_admin"},
+        params={"q": "bound", "limit": 1},
+    ).json()
+    cursor = first["nextCursor"]
+    assert cursor
+
+    other_query = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_admin"},
+        params={"q": "term", "limit": 1, "cursor": cursor},
+    )
+    assert other_query.status_code == 400
+    other_tenant = client.get(
+        "/api/v1/tenants/t2/documents/search",
+        headers={"X-API-Key": "key_admin"},
+        params={"q": "bound", "limit": 1, "cursor": cursor},
+    )
+    assert other_tenant.status_code == 400
+    malformed = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_admin"},
+        params={"q": "bound", "cursor": "not-a-cursor"},
+    )
+    assert malformed.status_code == 400
+
+
+def test_search_filters_by_tags_and_returns_facets(client):
+    _ingest(client, "t1", "key_t1", "Doc A", "facet word", ["red", "small"])
+    _ingest(client, "t1", "key_t1", "Doc B", "facet word", ["red", "large"])
+    _ingest(client, "t1", "key_t1", "Doc C", "facet word", ["blue"])
+    _ingest(client, "t1", "key_t1", "Doc D", "other word", ["red"])
+    _ingest(client, "t2", "key_t2", "Doc E", "facet word", ["red"])
+
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "facet", "facets": "tags"},
+    )
+    payload = response.json()
+    assert payload["total"] == 3
+    assert payload["facets"]["tags"][0] == {"value": "red", "count": 2}
+    assert {item["value"] for item in payload["facets"]["tags"]} == {
+        "red",
+        "small",
+        "large",
+        "blue",
+    }
+
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "facet", "tags": "red, small", "facets": "tags"},
+    )
+    payload = response.json()
+    assert [item["title"] for item in payload["results"]] == ["Doc A"]
+    assert payload["total"] == 1
+    assert {item["value"] for item in payload["facets"]["tags"]} == {"red", "small"}
+
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "facet", "tags": "red", "mode": "vector"},
+    )
+    assert {item["title"] for item in response.json()["results"]} == {
+        "Doc A",
+        "Doc B",
+        "Doc D",
+    }
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "facet", "facets": "tags", "mode": "hybrid"},
+    )
+    assert response.status_code == 400
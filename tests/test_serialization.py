@@ -0,0 +1,64 @@
+import json
+
+from fastapi import Body, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.serialization import compact_tags, render_search_response
+from app.models.schemas import SearchResponse
+
+_reference = FastAPI()
+
+
+@_reference.post("/render", response_model=SearchResponse)
+def _render(payload: dict = Body(...)) -> dict:
+    return payload
+
+
+_reference_client = TestClient(_reference)
+
+
+def _model_bytes(body: bytes) -> bytes:
+    # What a response_model=SearchResponse route writes for the same data.
+    response = _reference_client.post("/render", json=json.loads(body))
+    assert response.status_code == 200
+    return response.content
+
+
+def test_render_matches_response_model_json_exactly():
+    stored_tags = [[], ["plain"], ["café", "日本", 'say "hi"', "back\\slash", "tab\tnew\nline"]]
+    results = [
+        {
+            "documentId": f"doc-{index}",
+            "title": title,
+            "snippet": "x <b>hit</b> ...   \x01",
+            "tags": compact_tags(json.dumps(tags)),
+            "score": score,
+            "createdAt": "2026-01-01T00:00:00Z",
+        }
+        for index, (title, tags, score) in enumerate(
+            zip(["Ünïcode", 'quote "title"', "emoji 🎉"], stored_tags, [7.25, 2.5e-05, 1e-07])
+        )
+    ]
+    facets = {"tags": [{"value": "café", "count": 3}, {"value": "x", "count": 1}]}
+    for next_cursor, facet_counts in ((None, None), ("eyJ2IjoxfQ", facets)):
+        body = render_search_response(
+            "t1", 'q "ü"', 10, 0, 3, True, results, next_cursor, facet_counts
+        ).body
+        assert body == _model_bytes(body)
+
+
+def test_search_endpoint_body_matches_response_model(client):
+    client.post(
+        "/api/v1/tenants/t1/documents",
+        headers={"X-API-Key": "key_t1"},
+        json={"title": "Résumé", "content": "shape check", "tags": ["naïve", "b"]},
+    )
+    response = client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params={"q": "shape", "facets": "tags"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == _model_bytes(response.content)
+    assert response.json()["results"][0]["tags"] == ["naïve", "b"]
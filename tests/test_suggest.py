@@ -0,0 +1,148 @@
+import sqlite3
+import time
+
+from app.db import repo
+from app.db.schema import apply_schema
+from app.db.sqlite import ShardRouter
+from app.db.suggest import SuggestIndex, _TenantVocabulary, tokenize
+
+
+def _ingest(client, tenant_id, api_key, title, content):
+    return client.post(
+        f"/api/v1/tenants/{tenant_id}/documents",
+        headers={"X-API-Key": api_key},
+        json={"title": title, "content": content, "tags": []},
+    )
+
+
+def _suggest(client, q, tenant_id="t1", api_key="key_t1", **params):
+    return client.get(
+        f"/api/v1/tenants/{tenant_id}/documents/suggest",
+        headers={"X-API-Key": api_key},
+        params={"q": q, **params},
+    )
+
+
+def _eventually(check, timeout=5.0):
+    # Vocabularies are built and refreshed by a background thread.
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _terms(client, q, **params):
+    return [item["term"] for item in _suggest(client, q, **params).json()["terms"]]
+
+
+def test_tokenize_matches_fts_folding():
+    assert tokenize("Café_Latte  GAMMA-ray") == ["cafe", "latte", "gamma", "ray"]
+
+
+def test_vocabulary_ranks_completions_by_document_frequency():
+    vocab = _TenantVocabulary()
+    vocab.add([{"gamma", "gamut"}, {"gamma"}, {"game", "gamma"}])
+    assert vocab.complete("gam", 2) == [("gamma", 3), ("game", 1)]
+    assert vocab.complete("ga", 5)[0] == ("gamma", 3)
+    vocab.add([{"gamut"}, {"gamut"}, {"gamut"}])
+    # Cached short-prefix results are invalidated by new documents.
+    assert vocab.complete("ga", 1) == [("gamut", 4)]
+
+
+def test_suggest_returns_terms_and_titles_per_tenant(client):
+    _ingest(client, "t1", "key_t1", "Gamma rays overview", "gamma gamma radiation")
+    _ingest(client, "t1", "key_t1", "Game design", "level design notes")
+    _ingest(client, "t2", "key_t2", "Gambit", "chess opening gamma")
+
+    # The first request schedules the vocabulary build and may get titles only.
+    _eventually(lambda: not _suggest(client, "gam").json()["partial"])
+    response = _suggest(client, "gam")
+    assert response.status_code == 200
+    payload = response.json()
+    assert [item["term"] for item in payload["terms"]] == ["game", "gamma"]
+    assert {item["title"] for item in payload["titles"]} == {
+        "Gamma rays overview",
+        "Game design",
+    }
+    assert payload["partial"] is False
+
+    payload = _suggest(client, "gamma ov").json()
+    assert [item["title"] for item in payload["titles"]] == ["Gamma rays overview"]
+    assert [item["term"] for item in payload["terms"]] == ["overview"]
+
+    # Ingest refreshes a loaded vocabulary incrementally.
+    _ingest(client, "t1", "key_t1", "Gamut mapping", "colour gamut")
+    _eventually(lambda: "gamut" in _terms(client, "gam"))
+    assert "gambit" not in _terms(client, "gam")
+
+    assert _suggest(client, "  ").status_code == 400
+    assert _suggest(client, "gam", tenant_id="t2").status_code == 403
+
+
+def test_prefix_migration_rebuilds_fts_index():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    apply_schema(conn)
+    conn.executescript(
+        """
+        DROP TABLE documents_fts;
+        CREATE VIRTUAL TABLE documents_fts USING fts5(
+          tenant_id UNINDEXED, title, content, tags, tenant_key,
+          content='documents', content_rowid='rowid'
+        );
+        PRAGMA user_version = 0;
+        """
+    )
+    conn.execute(
+        "INSERT INTO documents (tenant_id, document_id, title, content, tags, created_at, updated_at)"
+        " VALUES ('t1', 'd1', 'Gamma', 'body', '[]', 'now', 'now')"
+    )
+    conn.commit()
+    apply_schema(conn)
+    sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'documents_fts'"
+    ).fetchone()[0]
+    assert "prefix='2 3'" in sql
+    hits = conn.execute(
+        "SELECT COUNT(*) FROM documents_fts WHERE documents_fts MATCH 'title : ga*'"
+    ).fetchone()[0]
+    assert hits == 1
+
+
+def test_vocabulary_removes_terms_of_deleted_documents():
+    vocab = _TenantVocabulary()
+    vocab.add([{"gamma", "gamut"}, {"gamma"}])
+    assert vocab.complete("ga", 5) == [("gamma", 2), ("gamut", 1)]
+    vocab.remove([{"gamma", "gamut"}])
+    assert vocab.complete("ga", 5) == [("gamma", 1)]
+    assert vocab.size == 1
+
+
+def _only_document_id(db):
+    with db.reader() as conn:
+        return conn.execute("SELECT document_id FROM documents").fetchone()[0]
+
+
+def test_vocabulary_is_built_and_refreshed_in_background(tmp_path):
+    router = ShardRouter(
+        str(tmp_path / "vocab.db"), "none", 1, "", 1, 2, 500, init_shard=apply_schema
+    )
+    index = SuggestIndex(router)
+    try:
+        with router.lease("t1") as db:
+            repo.insert_tenant_documents(db, [("t1", "Gamma", "gamma rays", [])])
+            # No indexer thread yet: the build is only scheduled.
+            assert index.complete(db, "t1", "gam", 5) is None
+            index.start()
+            _eventually(lambda: index.complete(db, "t1", "gam", 5) is not None)
+            assert index.complete(db, "t1", "gam", 5) == [("gamma", 1)]
+
+            (_, removed), = repo.write_documents(
+                db, [("update", ("t1", _only_document_id(db), {"content": "gamut"}))]
+            )
+            index.discard("t1", removed)
+            index.refresh("t1")
+            _eventually(lambda: index.complete(db, "t1", "gam", 5) == [("gamma", 1), ("gamut", 1)])
+    finally:
+        index.close()
+        router.close()
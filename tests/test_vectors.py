@@ -0,0 +1,211 @@
+import time
+
+import numpy as np
+
+from app.core.embedding import HashingEmbedder
+from app.db import repo
+from app.db.schema import apply_schema
+from app.db.semantic import reciprocal_rank_fusion
+from app.db.sqlite import ShardRouter
+from app.db.vectors import IvfIndex, VectorStore
+
+
+def _router(tmp_path):
+    router = ShardRouter(
+        str(tmp_path / "vec.db"), "none", 1, "", 1, 2, 500, init_shard=apply_schema
+    )
+    router.warm()
+    return router
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(64)
+    first = embedder.embed(["Index tuning\nindexing latency", "", "unrelated words"])
+    second = HashingEmbedder(64).embed(["Index tuning\nindexing latency", "", "unrelated words"])
+    assert first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert abs(float(np.linalg.norm(first[0])) - 1.0) < 1e-5
+    assert not first[1].any()
+    query = embedder.embed(["indexes"])[0]
+    assert query @ first[0] > query @ first[2]
+
+
+def test_vector_store_syncs_and_reloads_from_disk(tmp_path):
+    router = _router(tmp_path)
+    directory = str(tmp_path / "vectors")
+    docs = [("t1", f"Doc {idx}", f"topic{idx} shared words", []) for idx in range(20)]
+    try:
+        with router.lease("t1") as db:
+            repo.insert_tenant_documents(db, docs)
+            store = VectorStore(router, directory, HashingEmbedder(128), 0, 4)
+            assert store.sync(db, "t1") == 20
+            query = store.embedder.embed(["Doc 7\ntopic7 shared words"])[0]
+            rowids, scores = store.search(db, "t1", query, 3)
+            top = repo.fetch_documents(db, "t1", rowids.tolist())
+            assert top[int(rowids[0])]["title"] == "Doc 7"
+            assert list(scores) == sorted(scores, reverse=True)
+
+            reopened = VectorStore(router, directory, HashingEmbedder(128), 0, 4)
+            assert reopened.count("t1") == 20
+            assert reopened.sync(db, "t1") == 0
+            assert reopened.search(db, "t2", query, 3)[0].size == 0
+    finally:
+        router.close()
+
+
+def test_search_scans_a_bounded_tail_without_syncing(tmp_path):
+    router = _router(tmp_path)
+    directory = str(tmp_path / "vectors")
+    try:
+        with router.lease("t1") as db:
+            store = VectorStore(router, directory, HashingEmbedder(128), 0, 4)
+            repo.insert_tenant_documents(
+                db, [("t1", f"Doc {idx}", f"topic{idx} words", []) for idx in range(40)]
+            )
+            query = store.embedder.embed(["Doc 2\ntopic2 words"])[0]
+            rowids, _ = store.search(db, "t1", query, 40)
+            # Nothing is embedded inline beyond the tail, and nothing is stored.
+            assert rowids.shape[0] == 16
+            top = repo.fetch_documents(db, "t1", rowids[:1].tolist())
+            assert top[int(rowids[0])]["title"] == "Doc 2"
+            assert store.count("t1") == 0
+            assert store.stats()["dirtyTenants"] == 1
+            assert store.sync(db, "t1") == 40
+            assert store.search(db, "t1", query, 40)[0].shape[0] == 40
+    finally:
+        router.close()
+
+
+def test_vector_stores_sharing_a_directory_append_each_row_once(tmp_path):
+    # Two stores on one directory stand in for two worker processes.
+    router = _router(tmp_path)
+    directory = str(tmp_path / "vectors")
+    try:
+        with router.lease("t1") as db:
+            first = VectorStore(router, directory, HashingEmbedder(64), 0, 4)
+            second = VectorStore(router, directory, HashingEmbedder(64), 0, 4)
+            assert first.count("t1") == second.count("t1") == 0
+            repo.insert_tenant_documents(db, [("t1", f"Doc {i}", "words", []) for i in range(10)])
+            assert first.sync(db, "t1") == 10
+            repo.insert_tenant_documents(db, [("t1", f"New {i}", "words", []) for i in range(5)])
+            assert second.sync(db, "t1") == 5
+            assert first.sync(db, "t1") == 0
+            assert first.count("t1") == second.count("t1") == 15
+        ids = np.fromfile(str(tmp_path / "vectors" / "t1".encode().hex()) + ".ids", np.int64)
+        assert ids.shape[0] == 15 and np.all(np.diff(ids) > 0)
+    finally:
+        router.close()
+
+
+def test_ivf_index_recall_on_clustered_vectors():
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(20, 32))
+    matrix = centers[rng.integers(0, 20, 4000)] + 0.1 * rng.normal(size=(4000, 32))
+    matrix = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+    index = IvfIndex(matrix)
+    hits = 0
+    for row in rng.choice(4000, 50, replace=False):
+        candidates = index.candidates(matrix[row], nprobe=8)
+        best = candidates[np.argmax(matrix[candidates] @ matrix[row])]
+        hits += int(best == row)
+    assert hits >= 45
+    assert index.candidates(matrix[0], nprobe=8).size < 4000
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], k=60)
+    assert [rowid for rowid, _ in fused][:2] == [1, 3]
+    assert {rowid for rowid, _ in fused} == {1, 2, 3, 4}
+
+
+def _ingest(client, title, content):
+    return client.post(
+        "/api/v1/tenants/t1/documents",
+        headers={"X-API-Key": "key_t1"},
+        json={"title": title, "content": content, "tags": []},
+    )
+
+
+def _search(client, **params):
+    return client.get(
+        "/api/v1/tenants/t1/documents/search",
+        headers={"X-API-Key": "key_t1"},
+        params=params,
+    )
+
+
+def test_vector_and_hybrid_modes_find_inflected_terms(client):
+    _ingest(client, "Indexing guide", "How we are indexing documents quickly")
+    _ingest(client, "Cooking", "Recipes for pasta and bread")
+
+    lexical = _search(client, q="indexes").json()
+    assert lexical["results"] == []
+
+    vector = _search(client, q="indexes", mode="vector").json()
+    assert vector["total"] == 2
+    assert vector["results"][0]["title"] == "Indexing guide"
+    assert vector["nextCursor"] is None
+
+    hybrid = _search(client, q="bread", mode="hybrid", limit=1).json()
+    assert hybrid["results"][0]["title"] == "Cooking"
+    assert "<b>bread</b>" in hybrid["results"][0]["snippet"]
+    assert hybrid["totalIsEstimate"] is True
+
+    response = _search(client, q="bread", mode="vector", cursor="abc")
+    assert response.status_code == 400
+    # Searches never embed into the store; the background thread does.
+    deadline = time.monotonic() + 5.0
+    while client.get("/api/v1/metrics").json()["vectors"]["vectors"] != 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_vector_store_masks_deleted_rows_and_compacts(tmp_path):
+    router = _router(tmp_path)
+    directory = str(tmp_path / "vectors")
+    docs = [("t1", f"Doc {idx}", f"topic{idx} shared words", []) for idx in range(10)]
+    try:
+        with router.lease("t1") as db:
+            repo.insert_tenant_documents(db, docs)
+            store = VectorStore(router, directory, HashingEmbedder(128), 0, 4)
+            store.sync(db, "t1")
+            query = store.embedder.embed(["Doc 3\ntopic3 shared words"])[0]
+            best = int(store.search(db, "t1", query, 1)[0][0])
+            document_id = repo.fetch_documents(db, "t1", [best])[best]["documentId"]
+            repo.write_documents(db, [("delete", ("t1", document_id))])
+            store.discard("t1", [best])
+            assert best not in store.search(db, "t1", query, 10)[0].tolist()
+            assert store.count("t1") == 9
+
+            # A fresh process finds the deletion by reconciling with the table.
+            reopened = VectorStore(router, directory, HashingEmbedder(128), 0, 4)
+            reopened.sync(db, "t1")
+            assert best not in reopened.search(db, "t1", query, 10)[0].tolist()
+
+            written = repo.write_documents(
+                db,
+                [
+                    ("delete", ("t1", document["documentId"]))
+                    for document in repo.fetch_documents(db, "t1", [1, 2, 5]).values()
+                ],
+            )
+            reopened.discard("t1", [removed[0][0] for _, removed in written])
+            # Four of ten rows are dead now, so the next sync rewrites the files.
+            reopened.sync(db, "t1")
+            assert reopened.stats()["deleted"] == 0
+            assert reopened.count("t1") == 6
+            assert len(reopened.search(db, "t1", query, 10)[0]) == 6
+
+            # The first store still maps the replaced files and keeps serving
+            # them; its search only marks the tenant dirty, and the next sync
+            # (the background thread's job) reloads them.
+            store.search(db, "t1", query, 10)
+            assert store.stats()["dirtyTenants"] == 1
+            assert store.sync(db, "t1") == 0
+            assert len(store.search(db, "t1", query, 10)[0]) == 6
+            assert store.count("t1") == 6
+            repo.insert_tenant_documents(db, [("t1", "Doc 10", "topic10 shared words", [])])
+            assert store.sync(db, "t1") == 1
+            assert len(reopened.search(db, "t1", query, 10)[0]) == 7
+    finally:
+        router.close()